@@ -0,0 +1,77 @@
+"""
+Compare whole-member imports with chunked imports (IMPORT_CHUNK_ROWS) on synthetic
+onstat partition dumps of growing size: wall time and peak traced memory of
+read -> clean -> serialise -> line protocol, with in-memory S3 and InfluxDB stand-ins.
+
+    python benchmarks/bench_chunked.py [repeat]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from common import best_of, print_table
+from synthetic import partitions_member
+
+import numpy as np
+from database.line_protocol import dataframe_to_line_protocol
+from etl.load import import_chunked, read_partitions
+from etl.output import serialise_frame
+
+HEADER = "datetime,partnum,npages,nused,npdata,nrows,flgs,seqsc,lkrqs,lkwts,ucnt,touts,isrd,iswrt,isrwt,isdel,dlks,bfrd,bfwrt,nextns,area"
+
+
+class DiscardingS3:
+    def put_object(self, Bucket, Key, Body):
+        if hasattr(Body, "read"):
+            Body.read()
+
+
+class DiscardingDatabase:
+    def write_dataframe(self, df, file, customer, server, summary=True):
+        dataframe_to_line_protocol(df)
+
+
+def synthetic_partitions(path, rows, seed=0):
+    with open(path, "wb") as f:
+        f.write(partitions_member(rows, np.random.default_rng(seed)))
+
+
+def whole(path):
+    df = read_partitions(HEADER, path, "c", "s", "partitions", 0)
+    serialise_frame(df, "csv")
+    DiscardingDatabase().write_dataframe(df, "file", "c", "s")
+
+
+def chunked(path, chunk_rows):
+    import_chunked("import_partitions", HEADER, path, "c", "s", "partitions", 0, DiscardingS3(), DiscardingDatabase(), chunk_rows=chunk_rows, output_format="csv")
+
+
+def peak_memory(func) -> int:
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main(repeat: int = 1, chunk_rows: int = 20000):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (20000, 50000, 100000):
+            path = os.path.join(tmp, f"partitions_{size}.log")
+            synthetic_partitions(path, size)
+            whole_time = best_of(lambda: whole(path), repeat)
+            chunked_time = best_of(lambda: chunked(path, chunk_rows), repeat)
+            whole_peak = peak_memory(lambda: whole(path))
+            chunked_peak = peak_memory(lambda: chunked(path, chunk_rows))
+            rows.append((size, f"{os.path.getsize(path) / 2**20:.1f}", f"{whole_time:.2f}", f"{chunked_time:.2f}",
+                         f"{whole_peak / 2**20:.0f}", f"{chunked_peak / 2**20:.0f}"))
+    print_table(rows, ("rows", "file MiB", "whole s", f"chunked({chunk_rows}) s", "whole peak MiB", "chunked peak MiB"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
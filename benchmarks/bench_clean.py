@@ -0,0 +1,42 @@
+"""
+Compare the per-cell clean_data masking loop with the vectorised replace_invalid_values
+on every member of the sample archive in tests/test_files.
+
+    python benchmarks/bench_clean.py [repeat]
+"""
+import io
+import sys
+
+from common import best_of, print_table, sample_members
+
+import pandas as pd
+from etl.clean import replace_invalid_values
+
+
+def legacy_replace_invalid_values(df):
+    for column in df.columns:
+        if column not in ['datetime', 'customer', 'server']:
+            condition_large_value = (df[column].apply(lambda x: isinstance(x, (int, float)) and x > 9023372036854775800))
+            condition_nan = (df[column].apply(lambda x: isinstance(x, str) and x.lower() == 'nan'))
+            df.loc[condition_large_value, column] = -1
+            df.loc[condition_nan, column] = -1
+    return df
+
+
+def main(repeat: int = 5):
+    rows = []
+    total_legacy = total_vectorised = 0.0
+    for name, data in sample_members():
+        df = pd.read_csv(io.BytesIO(data), header=0)
+        legacy = best_of(lambda: legacy_replace_invalid_values(df.copy()), repeat)
+        vectorised = best_of(lambda: replace_invalid_values(df.copy()), repeat)
+        total_legacy += legacy
+        total_vectorised += vectorised
+        rows.append((name.split("_", 3)[3], df.shape[0], df.shape[1], f"{legacy * 1000:.2f}", f"{vectorised * 1000:.2f}", f"{legacy / vectorised:.1f}x"))
+
+    rows.append(("TOTAL", "", "", f"{total_legacy * 1000:.2f}", f"{total_vectorised * 1000:.2f}", f"{total_legacy / total_vectorised:.1f}x"))
+    print_table(rows, ("member", "rows", "cols", "legacy ms", "vectorised ms", "speedup"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,60 @@
+"""
+Break down the cold start of the transform Lambda: every step runs in a fresh
+interpreter (cwd lambdas/transform, as in the Lambda), and its incremental time is
+reported. "import handler" is what the init phase now pays; the remaining steps are
+deferred to the first invocation and reused by warm ones. The Secrets Manager round
+trip is not measured (no network here).
+
+    python benchmarks/bench_cold_start.py [repeat]
+"""
+import json
+import os
+import subprocess
+import sys
+
+from common import TRANSFORM_DIR, print_table
+
+# (component, statement) run in order in one interpreter; each is timed on its own
+STEPS = [
+    ("import handler", "import handler"),
+    ("import boto3", "import boto3"),
+    ("S3 client", "handler.get_s3_client()"),
+    ("import pandas", "import pandas"),
+    ("import pyarrow", "import pyarrow, pyarrow.csv"),
+    ("import etl.extract", "import etl.extract"),
+    ("config + ingestion plans", "handler.get_subroutine_config()"),
+    ("import influxdb_client", "import influxdb_client"),
+    ("Database()", "handler.get_db()"),
+]
+
+PROBE = """
+import json, time
+timings = []
+for name, statement in {steps!r}:
+    start = time.perf_counter()
+    exec(statement)
+    timings.append((name, time.perf_counter() - start))
+print(json.dumps(timings))
+"""
+
+
+def run_once() -> dict:
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get("AWS_DEFAULT_REGION", "us-east-1"))
+    output = subprocess.run([sys.executable, "-c", PROBE.format(steps=STEPS)], cwd=TRANSFORM_DIR, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return dict(json.loads(output.strip().splitlines()[-1]))
+
+
+def main(repeat: int = 5):
+    runs = [run_once() for _ in range(repeat)]
+    best = {name: min(run[name] for run in runs) for name, _ in STEPS}
+    total = sum(best.values())
+
+    rows = [(name, f"{best[name] * 1000:.1f}", f"{best[name] / total * 100:.0f}%",
+             "init" if name == "import handler" else "first invocation") for name, _ in STEPS]
+    rows.append(("TOTAL", f"{total * 1000:.1f}", "", ""))
+    print_table(rows, ("component", "ms", "share", "paid at"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,85 @@
+"""
+Throughput of the Database write path per INFLUX_BATCH_LINES batch size, without an
+InfluxDB: serialisation and batching into a CaptureSink, and the full influxdb_client
+HTTP path into the local /api/v2/write stand-in (database.standin), with and without
+added server latency. The stand-in payloads are checked to be byte-identical to the
+captured ones.
+
+    python benchmarks/bench_influx_write.py [rows] [repeat] [latency ms]
+"""
+import contextlib
+import io
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import print_table
+
+from database.influx_writer import Database
+from database.sinks import CaptureSink, InfluxDBSink
+from database.standin import InfluxWriteStandIn
+
+CREDENTIALS = {"token": "bench", "org": "bench", "bucket": "bench"}
+BATCH_SIZES = (1000, 5000, 20000)
+
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """A cleaned frame like import_data produces: tags, counters, gauges and a string field."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "datetime": pd.date_range("2024-10-10 11:00:00", periods=rows, freq="10s"),
+        "_measurement": "bench",
+        "customer": "bench",
+        "server": "db01.plc",
+        "reads": np.cumsum(rng.integers(0, 5000, size=rows)),
+        "writes": np.cumsum(rng.integers(0, 5000, size=rows)),
+        "hit_ratio": np.round(rng.uniform(0, 100, size=rows), 2),
+        "state": np.array(["OK", "ACTIVE", "WARNING DBLOCKS 8"])[np.arange(rows) % 3],
+    })
+
+
+def write(db: Database, df: pd.DataFrame, batch_size: int) -> float:
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        db.write_dataframe(df, "bench.log", "bench", "db01.plc", batch_size=batch_size, summary=False)
+        db.flush()
+        return time.perf_counter() - started
+
+
+def main(rows: int = 200000, repeat: int = 3, latency_ms: float = 2.0):
+    df = synthetic_frame(rows)
+    table = []
+    for batch_size in BATCH_SIZES:
+        captured = None
+        for sink_name, delay in (("capture", None), ("stand-in", 0.0), (f"stand-in +{latency_ms:g} ms", latency_ms / 1000)):
+            seconds, summary = [], None
+            for _ in range(repeat):
+                if delay is None:
+                    sink = CaptureSink()
+                    seconds.append(write(Database(sink=sink), df, batch_size))
+                    captured = [payload.encode() for payload in sink.payloads]
+                    summary = {"batches": sink.batches, "bytes": sink.bytes, "p50_ms": None, "p95_ms": None}
+                    continue
+                with InfluxWriteStandIn(delay=delay) as standin:
+                    db = Database(sink=InfluxDBSink(standin.url, lambda: dict(CREDENTIALS)))
+                    seconds.append(write(db, df, batch_size))
+                    db.close()
+                    if standin.payloads() != captured:
+                        raise AssertionError(f"stand-in payloads differ from the captured ones (batch size {batch_size})")
+                    summary = standin.summary()
+            best = min(seconds)
+            table.append((batch_size, sink_name, summary["batches"], f"{summary['bytes'] / 2**20:.1f}", f"{best * 1000:.0f}",
+                          f"{rows / best:,.0f}", summary["p50_ms"] if summary["p50_ms"] is not None else "-",
+                          summary["p95_ms"] if summary["p95_ms"] is not None else "-"))
+
+    print(f"{rows:,} rows, best of {repeat}; stand-in payloads byte-identical to the captured ones\n")
+    print_table(table, ("batch lines", "sink", "batches", "MB", "ms", "lines/s", "server p50 ms", "server p95 ms"))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    if len(sys.argv) > 3:
+        args.append(float(sys.argv[3]))
+    main(*args)
@@ -0,0 +1,90 @@
+"""
+Compare the Point-per-record serialisation of Database.write with the columnar
+dataframe_to_line_protocol on every cleaned member of the sample archive.
+
+    python benchmarks/bench_line_protocol.py [repeat]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+from common import ROOT, best_of, print_table, sample_members
+
+from influxdb_client import Point, WritePrecision
+from database.line_protocol import dataframe_to_line_protocol
+from etl.extract import resolve_import
+from etl.load import PARSERS
+from etl.plan import compile_plans
+
+
+class SilentLog:
+    def error(self, message):
+        pass
+
+
+def legacy_lines(df):
+    lines = []
+    for record in df.to_dict(orient="records"):
+        record['_time'] = record.pop('datetime')
+        if isinstance(record['_time'], str):
+            record['_time'] = datetime.strptime(record['_time'], '%Y-%m-%dT%H:%M:%S')
+        record['_time'] = record['_time'].replace(tzinfo=None).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        point = Point(record['_measurement'])
+        for tag, column in (("customer", "customer"), ("server", "server"), ("pagesize", "digits"), ("metric", "name"), ("metric", "area")):
+            if column in record:
+                point.tag(tag, record[column])
+        for field, value in record.items():
+            if field not in ['_measurement', 'customer', 'server', '_time']:
+                point.field(field, value)
+        point.time(record['_time'], WritePrecision.S)
+        lines.append(point.to_line_protocol())
+    return lines
+
+
+def peak_memory(func) -> int:
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def cleaned_frames():
+    with open(os.path.join(ROOT, "tests", "subroutines_config.json")) as f:
+        subroutine_config = json.load(f)
+    compile_plans(subroutine_config)
+    for name, data in sample_members():
+        file_name = os.path.basename(name)
+        route = resolve_import(subroutine_config, f"extracted/{file_name}", file_name, SilentLog())
+        if route is None or route[0] not in PARSERS:
+            continue
+        func_name, header, customer, server, subroutine_key, digits = route
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = PARSERS[func_name](header, io.BytesIO(data), customer, server, subroutine_key, digits)
+        yield file_name.split("_", 3)[3], df
+
+
+def main(repeat: int = 3):
+    rows = []
+    total_legacy = total_columnar = 0.0
+    for name, df in cleaned_frames():
+        legacy = best_of(lambda: legacy_lines(df), repeat)
+        columnar = best_of(lambda: dataframe_to_line_protocol(df), repeat)
+        legacy_peak = peak_memory(lambda: legacy_lines(df))
+        columnar_peak = peak_memory(lambda: dataframe_to_line_protocol(df))
+        total_legacy += legacy
+        total_columnar += columnar
+        rows.append((name, len(df), f"{legacy * 1000:.2f}", f"{columnar * 1000:.2f}", f"{legacy / columnar:.1f}x",
+                     f"{legacy_peak / 1024:.0f}", f"{columnar_peak / 1024:.0f}"))
+
+    rows.append(("TOTAL", "", f"{total_legacy * 1000:.2f}", f"{total_columnar * 1000:.2f}", f"{total_legacy / total_columnar:.1f}x", "", ""))
+    print_table(rows, ("member", "rows", "points ms", "columnar ms", "speedup", "points peak KiB", "columnar peak KiB"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
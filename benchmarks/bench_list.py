@@ -0,0 +1,121 @@
+"""
+Cost of a list Lambda page load against the size of the processed bucket: the former
+full scan (list_objects_v2 over every object, 1000 per page) against the manifest
+partitions of the last RECENT_MINUTES. Runs the real list handler against an
+in-memory S3 that counts requests; the latency column adds ``request ms`` per S3 call
+on top of the measured handler time. A second table shows what signing every listed
+file instead of one page costs with a real boto3 client.
+
+    python benchmarks/bench_list.py [request ms]
+"""
+import bisect
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+
+from common import ROOT, print_table
+
+LIST_HANDLER = os.path.join(ROOT, "lambdas", "list", "handler.py")
+
+# Zipped next to the list handler by bin/build_lambdas.sh
+sys.path.insert(0, os.path.join(ROOT, "lambdas", "shared"))
+PAGE = 1000
+
+
+class CountingS3:
+    class exceptions:
+        class NoSuchKey(Exception):
+            response = {"Error": {"Code": "NoSuchKey"}}
+
+    def __init__(self, buckets):
+        self.buckets = {name: (sorted(objects), objects) for name, objects in buckets.items()}
+        self.requests = 0
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        self.requests += 1
+        keys, objects = self.buckets[Bucket]
+        start = int(ContinuationToken) if ContinuationToken else bisect.bisect_left(keys, Prefix)
+        page = []
+        for key in keys[start:start + PAGE]:
+            if not key.startswith(Prefix):
+                break
+            page.append({"Key": key, "Size": objects[key]["Size"], "LastModified": objects[key]["LastModified"]})
+        truncated = len(page) == PAGE and start + PAGE < len(keys) and keys[start + PAGE].startswith(Prefix)
+        return {"Contents": page, "IsTruncated": truncated, "NextContinuationToken": str(start + PAGE)}
+
+    def get_object(self, Bucket, Key):
+        self.requests += 1
+        objects = self.buckets[Bucket][1]
+        if Key not in objects:
+            raise self.exceptions.NoSuchKey(Key)
+        return {"Body": io.BytesIO(objects[Key]["Body"])}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"https://signed/{Params['Bucket']}/{Params['Key']}"
+
+
+class SSM:
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": Name.rsplit("/", 1)[1]}}
+
+
+def processed_bucket(objects: int, recent: int, now: datetime.datetime) -> dict:
+    """``objects`` artifacts placed over the last 90 days, the last ``recent`` of them in the past 5 minutes, plus their manifest."""
+    bucket, segments = {}, {}
+    for i in range(objects):
+        placed = now - datetime.timedelta(minutes=5 * (i + 1) / recent) if i < recent else now - datetime.timedelta(days=90 * i / objects, minutes=20)
+        key = f"to_ingest/customer_server_{i:08d}.csv"
+        bucket[key] = {"Size": 1000, "LastModified": placed}
+        hour = placed.strftime("%Y-%m-%dT%H")
+        segments.setdefault(hour, []).append({"Key": key, "Size": 1000, "Timestamp": placed.isoformat(timespec="microseconds"), "Archive": None})
+    for hour, entries in segments.items():
+        # The current hour still has segments, older hours are compacted
+        key = f"manifest/segments/{hour}/0-bench.json" if hour == now.strftime("%Y-%m-%dT%H") else f"manifest/hours/{hour}.json"
+        bucket[key] = {"Size": 0, "LastModified": now, "Body": json.dumps({"entries": entries}).encode()}
+    return bucket
+
+
+def main(request_ms: float = 20.0):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    spec = importlib.util.spec_from_file_location("list_handler", LIST_HANDLER)
+    handler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(handler)
+    handler.ssm = SSM()
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rows = []
+    for objects in (1000, 10000, 100000):
+        buckets = {"raw": {}, "processed": processed_bucket(objects, 50, now)}
+        for listing in ("scan", "manifest"):
+            handler.PROCESSED_LISTING = listing
+            handler.s3 = CountingS3(buckets)
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = json.loads(handler.handler(None, None)["body"])
+            seconds = time.perf_counter() - started
+            rows.append((f"{objects:,}", listing, len(result["items"]), handler.s3.requests, f"{seconds * 1000:.1f}",
+                         f"{seconds * 1000 + handler.s3.requests * request_ms:,.0f}"))
+
+    print(f"Page load of the list handler, {request_ms:g} ms per S3 request\n")
+    print_table(rows, ("processed objects", "listing", "files shown", "S3 requests", "handler ms", "latency ms"))
+
+    # Signing is local CPU work of the real boto3 client: every listed file before, one page now
+    import boto3
+    client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="bench", aws_secret_access_key="bench")
+    signing = []
+    for urls in (handler.LIST_PAGE_SIZE, 1000, 10000):
+        started = time.perf_counter()
+        for i in range(urls):
+            client.generate_presigned_url(ClientMethod="get_object", Params={"Bucket": "processed", "Key": f"to_ingest/{i}.csv"}, ExpiresIn=3600)
+        signing.append((f"{urls:,}", f"{(time.perf_counter() - started) * 1000:.1f}"))
+    print()
+    print_table(signing, ("URLs signed", "ms"))
+
+
+if __name__ == "__main__":
+    main(*[float(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,75 @@
+"""
+Cost of the per-file DataFrame output of the importers: the former print(df) and
+print(df.info()) of every member against the level-gated, sampled and queued Logger
+at INFO (the default) and at DEBUG with LOG_SAMPLE_EVERY.
+
+    python benchmarks/bench_logging.py [files] [rows] [repeat]
+"""
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import best_of, print_table
+
+from utils import log_writer
+from utils.log_writer import Lazy, Logger, Sampler, frame_info, get_logger, log_sampled
+
+
+def frames(files: int, rows: int):
+    rng = np.random.default_rng(0)
+    return [pd.DataFrame({
+        "datetime": pd.date_range("2024-10-10 11:00:00", periods=rows, freq="10s"),
+        "locks": rng.integers(0, 10**6, size=rows),
+        "hit_ratio": np.round(rng.uniform(0, 100, size=rows), 2),
+        "customer": "bench",
+        "server": "db01.plc",
+    }) for _ in range(files)]
+
+
+def legacy(dfs):
+    for i, df in enumerate(dfs):
+        print(f"DataFrame for file{i}.log with header: datetime,locks,hit_ratio")
+        print(df)
+        print(f"Cleaned Data Overview for bench-db01.plc:")
+        print(df.info())
+
+
+def gated(dfs):
+    logger = get_logger("etl.load")
+    for i, df in enumerate(dfs):
+        log_sampled(logger, ("frame", "total_locks"), "DataFrame for %s with header: %s\n%s", f"file{i}.log", "datetime,locks,hit_ratio", df)
+        log_sampled(logger, ("clean", "total_locks"), "Cleaned Data Overview for %s-%s:\n%s", "bench", "db01.plc", Lazy(frame_info, df))
+
+
+def main(files: int = 200, rows: int = 2000, repeat: int = 3):
+    dfs = frames(files, rows)
+    rows_out = []
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, "bench.log")
+        for name, level, every, func in (("print(df) + print(df.info())", None, None, legacy),
+                                          ("Logger, INFO", "INFO", 20, gated),
+                                          ("Logger, DEBUG, 1 in 20", "DEBUG", 20, gated),
+                                          ("Logger, DEBUG, every file", "DEBUG", 1, gated)):
+            log = Logger(log_file=log_file, default_level=level or "INFO", use_queue=True)
+            # The console handler writes to stderr, silenced like the prints
+            with contextlib.redirect_stderr(io.StringIO()):
+                for handler in log.listener.handlers:
+                    if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+                        handler.setStream(io.StringIO())
+                log_writer._sampler = Sampler(every or 1)
+                seconds = best_of(lambda: func(dfs), repeat)
+                log.close()
+            rows_out.append((name, f"{seconds * 1000:.1f}", f"{seconds / files * 1e6:.0f}"))
+
+    print(f"{files} files of {rows} rows, best of {repeat}\n")
+    print_table(rows_out, ("output", "ms", "us/file"))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,56 @@
+"""
+Compare CSV and Parquet to_ingest/ artifacts (serialisation time and size) for every
+cleaned member of the sample archive.
+
+    python benchmarks/bench_output.py [repeat]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+
+from common import ROOT, best_of, print_table, sample_members
+
+from etl.extract import resolve_import
+from etl.load import PARSERS
+from etl.output import serialise_frame
+from etl.plan import compile_plans
+
+
+class SilentLog:
+    def error(self, message):
+        pass
+
+
+def main(repeat: int = 5):
+    with open(os.path.join(ROOT, "tests", "subroutines_config.json")) as f:
+        subroutine_config = json.load(f)
+    compile_plans(subroutine_config)
+
+    rows = []
+    totals = [0.0, 0.0, 0, 0]
+    for name, data in sample_members():
+        file_name = os.path.basename(name)
+        route = resolve_import(subroutine_config, f"extracted/{file_name}", file_name, SilentLog())
+        if route is None or route[0] not in PARSERS:
+            continue
+        func_name, header, customer, server, subroutine_key, digits = route
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = PARSERS[func_name](header, io.BytesIO(data), customer, server, subroutine_key, digits)
+
+        csv_time = best_of(lambda: serialise_frame(df, "csv"), repeat)
+        parquet_time = best_of(lambda: serialise_frame(df, "parquet"), repeat)
+        csv_size = len(serialise_frame(df, "csv")[0])
+        parquet_size = len(serialise_frame(df, "parquet")[0])
+        for i, value in enumerate((csv_time, parquet_time, csv_size, parquet_size)):
+            totals[i] += value
+        rows.append((file_name.split("_", 3)[3], len(df), f"{csv_time * 1000:.2f}", f"{parquet_time * 1000:.2f}",
+                     csv_size, parquet_size, f"{csv_size / parquet_size:.1f}x"))
+
+    rows.append(("TOTAL", "", f"{totals[0] * 1000:.2f}", f"{totals[1] * 1000:.2f}", totals[2], totals[3], f"{totals[2] / totals[3]:.1f}x"))
+    print_table(rows, ("member", "rows", "csv ms", "parquet ms", "csv bytes", "parquet bytes", "smaller"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
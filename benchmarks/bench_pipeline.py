@@ -0,0 +1,176 @@
+"""
+End-to-end benchmark of the transform pipeline on a synthetic archive (synthetic.py)
+with every subroutine of subroutines_config.json: extract_and_create_structure and the
+importers run against an in-process S3 stand-in and a Database writing to a
+CaptureSink (database.sinks). Reports rows/s, MB/s and peak traced memory per stage
+(utils.metrics stages) and per importer.
+
+Timings come from the fastest of ``repeat`` runs; peak memory from one more run under
+tracemalloc, so tracing does not skew them: a stage's peak is the highest traced
+memory since the previous stage ended, a member's the highest of its stages.
+
+    python benchmarks/bench_pipeline.py [rows] [members] [repeat] [page sizes, e.g. 2,4,8,16]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from common import print_table
+from synthetic import build_archive, load_config
+
+from database.influx_writer import Database
+from database.sinks import CaptureSink
+from etl.extract import extract_and_create_structure
+from etl.plan import compile_plans
+from importers.registry import IMPORTERS
+from importers.router import FilenameRouter
+from utils import metrics
+
+CUSTOMER, SERVER = "bench", "db01.plc"
+
+
+class MemoryS3:
+    """S3 stand-in that only counts what is written."""
+
+    def __init__(self):
+        self.objects = 0
+        self.bytes = 0
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects += 1
+        self.bytes += len(Body.read() if hasattr(Body, "read") else Body)
+
+    def upload_file(self, Filename, Bucket, Key):
+        self.objects += 1
+        self.bytes += os.path.getsize(Filename)
+
+
+class SilentLog:
+    def error(self, message):
+        pass
+
+    info = warning = error
+
+
+@contextlib.contextmanager
+def recording(records: list, trace: bool = False):
+    """Collect (stage, member, seconds, rows, bytes, peak) for every stage recorded in the block."""
+    original = metrics.record
+
+    def record(name, seconds, rows=None, bytes=None):
+        peak = None
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        records.append((name, metrics.current_labels().get("member"), seconds, rows, bytes, peak))
+
+    metrics.record = record
+    try:
+        yield
+    finally:
+        metrics.record = original
+
+
+def run_archive(tar_path: str, subroutine_config: dict, trace: bool = False):
+    records = []
+    s3, db = MemoryS3(), Database(sink=CaptureSink())
+    with tempfile.TemporaryDirectory() as workspace, recording(records, trace), contextlib.redirect_stdout(io.StringIO()):
+        if trace:
+            tracemalloc.start()
+        try:
+            with metrics.labels(customer=CUSTOMER, server=SERVER, archive=os.path.basename(tar_path)), metrics.stage("archive", bytes=os.path.getsize(tar_path)):
+                extract_and_create_structure(tar_path, os.path.join(workspace, "extracted"), CUSTOMER, SERVER, s3, SilentLog(), db, subroutine_config)
+                db.flush()
+        finally:
+            if trace:
+                tracemalloc.stop()
+    return records, s3, db
+
+
+def rate(amount, seconds):
+    return f"{amount / seconds:,.0f}" if amount and seconds else "-"
+
+
+def table(totals: dict, peaks: dict):
+    rows = []
+    for key, total in totals.items():
+        size = total["bytes"] / 2**20
+        peak = peaks.get(key)
+        rows.append((key, total["calls"], total["rows"] or "-", f"{size:.2f}" if size else "-", f"{total['seconds'] * 1000:.1f}",
+                     rate(total["rows"], total["seconds"]), f"{size / total['seconds']:.2f}" if size and total["seconds"] else "-",
+                     f"{peak / 2**20:.1f}" if peak else "-"))
+    return rows
+
+
+def new_total():
+    return {"calls": 0, "seconds": 0.0, "rows": 0, "bytes": 0}
+
+
+def main(rows: int = 2000, members: int = 1, repeat: int = 3, page_sizes=(2, 4, 8, 16)):
+    subroutine_config = load_config()
+    compile_plans(subroutine_config)
+    router = FilenameRouter(subroutine_config, IMPORTERS)
+
+    def importer_of(member):
+        route = router.resolve(member, SilentLog()) if member else None
+        return route.func_name if route else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tar_path = os.path.join(tmp, f"{CUSTOMER}_{SERVER}_synthetic.tar")
+        sizes = build_archive(tar_path, subroutine_config, rows=rows, members=members, page_sizes=page_sizes, customer=CUSTOMER, server=SERVER)
+
+        fastest = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            records, s3, db = run_archive(tar_path, subroutine_config)
+            elapsed = time.perf_counter() - started
+            if fastest is None or elapsed < fastest[0]:
+                fastest = (elapsed, records, s3, db)
+        elapsed, records, s3, db = fastest
+        traced, _, _ = run_archive(tar_path, subroutine_config, trace=True)
+
+    stage_peaks, importer_peaks = defaultdict(int), defaultdict(int)
+    for name, member, _, _, _, peak in traced:
+        stage_peaks[name] = max(stage_peaks[name], peak)
+        if importer_of(member):
+            importer_peaks[importer_of(member)] = max(importer_peaks[importer_of(member)], peak)
+    # A member (or the archive) peaks in one of its stages
+    stage_peaks["member"] = max(importer_peaks.values(), default=0)
+    stage_peaks["archive"] = max(stage_peaks.values(), default=0)
+
+    # Per importer: members and their bytes and wall time from the member stage, rows as cleaned
+    stages, importers = defaultdict(new_total), defaultdict(new_total)
+    for name, member, seconds, count, size, _ in records:
+        total = stages[name]
+        total["calls"] += 1
+        total["seconds"] += seconds
+        total["rows"] += count or 0
+        total["bytes"] += size or 0
+
+        importer = importer_of(member)
+        if importer and name == "member":
+            importers[importer]["calls"] += 1
+            importers[importer]["seconds"] += seconds
+            importers[importer]["bytes"] += size or 0
+        elif importer and name == "clean":
+            importers[importer]["rows"] += count or 0
+
+    headers = ("stage", "calls", "rows", "MB", "ms", "rows/s", "MB/s", "peak MiB")
+    print(f"Archive: {len(sizes)} members, {sum(sizes.values()) / 2**20:.1f} MB of logs, {rows} rows per member, "
+          f"{elapsed:.2f} s ({sum(sizes.values()) / 2**20 / elapsed:.2f} MB/s); "
+          f"S3: {s3.objects} objects, {s3.bytes / 2**20:.1f} MB; InfluxDB: {db.sink.lines:,} lines in {db.sink.batches} batches, {db.sink.bytes / 2**20:.1f} MB\n")
+    print_table(table(stages, stage_peaks), headers)
+    print()
+    print_table(table(importers, importer_peaks), ("importer", "members") + headers[2:])
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    if len(sys.argv) > 4:
+        args.append(tuple(int(size) for size in sys.argv[4].split(",")))
+    main(*args)
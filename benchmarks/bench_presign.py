@@ -0,0 +1,96 @@
+"""
+Cost of presigning a day's worth of archives: one presign call per archive (warm
+container, so one head_object each) against one batch call that checks every key with a
+single listing. Runs the real presign handler; POSTs are signed by a real boto3 client
+and the raw bucket is an in-memory stand-in that counts requests. The latency column
+adds ``call ms`` per Lambda invocation and ``request ms`` per S3 request on top of the
+measured handler time, for calls made one after the other.
+
+    python benchmarks/bench_presign.py [call ms] [request ms]
+"""
+import bisect
+import importlib.util
+import json
+import os
+import sys
+import time
+
+from common import ROOT, print_table
+
+PRESIGN_HANDLER = os.path.join(ROOT, "lambdas", "presign", "handler.py")
+
+# Zipped next to the presign handler by bin/build_lambdas.sh
+sys.path.insert(0, os.path.join(ROOT, "lambdas", "shared"))
+PAGE = 1000
+
+
+class CountingS3:
+    def __init__(self, keys, signer):
+        self.keys = sorted(keys)
+        self.signer = signer
+        self.requests = 0
+
+    def head_bucket(self, Bucket):
+        self.requests += 1
+
+    def head_object(self, Bucket, Key):
+        from botocore.exceptions import ClientError
+        self.requests += 1
+        if Key not in self.keys:
+            raise ClientError({"Error": {"Code": "404"}, "ResponseMetadata": {"HTTPStatusCode": 404}}, "HeadObject")
+
+    def list_objects_v2(self, Bucket, Prefix="", StartAfter="", ContinuationToken=None):
+        self.requests += 1
+        start = bisect.bisect_right(self.keys, ContinuationToken or max(StartAfter, Prefix))
+        page = [key for key in self.keys[start:start + PAGE] if key.startswith(Prefix)]
+        truncated = len(page) == PAGE and start + PAGE < len(self.keys)
+        return {"Contents": [{"Key": key} for key in page], "IsTruncated": truncated, "NextContinuationToken": page[-1] if page else None}
+
+    def generate_presigned_post(self, Bucket, Key):
+        return self.signer.generate_presigned_post(Bucket=Bucket, Key=Key)
+
+
+class SSM:
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": "raw"}}
+
+
+def main(call_ms: float = 40.0, request_ms: float = 20.0):
+    import boto3
+
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    spec = importlib.util.spec_from_file_location("presign_handler", PRESIGN_HANDLER)
+    handler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(handler)
+    handler.ssm = SSM()
+    signer = boto3.client("s3", region_name="us-east-1", aws_access_key_id="bench", aws_secret_access_key="bench")
+
+    rows = []
+    for archives in (10, 50, 100):
+        # A day of archives from many servers, next to a few thousand not ingested yet
+        keys = [f"customer{i % 3}.plc_{1728569682 + i}-110000-133000.tar" for i in range(archives)]
+        stored = {f"customer{i % 3}.plc_{1728500000 + i}-110000-133000.tar" for i in range(5000)} | set(keys[::10])
+        for mode in ("per archive", "batch"):
+            handler.s3 = CountingS3(stored, signer)
+            # Warm container: the bucket check is cached by the first call of the day
+            handler.config_cache.invalidate()
+            handler.config_cache.ensure_bucket(handler.s3, "raw")
+            handler.s3.requests = 0
+            started = time.perf_counter()
+            if mode == "batch":
+                calls = 1
+                body = json.loads(handler.handler({"rawPath": "/", "requestContext": {"http": {"method": "POST"}}, "body": json.dumps({"keys": keys})}, None)["body"])
+                signed = len(body["uploads"])
+            else:
+                calls = archives
+                signed = sum(handler.handler({"rawPath": f"/{key}"}, None)["statusCode"] == 200 for key in keys)
+            seconds = time.perf_counter() - started
+            rows.append((archives, mode, signed, calls, handler.s3.requests, f"{seconds * 1000:.1f}",
+                         f"{seconds * 1000 + calls * call_ms + handler.s3.requests * request_ms:,.0f}"))
+
+    print(f"Presigning archives, {call_ms:g} ms per Lambda call and {request_ms:g} ms per S3 request\n")
+    print_table(rows, ("archives", "presign", "signed", "Lambda calls", "S3 requests", "handler ms", "latency ms"))
+
+
+if __name__ == "__main__":
+    main(*[float(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,53 @@
+"""
+Compare pandas type inference + clean_data with the compiled ingestion plans (pyarrow
+CSV reader, declared dtypes) for every import_data member of the sample archive.
+
+    python benchmarks/bench_read.py [repeat]
+"""
+import io
+import json
+import os
+import sys
+
+from common import ROOT, best_of, print_table, sample_members
+
+from etl import load
+from etl.extract import resolve_import
+from etl.plan import compile_plans
+
+
+class SilentLog:
+    def error(self, message):
+        pass
+
+
+def read(data, route, planned):
+    load.USE_INGESTION_PLANS = planned
+    header, customer, server, subroutine_key, digits = route
+    return load.read_data(header, io.BytesIO(data), customer, server, subroutine_key, digits)
+
+
+def main(repeat: int = 5):
+    with open(os.path.join(ROOT, "tests", "subroutines_config.json")) as f:
+        subroutine_config = json.load(f)
+    compile_plans(subroutine_config)
+
+    rows = []
+    total_inferred = total_planned = 0.0
+    for name, data in sample_members():
+        file_name = os.path.basename(name)
+        route = resolve_import(subroutine_config, f"extracted/{file_name}", file_name, SilentLog())
+        if route is None or route[0] != "import_data":
+            continue
+        inferred = best_of(lambda: read(data, route[1:], False), repeat)
+        planned = best_of(lambda: read(data, route[1:], True), repeat)
+        total_inferred += inferred
+        total_planned += planned
+        rows.append((file_name.split("_", 3)[3], f"{inferred * 1000:.2f}", f"{planned * 1000:.2f}", f"{inferred / planned:.1f}x"))
+
+    rows.append(("TOTAL", f"{total_inferred * 1000:.2f}", f"{total_planned * 1000:.2f}", f"{total_inferred / total_planned:.1f}x"))
+    print_table(rows, ("member", "inferred ms", "planned ms", "speedup"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,91 @@
+"""
+Compare the per-member regex passes of the old resolve_import with the compiled
+FilenameRouter on a large synthetic list of member names: a cold pass (every name
+new) and a warm pass (names seen before, e.g. a retried or re-uploaded archive).
+
+    python benchmarks/bench_router.py [repeat] [archives]
+"""
+import json
+import os
+import re
+import sys
+
+from common import ROOT, best_of, print_table
+
+from importers.registry import IMPORTERS
+from importers.router import FilenameRouter
+
+
+class SilentLog:
+    def error(self, message):
+        pass
+
+
+def legacy_resolve(subroutine_config, file_name, log):
+    s3_key = f"extracted/{file_name}"
+    match = re.match(r"^(\S+?)_(\S+?)_(\d{4}-\d{2}-\d{2})_(.*)", s3_key) or \
+            re.match(r"^(\S+?)_(\S+?)_(.*-\d{2}:\d{2}-\d{2}:\d{2})_(.*)", s3_key) or \
+            re.match(r"^(\S+?)_(\S+?)_([^\_]+)_(.*)", s3_key)
+    if not match:
+        log.error(f"Errors for {file_name} no pattern found")
+        return None
+    customer, server, date, subroutine_key = match.groups()
+    customer = re.match(r".*/([^/]+)$", customer).group(1)
+    subroutine_key = re.sub(r"_for_graph", "", subroutine_key)
+    subroutine_key = re.sub(r"_\d+$", "", subroutine_key)
+    subroutine_key = re.sub(r"_\d+.log$", "", subroutine_key)
+    subroutine_key = re.sub(r".log$", "", subroutine_key)
+    match = re.search(r"_(\d+)k", subroutine_key)
+    if match:
+        digits = int(match.group(1))
+        subroutine_key = re.sub(r"_\d+k", "_k", subroutine_key)
+    else:
+        digits = 0
+    if subroutine_key not in subroutine_config:
+        log.error(f"No subroutine found for {subroutine_key}")
+        return None
+    func_name = subroutine_config[subroutine_key]['SUB']
+    importer = globals().get(func_name) or IMPORTERS.get(func_name)
+    return customer, server, subroutine_key, digits, func_name, subroutine_config[subroutine_key]['VALUES']['IMPORT'][0][1], importer
+
+
+def synthetic_names(subroutine_config, archives):
+    """Member names of ``archives`` collections from 10 servers, one member per subroutine."""
+    keys = [key.replace("_k", "_16k") for key in subroutine_config]
+    names = []
+    for archive in range(archives):
+        epoch = 1728569682 + archive * 9000
+        for key in keys:
+            names.append(f"cust{archive % 7}_server{archive % 10}.plc_{epoch}-110000-133000_{key}_1_for_graph.log")
+    return names
+
+
+def main(repeat: int = 3, archives: int = 500):
+    with open(os.path.join(ROOT, "tests", "subroutines_config.json")) as f:
+        subroutine_config = json.load(f)
+    names = synthetic_names(subroutine_config, archives)
+    log = SilentLog()
+
+    legacy = best_of(lambda: [legacy_resolve(subroutine_config, name, log) for name in names], repeat)
+
+    def cold():
+        router = FilenameRouter(subroutine_config, IMPORTERS, cache_size=len(names))
+        return [router.resolve(name, log) for name in names]
+
+    warm_router = FilenameRouter(subroutine_config, IMPORTERS, cache_size=len(names))
+    [warm_router.resolve(name, log) for name in names]
+
+    assert [tuple(route) if route else None for route in cold()] == [legacy_resolve(subroutine_config, name, log) for name in names]
+    router_cold = best_of(cold, repeat)
+    router_warm = best_of(lambda: [warm_router.resolve(name, log) for name in names], repeat)
+
+    per_name = lambda seconds: f"{seconds / len(names) * 1e6:.2f}"
+    print_table([
+        ("legacy regex passes", len(names), f"{legacy * 1000:.1f}", per_name(legacy), "1.0x"),
+        ("router, cold cache", len(names), f"{router_cold * 1000:.1f}", per_name(router_cold), f"{legacy / router_cold:.1f}x"),
+        ("router, warm cache", len(names), f"{router_warm * 1000:.1f}", per_name(router_warm), f"{legacy / router_warm:.1f}x"),
+    ], ("resolver", "names", "ms", "us/name", "speedup"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3, int(sys.argv[2]) if len(sys.argv) > 2 else 500)
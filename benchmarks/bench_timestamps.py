@@ -0,0 +1,50 @@
+"""
+Compare the inferred parse of concatenated "date time" strings clean_data used to run
+with the timestamp engine (known format, each distinct date and time parsed once), on
+the date/time members of the sample archive and on synthetic 10-second samples.
+
+    python benchmarks/bench_timestamps.py [repeat]
+"""
+import io
+import sys
+
+from common import best_of, print_table, sample_members
+
+import pandas as pd
+from etl.timestamps import combine_date_time
+
+
+def legacy(df):
+    return pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str))
+
+
+def engine(df):
+    return combine_date_time(df['date'], df['time'])
+
+
+def synthetic(days):
+    start = pd.Timestamp("2024-10-10")
+    stamps = pd.date_range(start, start + pd.Timedelta(days=days), freq="10s", inclusive="left")
+    return pd.DataFrame({"date": stamps.strftime("%Y-%m-%d"), "time": stamps.strftime("%H:%M:%S")})
+
+
+def main(repeat: int = 5):
+    frames = []
+    for name, data in sample_members():
+        df = pd.read_csv(io.BytesIO(data), header=0)
+        df.columns = df.columns.str.strip()
+        if 'date' in df.columns and 'time' in df.columns and 'onstat-l' not in name:
+            frames.append((name.split("_", 3)[3], df))
+    frames += [(f"synthetic {days}d", synthetic(days)) for days in (1, 7, 30)]
+
+    rows = []
+    for name, df in frames:
+        pd.testing.assert_series_equal(engine(df), legacy(df))
+        before = best_of(lambda: legacy(df), repeat)
+        after = best_of(lambda: engine(df), repeat)
+        rows.append((name, len(df), f"{before * 1000:.2f}", f"{after * 1000:.2f}", f"{before / after:.1f}x"))
+    print_table(rows, ("member", "rows", "inferred ms", "engine ms", "speedup"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,56 @@
+"""
+Compare the iterrows cpu_by_app reshape with the vectorised unpivot_pairs on the sample
+archive's openbet_cpu_by_app member and on larger synthetic wide files.
+
+    python benchmarks/bench_unpivot.py [repeat]
+"""
+import io
+import sys
+
+from common import best_of, print_table, sample_members
+
+import numpy as np
+import pandas as pd
+from etl.reshape import unpivot_pairs
+
+
+def legacy_cpu_by_app(df):
+    data = []
+    for _, row in df.iterrows():
+        timestamp = row[0]
+        for i in range(1, len(row), 2):
+            data.append({
+                "datetime": timestamp,
+                "metric": df.columns[i].replace(" core", ""),
+                "cores": round(row[i], 2),
+                "percentage": round(row[i + 1], 2),
+            })
+    return pd.DataFrame(data)
+
+
+def synthetic_wide(rows, apps, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {"datetime": pd.date_range("2024-10-10", periods=rows, freq="min").strftime("%Y-%m-%d %H:%M:%S")}
+    for app in range(apps):
+        columns[f"APP{app} core"] = np.round(rng.uniform(0, 8, rows), 2)
+        columns[f"APP{app} percentage"] = np.round(rng.uniform(0, 100, rows), 2)
+    return pd.DataFrame(columns)
+
+
+def main(repeat: int = 3):
+    frames = [
+        (name.split("_", 3)[3], pd.read_csv(io.BytesIO(data), header=0))
+        for name, data in sample_members() if "cpu_by_app" in name
+    ]
+    frames += [(f"synthetic {rows}x{apps}", synthetic_wide(rows, apps)) for rows, apps in ((1440, 100), (10000, 200))]
+
+    rows = []
+    for name, df in frames:
+        legacy = best_of(lambda: legacy_cpu_by_app(df), repeat)
+        vectorised = best_of(lambda: unpivot_pairs(df, 2, " core", 2), repeat)
+        rows.append((name, df.shape[0], (df.shape[1] - 1) // 2, f"{legacy * 1000:.1f}", f"{vectorised * 1000:.1f}", f"{legacy / vectorised:.0f}x"))
+    print_table(rows, ("file", "rows", "apps", "iterrows ms", "unpivot ms", "speedup"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,168 @@
+"""
+Upload time of one large archive: the single presigned POST against a multipart upload
+of MULTIPART_PART_SIZE parts PUT in parallel, as website/app.js does. Runs the real
+presign handler (create and complete) against a local HTTP stand-in for the raw bucket
+that receives every connection at ``MB/s per connection``, the way a single TCP stream
+over a long round trip is limited while parallel streams add up.
+
+    python benchmarks/bench_upload.py [size MiB] [MB/s per connection]
+"""
+import concurrent.futures
+import contextlib
+import hashlib
+import http.client
+import importlib.util
+import io
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from common import ROOT, print_table
+
+PRESIGN_HANDLER = os.path.join(ROOT, "lambdas", "presign", "handler.py")
+
+# Zipped next to the presign handler by bin/build_lambdas.sh
+sys.path.insert(0, os.path.join(ROOT, "lambdas", "shared"))
+CHUNK = 256 * 1024
+
+
+class BucketStandIn(BaseHTTPRequestHandler):
+    """POST stores an object, PUT ?uploadId=&partNumber= stores a part; bodies are read at the server's rate."""
+
+    protocol_version = "HTTP/1.1"
+
+    def receive(self) -> bytes:
+        remaining, chunks = int(self.headers["Content-Length"]), []
+        while remaining:
+            chunk = self.rfile.read(min(CHUNK, remaining))
+            remaining -= len(chunk)
+            chunks.append(chunk)
+            time.sleep(len(chunk) / self.server.rate)
+        return b"".join(chunks)
+
+    def reply(self, status: int, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        self.server.objects[urlsplit(self.path).path.lstrip("/")] = self.receive()
+        self.reply(204)
+
+    def do_PUT(self):
+        query = parse_qs(urlsplit(self.path).query)
+        body = self.receive()
+        with self.server.lock:
+            self.server.parts.setdefault(query["uploadId"][0], {})[int(query["partNumber"][0])] = body
+        self.reply(200, [("ETag", f'"{hashlib.md5(body).hexdigest()}"')])
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInS3:
+    """What the presign handler calls, backed by the stand-in server."""
+
+    def __init__(self, server):
+        self.server = server
+        self.base = f"127.0.0.1:{server.server_address[1]}"
+
+    def head_bucket(self, Bucket):
+        pass
+
+    def head_object(self, Bucket, Key):
+        from botocore.exceptions import ClientError
+        raise ClientError({"Error": {"Code": "404"}, "ResponseMetadata": {"HTTPStatusCode": 404}}, "HeadObject")
+
+    def generate_presigned_post(self, Bucket, Key):
+        return {"url": f"http://{self.base}/{Key}", "fields": {"key": Key}}
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {"UploadId": f"upload-{time.perf_counter_ns()}"}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"http://{self.base}/{Params['Key']}?uploadId={Params['UploadId']}&partNumber={Params['PartNumber']}"
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.server.parts.pop(UploadId)
+        self.server.objects[Key] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+
+class SSM:
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": "raw"}}
+
+
+def send(url: str, method: str, body: bytes) -> http.client.HTTPResponse:
+    target = urlsplit(url)
+    connection = http.client.HTTPConnection(target.netloc)
+    connection.request(method, f"{target.path}?{target.query}" if target.query else target.path, body=body)
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response
+
+
+def call(handler, key: str, body=None, **params) -> dict:
+    event = {"rawPath": f"/{key}", "queryStringParameters": params, "body": json.dumps(body) if body is not None else None}
+    with contextlib.redirect_stdout(io.StringIO()):
+        return json.loads(handler.handler(event, None)["body"])
+
+
+def upload_single(handler, key: str, data: bytes):
+    post = call(handler, key)
+    send(post["url"], "POST", data)
+
+
+def upload_multipart(handler, key: str, data: bytes, concurrency: int):
+    upload = call(handler, key, multipart="create", size=str(len(data)))
+    part_size = upload["part_size"]
+
+    def put(part):
+        number = part["PartNumber"]
+        response = send(part["URL"], "PUT", data[(number - 1) * part_size:number * part_size])
+        return {"PartNumber": number, "ETag": response.getheader("ETag")}
+
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        parts = list(pool.map(put, upload["parts"]))
+    call(handler, key, {"parts": parts}, multipart="complete", upload_id=upload["upload_id"])
+
+
+def main(size_mib: int = 128, mb_per_second: float = 25.0):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    spec = importlib.util.spec_from_file_location("presign_handler", PRESIGN_HANDLER)
+    handler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(handler)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BucketStandIn)
+    server.daemon_threads = True
+    server.rate, server.objects, server.parts, server.lock = mb_per_second * 1e6, {}, {}, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    handler.ssm, handler.s3 = SSM(), StandInS3(server)
+
+    data = os.urandom(size_mib * 1024 * 1024)
+    rows = []
+    for name, upload in [("single POST", lambda key: upload_single(handler, key, data))] + [
+            (f"multipart, {concurrency} in parallel", lambda key, concurrency=concurrency: upload_multipart(handler, key, data, concurrency))
+            for concurrency in (1, 4, 8)]:
+        key = f"bench-{len(rows)}.tar"
+        started = time.perf_counter()
+        upload(key)
+        seconds = time.perf_counter() - started
+        assert server.objects.pop(key) == data
+        rows.append((name, f"{seconds:.2f}", f"{size_mib * 1024 * 1024 / seconds / 1e6:.0f}"))
+    server.shutdown()
+
+    parts = -(-size_mib * 1024 * 1024 // handler.part_size_for(size_mib * 1024 * 1024))
+    print(f"{size_mib} MiB archive in {parts} parts of {handler.MULTIPART_PART_SIZE // (1024 * 1024)} MiB, {mb_per_second:g} MB/s per connection\n")
+    print_table(rows, ("upload", "seconds", "MB/s"))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]], *[float(arg) for arg in sys.argv[2:3]])
@@ -0,0 +1,39 @@
+import contextlib
+import io
+import os
+import sys
+import tarfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TRANSFORM_DIR = os.path.join(ROOT, "lambdas", "transform")
+SAMPLE_ARCHIVE = os.path.join(ROOT, "tests", "test_files", "test_customer.plc_1728569682-110000-133000.tar")
+
+# The transform Lambda is packaged flat, so its packages are imported as top-level modules
+sys.path.insert(0, TRANSFORM_DIR)
+
+
+def sample_members(archive_path: str = SAMPLE_ARCHIVE):
+    """Yield (member name, bytes) for every real member of the sample archive."""
+    with tarfile.open(archive_path) as tar:
+        for member in tar.getmembers():
+            if member.isfile() and not os.path.basename(member.name).startswith("._"):
+                yield member.name, tar.extractfile(member).read()
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """Run ``func`` ``repeat`` times with stdout silenced and return the fastest wall time in seconds."""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def print_table(rows, headers):
+    widths = [max(len(str(row[i])) for row in rows + [headers]) for i in range(len(headers))]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
@@ -0,0 +1,134 @@
+"""
+Synthetic collector archives built from subroutines_config.json.
+
+Every subroutine gets members in the layout its importer expects: date,time CSVs with
+the configured value columns (import_data), headerless partition dumps
+(import_partitions), wide "<app> core,<app> percentage" logs (import_unpivot) and
+onstat -l logs (import_data_onstat_l). Rows are 10-second samples; counters grow,
+gauges wander, string columns cycle through a few values. Used by bench_pipeline.py:
+
+    from synthetic import build_archive, load_config
+    build_archive(path, load_config(), rows=2000, members=1, page_sizes=(2, 4, 8, 16))
+"""
+import io
+import json
+import os
+import tarfile
+
+import numpy as np
+import pandas as pd
+
+from common import ROOT
+
+CONFIG_PATH = os.path.join(ROOT, "tests", "subroutines_config.json")
+
+# Start of the first sample and the collection window in the member names
+START = pd.Timestamp("2024-10-10 11:00:00")
+EPOCH = 1728569682
+WINDOW = "110000-133000"
+
+# Entities of the wide cpu_by_app logs, partitions per sample of the partition dumps
+APPS = ("TOTAL", "STLENGINE", "RETAIL_INTRFC", "OB_FEED_REQ", "OB_BET_PLACE", "OB_CASHOUT", "OB_SETTLE", "OB_PUSH")
+PARTITIONS = 16
+STRING_VALUES = ("OK", "ACTIVE", "Connected", "WARNING DBLOCKS 8")
+
+
+def load_config(path: str = CONFIG_PATH) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def sample_times(rows: int, offset: int = 0) -> pd.DatetimeIndex:
+    return pd.date_range(START + pd.Timedelta(seconds=10 * offset), periods=rows, freq="10s")
+
+
+def value_column(rng, rows: int, index: int) -> np.ndarray:
+    """Monotonic counters and two-decimal gauges, alternating by column."""
+    if index % 2 == 0:
+        return np.cumsum(rng.integers(0, 5000, size=rows)) + rng.integers(0, 10**9)
+    return np.round(rng.uniform(0, 100, size=rows), 2)
+
+
+def import_data_member(entry: dict, rows: int, rng, page_size: int = None, offset: int = 0) -> bytes:
+    value_names = entry['VALUES']['IMPORT'][0][1].split(',')[1:]
+    types = entry.get('TYPES', {})
+    stamps = sample_times(rows, offset)
+    df = pd.DataFrame({"date": stamps.strftime("%Y-%m-%d"), "time": stamps.strftime("%H:%M:%S")})
+    for i, name in enumerate(value_names):
+        if types.get(name) == "string":
+            df[name] = np.array(STRING_VALUES)[np.arange(rows) % len(STRING_VALUES)]
+        elif i == 0 and page_size is not None:
+            df[name] = page_size
+        else:
+            df[name] = value_column(rng, rows, i)
+    return df.to_csv(index=False).encode()
+
+
+def partitions_member(rows: int, rng, offset: int = 0) -> bytes:
+    """Headerless dump of PARTITIONS partitions per sample, ``rows`` lines in total."""
+    stamps = sample_times(-(-rows // PARTITIONS), offset).repeat(PARTITIONS)[:rows]
+    counters = rng.integers(0, 10**9, size=(rows, 18))
+    df = pd.DataFrame(counters[:, :5], columns=[f"c{i}" for i in range(5)])
+    df.insert(0, "time", stamps.strftime("%H:%M:%S"))
+    df.insert(0, "date", stamps.strftime("%Y-%m-%d"))
+    df["flgs"] = 2049
+    for i in range(5, 18):
+        df[f"c{i}"] = counters[:, i]
+    df["area"] = [f"db{i % PARTITIONS}" for i in range(rows)]
+    return df.to_csv(index=False, header=False).encode()
+
+
+def unpivot_member(rows: int, rng, offset: int = 0) -> bytes:
+    df = pd.DataFrame({"datetime": sample_times(rows, offset).strftime("%Y-%m-%d %H:%M:%S")})
+    for app in APPS:
+        df[f"{app} core"] = np.round(rng.uniform(0, 8, size=rows), 2)
+        df[f"{app} percentage"] = np.round(rng.uniform(0, 100, size=rows), 2)
+    return df.to_csv(index=False).encode()
+
+
+def onstat_l_member(rows: int, rng, offset: int = 0) -> bytes:
+    stamps = sample_times(rows, offset)
+    lines = ["date,time,epoch,pbuffer,pbufused,pbufsize,pusedpct,lbuffer,lbufused"]
+    used = rng.integers(0, 1024, size=(rows, 2))
+    for stamp, (pused, lused) in zip(stamps, used):
+        lines.append(f"{stamp:%Y-%m-%d},{stamp:%H:%M:%S},{int(stamp.timestamp())},P-1,{pused},1024,{pused / 10.24:.2f},L-1,{lused % 256},256,{lused % 256 / 2.56:.2f}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def subroutine_members(subroutine_key: str, entry: dict, rows: int, members: int, page_sizes, rng):
+    """Yield (member name, bytes) for ``members`` consecutive windows of a subroutine."""
+    keys = [(subroutine_key.replace("_k", f"_{size}k"), size) for size in page_sizes] if "_k" in subroutine_key else [(subroutine_key, None)]
+    for key, page_size in keys:
+        for member in range(members):
+            offset = member * rows
+            if entry['SUB'] == "import_partitions":
+                data = partitions_member(rows, rng, offset)
+            elif entry['SUB'] in ("import_unpivot", "cpu_by_app"):
+                data = unpivot_member(rows, rng, offset)
+            elif entry['SUB'] == "import_data_onstat_l":
+                data = onstat_l_member(rows, rng, offset)
+            else:
+                data = import_data_member(entry, rows, rng, page_size, offset)
+            yield f"{key}_{member + 1}_for_graph.log", data
+
+
+def archive_members(subroutine_config: dict, rows: int = 2000, members: int = 1, page_sizes=(2, 4, 8, 16),
+                    customer: str = "bench", server: str = "db01.plc", seed: int = 0):
+    """Yield (member name, bytes) for every subroutine of the config."""
+    rng = np.random.default_rng(seed)
+    prefix = f"{customer}_{server}_{EPOCH}-{WINDOW}_"
+    for subroutine_key, entry in subroutine_config.items():
+        for name, data in subroutine_members(subroutine_key, entry, rows, members, page_sizes, rng):
+            yield prefix + name, data
+
+
+def build_archive(path: str, subroutine_config: dict, **kwargs) -> dict:
+    """Write a tar archive of ``archive_members(**kwargs)`` to ``path``; returns bytes by member name."""
+    sizes = {}
+    with tarfile.open(path, "w") as tar:
+        for name, data in archive_members(subroutine_config, **kwargs):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+            sizes[name] = len(data)
+    return sizes
@@ -1,7 +1,8 @@
 #!/bin/bash
 
-(cd lambdas/presign; rm -f lambda.zip; zip lambda.zip handler.py)
-(cd lambdas/list; rm -f lambda.zip; zip lambda.zip handler.py)
+# The Lambdas share the modules in lambdas/shared (zipped at the root, next to handler.py)
+(cd lambdas/presign; rm -f lambda.zip; zip lambda.zip handler.py; zip -j lambda.zip ../shared/*.py)
+(cd lambdas/list; rm -f lambda.zip; zip lambda.zip handler.py; zip -j lambda.zip ../shared/*.py)
 (
 cd lambdas/transform
 rm -rf package lambda.zip
@@ -22,5 +23,6 @@ zip  lambda.zip database/*
 zip  lambda.zip utils/*
 zip  lambda.zip configs/*
 zip  lambda.zip importers/*
+zip -j lambda.zip ../shared/*.py
 rm -rf package
 )
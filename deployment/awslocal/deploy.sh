@@ -5,6 +5,15 @@
 awslocal s3 mb s3://localstack-s3etl-app-raw
 awslocal s3 mb s3://localstack-s3etl-app-processed
 
+# The web app PUTs multipart upload parts straight to the raw bucket and reads their ETag
+awslocal s3api put-bucket-cors \
+    --bucket localstack-s3etl-app-raw \
+    --cors-configuration '{"CORSRules": [{"AllowedOrigins": ["*"], "AllowedMethods": ["GET", "PUT", "POST"], "AllowedHeaders": ["*"], "ExposeHeaders": ["ETag"]}]}'
+# Parts of uploads that are never completed or aborted are dropped after a day
+awslocal s3api put-bucket-lifecycle-configuration \
+    --bucket localstack-s3etl-app-raw \
+    --lifecycle-configuration '{"Rules": [{"ID": "abort-incomplete-uploads", "Status": "Enabled", "Filter": {"Prefix": ""}, "AbortIncompleteMultipartUpload": {"DaysAfterInitiation": 1}}]}'
+
 awslocal ssm put-parameter --name /localstack-s3etl-app/buckets/raw --type "String" --value "localstack-s3etl-app-raw"
 awslocal ssm put-parameter --name /localstack-s3etl-app/buckets/processed --type "String" --value "localstack-s3etl-app-processed"
 
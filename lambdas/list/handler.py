@@ -1,9 +1,14 @@
+import base64
+import json
 import os
 import typing
 import boto3
 import datetime
 from zoneinfo import ZoneInfo
 
+import config_cache
+import manifest_reader
+
 if typing.TYPE_CHECKING:
     from mypy_boto3_s3 import S3Client
     from mypy_boto3_ssm import SSMClient
@@ -16,21 +21,45 @@ if os.getenv("STAGE") == "local":
 s3: "S3Client" = boto3.client("s3", endpoint_url=endpoint_url)
 ssm: "SSMClient" = boto3.client("ssm", endpoint_url=endpoint_url)
 
+# Processed artifacts are read from the time-partitioned manifest the transform Lambda
+# writes (lambdas/shared/manifest_reader.py), so a page load reads the partitions of
+# the last RECENT_MINUTES only; "scan" lists the whole processed bucket instead.
+PROCESSED_LISTING = os.getenv("PROCESSED_LISTING", "manifest")
+RECENT_MINUTES = float(os.getenv("RECENT_MINUTES", "10"))
+
+# Internal state of the transform Lambda in the processed bucket, not artifacts
+INTERNAL_PREFIXES = ("ledger/", manifest_reader.MANIFEST_PREFIX)
+
+# Files per page of the list API, unless the request asks for another page_size (up
+# to LIST_MAX_PAGE_SIZE); only the returned page is signed
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "50"))
+LIST_MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "500"))
+
+# Longest since/until window a request may read from the manifest, in hours
+LIST_MAX_WINDOW_HOURS = float(os.getenv("LIST_MAX_WINDOW_HOURS", "168"))
+
+# Lifetime of the presigned GET URLs, in seconds
+URL_EXPIRES_IN = 3600
+
+# Buckets the sign endpoint signs for, by the name the list API reports them under
+SIGNABLE = ("Raw", "Processed")
+
+# Bucket names are cached for CONFIG_TTL_SECONDS by the warm container (config_cache)
 def get_bucket_name_files() -> str:
-    parameter = ssm.get_parameter(Name="/localstack-s3etl-app/buckets/raw")
-    return parameter["Parameter"]["Value"]
+    return config_cache.get_parameter(ssm, "/localstack-s3etl-app/buckets/raw")
 
 def get_bucket_name_processed() -> str:
-    parameter = ssm.get_parameter(Name="/localstack-s3etl-app/buckets/processed")
-    return parameter["Parameter"]["Value"]
+    return config_cache.get_parameter(ssm, "/localstack-s3etl-app/buckets/processed")
 
-def list_all_files(bucket_name: str) -> typing.List[dict]:
-    """Lists all files in the specified bucket."""
+def list_all_files(bucket_name: str, prefix: str = None) -> typing.List[dict]:
+    """Lists all files in the specified bucket, or those under ``prefix``."""
     result = []
     continuation_token = None
 
     while True:
         list_params = {"Bucket": bucket_name}
+        if prefix:
+            list_params["Prefix"] = prefix
         if continuation_token:
             list_params["ContinuationToken"] = continuation_token
 
@@ -46,72 +75,190 @@ def list_all_files(bucket_name: str) -> typing.List[dict]:
 
     return result
 
-def handler(event, context):
-    # Get raw bucket name
-    raw_bucket = get_bucket_name_files()
+def manifest_files(bucket_name: str, since: datetime.datetime, until: datetime.datetime) -> typing.List[dict]:
+    """
+    Objects placed in the processed bucket from ``since`` to ``until``, read from the
+    manifest partitions of those hours only (see manifest_reader.read_window), in the
+    shape of list_objects_v2 entries.
+    """
+    return [
+        {"Key": entry["Key"], "Size": entry["Size"], "LastModified": datetime.datetime.fromisoformat(entry["Timestamp"])}
+        for entry in manifest_reader.read_window(s3, bucket_name, since, until)
+    ]
 
-    # Recursively list all files in the raw bucket
-    raw_files = list_all_files(raw_bucket)
+def response(status: int, body) -> dict:
+    return {"statusCode": status, "headers": {"Content-Type": "application/json"}, "body": json.dumps(body)}
+
+def presign(bucket_name: str, key: str) -> str:
+    return s3.generate_presigned_url(
+        ClientMethod="get_object",
+        Params={"Bucket": bucket_name, "Key": key},
+        ExpiresIn=URL_EXPIRES_IN,
+    )
+
+def timestamp(moment: datetime.datetime) -> str:
+    """ISO 8601 in UTC with microseconds, so raw and manifest timestamps order as strings."""
+    return moment.replace(tzinfo=moment.tzinfo or ZoneInfo("UTC")).astimezone(ZoneInfo("UTC")).isoformat(timespec="microseconds")
+
+def parse_time(value: str) -> datetime.datetime:
+    moment = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return moment.astimezone(ZoneInfo("UTC")) if moment.tzinfo else moment.replace(tzinfo=ZoneInfo("UTC"))
+
+def encode_cursor(item: dict) -> str:
+    """Opaque position after ``item``; pages stay stable while newer files arrive."""
+    return base64.urlsafe_b64encode(json.dumps([item["Timestamp"], item["Key"]]).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not (isinstance(position, list) and len(position) == 2 and all(isinstance(value, str) for value in position)):
+        raise ValueError("malformed cursor")
+    return tuple(position)
+
+def collect_files(raw_bucket: str, processed_bucket: str, prefix: str, since: datetime.datetime, until: datetime.datetime, window_given: bool) -> typing.List[dict]:
+    """
+    Unsigned list items (one per key, with its Raw and/or Processed object) under
+    ``prefix``. Processed objects are those placed from ``since`` to ``until``; raw
+    objects (archives not ingested yet) are filtered by time only when the request gave
+    a window.
+    """
     result = {}
 
+    # Recursively list all files in the raw bucket
+    raw_files = list_all_files(raw_bucket, prefix)
     if not raw_files:
         print(f"Bucket {raw_bucket} is empty")
 
     # Collect the original files from the raw bucket
     for obj in raw_files:
+        if window_given and not since <= obj["LastModified"] <= until:
+            continue
         key = obj["Key"]
-        if key not in result:
-            result[key] = {}  # Initialize the key in the result dictionary
-
-        result[key]["Raw"] = {
+        result.setdefault(key, {"Key": key})["Raw"] = {
             "Name": key,
-            "Timestamp": obj["LastModified"].isoformat(),
-            "Original": {
-                "Size": obj["Size"],
-                "URL": s3.generate_presigned_url(
-                    ClientMethod="get_object",
-                    Params={"Bucket": raw_bucket, "Key": key},
-                    ExpiresIn=3600,
-                ),
-            },
+            "Timestamp": timestamp(obj["LastModified"]),
+            "Original": {"Size": obj["Size"]},
         }
 
-    # Get the processed bucket name
-    processed_bucket = get_bucket_name_processed()
-
-    # Get the current time in UTC using ZoneInfo
-    now = datetime.datetime.utcnow().replace(tzinfo=ZoneInfo("UTC"))
-    ten_minutes_ago = now - datetime.timedelta(minutes=10)
-
-    # Recursively list all files in the processed bucket
-    processed_files = list_all_files(processed_bucket)
+    if PROCESSED_LISTING == "scan":
+        # Recursively list all files in the processed bucket
+        processed_files = list_all_files(processed_bucket, prefix)
+    else:
+        processed_files = manifest_files(processed_bucket, since, until)
 
     for obj in processed_files:
         # Ensure obj["LastModified"] is timezone-aware, using ZoneInfo
         obj_last_modified = obj["LastModified"].replace(tzinfo=ZoneInfo("UTC"))
         key = obj["Key"]
 
-        # Skip files that are older than 10 minutes
-        if obj_last_modified < ten_minutes_ago:
+        # The transform's ingestion ledger and manifest are internal state, not artifacts
+        if key.startswith(INTERNAL_PREFIXES) or (prefix and not key.startswith(prefix)):
             continue
 
-        key = obj["Key"]
-        if key not in result:
-            result[key] = {}  # Initialize the key in the result dictionary if not already present
+        # Skip files outside the window (by default older than RECENT_MINUTES)
+        if not since <= obj_last_modified <= until:
+            continue
 
-        result[key]["Processed"] = {
+        result.setdefault(key, {"Key": key})["Processed"] = {
             "Size": obj["Size"],
             "Name": key,
-            "Timestamp": obj["LastModified"].isoformat(),
-            "URL": s3.generate_presigned_url(
-                ClientMethod="get_object",
-                Params={"Bucket": processed_bucket, "Key": key},
-                ExpiresIn=3600,
-            ),
+            "Timestamp": timestamp(obj_last_modified),
         }
 
-    # Return the result sorted by timestamp (newest first)
-    return list(sorted(result.values(), key=lambda k: k.get("Timestamp", ""), reverse=True))
+    for item in result.values():
+        item["Timestamp"] = max(item[side]["Timestamp"] for side in SIGNABLE if side in item)
+    return list(result.values())
+
+def page_of(items: typing.List[dict], cursor: str, page_size: int) -> tuple:
+    """The page after ``cursor`` (newest first, then by key) and the cursor of the next page, None on the last."""
+    ordered = sorted(items, key=lambda item: (item["Timestamp"], item["Key"]), reverse=True)
+    if cursor:
+        position = decode_cursor(cursor)
+        ordered = [item for item in ordered if (item["Timestamp"], item["Key"]) < position]
+    page = ordered[:page_size]
+    return page, encode_cursor(page[-1]) if len(ordered) > page_size else None
+
+def sign_items(items: typing.List[dict], raw_bucket: str, processed_bucket: str) -> None:
+    """Add the presigned GET URLs to the items of a page."""
+    for item in items:
+        if "Raw" in item:
+            item["Raw"]["Original"]["URL"] = presign(raw_bucket, item["Key"])
+        if "Processed" in item:
+            item["Processed"]["URL"] = presign(processed_bucket, item["Key"])
+
+def sign_keys(body: dict) -> dict:
+    """
+    On-demand signing: ``{"keys": [{"bucket": "Raw"|"Processed", "key": ...}]}`` returns
+    ``{"urls": [{"bucket", "key", "url"}]}`` in the same order.
+    """
+    keys = body.get("keys") if isinstance(body, dict) else None
+    if not isinstance(keys, list) or not all(isinstance(entry, dict) and entry.get("bucket") in SIGNABLE and isinstance(entry.get("key"), str) for entry in keys):
+        return response(400, {"error": f"expected {{\"keys\": [{{\"bucket\": one of {list(SIGNABLE)}, \"key\": ...}}]}}"})
+    if len(keys) > LIST_MAX_PAGE_SIZE:
+        return response(400, {"error": f"at most {LIST_MAX_PAGE_SIZE} keys per call"})
+    # Like the listing, never hand out the transform's ledger or manifest
+    internal = [entry["key"] for entry in keys if entry["key"].startswith(INTERNAL_PREFIXES)]
+    if internal:
+        return response(400, {"error": f"keys under {', '.join(INTERNAL_PREFIXES)} cannot be signed: {', '.join(internal)}"})
+
+    buckets = {}
+    urls = []
+    for entry in keys:
+        if entry["bucket"] not in buckets:
+            buckets[entry["bucket"]] = get_bucket_name_files() if entry["bucket"] == "Raw" else get_bucket_name_processed()
+        urls.append({"bucket": entry["bucket"], "key": entry["key"], "url": presign(buckets[entry["bucket"]], entry["key"])})
+    return response(200, {"urls": urls})
+
+def handler(event, context):
+    """
+    GET: one page of files, newest first, as ``{"items": [...], "next_cursor": ...}``.
+    Query parameters (all optional):
+
+        page_size  files per page (LIST_PAGE_SIZE, at most LIST_MAX_PAGE_SIZE)
+        cursor     next_cursor of the previous page
+        prefix     only keys starting with it
+        since      ISO 8601 start of the window (default: RECENT_MINUTES ago)
+        until      ISO 8601 end of the window (default: now)
+        sign       "0" to leave the URLs out; POST /sign signs keys on demand
+
+    POST /sign: presigned GET URLs for the given keys (see sign_keys).
+    """
+    event = event or {}
+    method = event.get("requestContext", {}).get("http", {}).get("method", "GET")
+    if method == "POST":
+        if event.get("rawPath", "/").rstrip("/") != "/sign":
+            return response(404, {"error": f"unknown path {event.get('rawPath')}"})
+        body = event.get("body") or "{}"
+        if event.get("isBase64Encoded"):
+            body = base64.b64decode(body).decode()
+        try:
+            return sign_keys(json.loads(body))
+        except json.JSONDecodeError:
+            return response(400, {"error": "body is not JSON"})
+
+    params = event.get("queryStringParameters") or {}
+    # Get the current time in UTC using ZoneInfo
+    now = datetime.datetime.utcnow().replace(tzinfo=ZoneInfo("UTC"))
+    try:
+        page_size = int(params.get("page_size", LIST_PAGE_SIZE))
+        if not 1 <= page_size <= LIST_MAX_PAGE_SIZE:
+            raise ValueError(f"page_size must be between 1 and {LIST_MAX_PAGE_SIZE}")
+        until = parse_time(params["until"]) if params.get("until") else now
+        since = parse_time(params["since"]) if params.get("since") else until - datetime.timedelta(minutes=RECENT_MINUTES)
+        if since > until or until - since > datetime.timedelta(hours=LIST_MAX_WINDOW_HOURS):
+            raise ValueError(f"since must be before until and at most {LIST_MAX_WINDOW_HOURS:g} hours earlier")
+        if params.get("cursor"):
+            decode_cursor(params["cursor"])
+    except (ValueError, TypeError) as e:
+        return response(400, {"error": str(e)})
+
+    raw_bucket = get_bucket_name_files()
+    processed_bucket = get_bucket_name_processed()
+    items = collect_files(raw_bucket, processed_bucket, params.get("prefix") or "", since, until, bool(params.get("since") or params.get("until")))
+    page, next_cursor = page_of(items, params.get("cursor"), page_size)
+    if params.get("sign", "1") != "0":
+        sign_items(page, raw_bucket, processed_bucket)
+
+    return response(200, {"items": page, "next_cursor": next_cursor, "since": timestamp(since), "until": timestamp(until)})
 
 if __name__ == "__main__":
     print(handler(None, None))
@@ -1,10 +1,14 @@
+import base64
 import json
+import math
 import os
 import typing
 
 import boto3
 from botocore.exceptions import ClientError
 
+import config_cache
+
 if typing.TYPE_CHECKING:
     from mypy_boto3_s3 import S3Client
     from mypy_boto3_ssm import SSMClient
@@ -17,32 +21,223 @@ if os.getenv("STAGE") == "local":
 s3: "S3Client" = boto3.client("s3", endpoint_url=endpoint_url)
 ssm: "SSMClient" = boto3.client("ssm", endpoint_url=endpoint_url)
 
+# Part size of multipart uploads, raised for files that would need more than
+# MULTIPART_MAX_PARTS parts. S3 requires at least 5 MiB for every part but the last.
+MULTIPART_PART_SIZE = max(int(os.getenv("MULTIPART_PART_SIZE", str(16 * 1024 * 1024))), 5 * 1024 * 1024)
+MULTIPART_MAX_PARTS = 10000
+MULTIPART_MAX_PART_SIZE = 5 * 1024 ** 3
+
+# Lifetime of the presigned part URLs, in seconds; ?multipart=sign signs parts again
+PART_URL_EXPIRES_IN = int(os.getenv("PART_URL_EXPIRES_IN", "3600"))
+
+# Most keys a batch call (POST / with {"keys": [...]}) presigns
+PRESIGN_BATCH_MAX_KEYS = int(os.getenv("PRESIGN_BATCH_MAX_KEYS", "100"))
+
 
 def get_bucket_name() -> str:
-    parameter = ssm.get_parameter(Name="/localstack-s3etl-app/buckets/raw")
-    return parameter["Parameter"]["Value"]
+    # Cached for CONFIG_TTL_SECONDS by the warm container (config_cache)
+    return config_cache.get_parameter(ssm, "/localstack-s3etl-app/buckets/raw")
+
+
+def json_response(status: int, body) -> dict:
+    return {"statusCode": status, "body": json.dumps(body)}
+
+
+def error_response(e: ClientError) -> dict:
+    """Report an S3 error of a multipart call (unknown upload, invalid part list...) with its own status."""
+    error = e.response.get("Error", {})
+    status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 500
+    return {"statusCode": status, "body": f"{error.get('Code')}: {error.get('Message')}"}
+
+
+def object_exists(bucket: str, key: str) -> bool:
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response["ResponseMetadata"]["HTTPStatusCode"] != 404:
+            raise
+        return False
+
+
+def existing_keys(bucket: str, keys: typing.List[str]) -> typing.Set[str]:
+    """
+    Which of ``keys`` exist, from one listing of their common prefix. The listing starts
+    just before the smallest key and stops once it is past the largest, so it is a
+    single request unless many other objects sort between them.
+    """
+    wanted, found = set(keys), set()
+    first, last = min(keys), max(keys)
+    params = {"Bucket": bucket, "Prefix": os.path.commonprefix(keys)}
+    # A proper prefix of the smallest key sorts right before it
+    if first[:-1]:
+        params["StartAfter"] = first[:-1]
+    while True:
+        response = s3.list_objects_v2(**params)
+        contents = response.get("Contents", [])
+        found.update(obj["Key"] for obj in contents if obj["Key"] in wanted)
+        if not response.get("IsTruncated") or (contents and contents[-1]["Key"] >= last):
+            return found
+        params["ContinuationToken"] = response["NextContinuationToken"]
+
+
+def presign_batch(bucket: str, event) -> dict:
+    """
+    Presigned POSTs for many keys in one call: ``{"keys": [...]}`` returns
+    ``{"uploads": [{"key", "url", "fields"}], "existing": [...]}``, in the order of the
+    request; keys that already exist are listed instead of signed.
+    """
+    try:
+        keys = read_body(event).get("keys")
+        if not isinstance(keys, list) or not keys or not all(isinstance(key, str) and key.strip("/") for key in keys):
+            raise ValueError('expected {"keys": ["<key>", ...]}')
+        keys = [key.lstrip("/") for key in keys]
+        if len(keys) > PRESIGN_BATCH_MAX_KEYS:
+            raise ValueError(f"at most {PRESIGN_BATCH_MAX_KEYS} keys per call")
+        if len(set(keys)) != len(keys):
+            raise ValueError("keys must be unique")
+    except ValueError as e:
+        return {"statusCode": 400, "body": str(e)}
+
+    existing = existing_keys(bucket, keys)
+    uploads = [dict(s3.generate_presigned_post(Bucket=bucket, Key=key), key=key) for key in keys if key not in existing]
+    return json_response(200, {"uploads": uploads, "existing": [key for key in keys if key in existing]})
+
+
+def part_size_for(size: int) -> int:
+    """MULTIPART_PART_SIZE, or the smallest size (in MiB) that fits ``size`` bytes in MULTIPART_MAX_PARTS parts."""
+    mib = 1024 * 1024
+    return max(MULTIPART_PART_SIZE, math.ceil(size / MULTIPART_MAX_PARTS / mib) * mib)
+
+
+def sign_parts(bucket: str, key: str, upload_id: str, part_numbers: typing.Iterable[int]) -> typing.List[dict]:
+    """Presigned PUT URLs of ``part_numbers``; signing is local, no request to S3."""
+    return [
+        {
+            "PartNumber": number,
+            "URL": s3.generate_presigned_url(
+                ClientMethod="upload_part",
+                Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": number},
+                ExpiresIn=PART_URL_EXPIRES_IN,
+            ),
+        }
+        for number in part_numbers
+    ]
+
+
+def uploaded_parts(bucket: str, key: str, upload_id: str) -> typing.List[dict]:
+    """The parts S3 has received for the upload, in order."""
+    parts, marker = [], None
+    while True:
+        params = {"Bucket": bucket, "Key": key, "UploadId": upload_id}
+        if marker:
+            params["PartNumberMarker"] = marker
+        response = s3.list_parts(**params)
+        parts.extend({"PartNumber": part["PartNumber"], "ETag": part["ETag"], "Size": part["Size"]} for part in response.get("Parts", []))
+        if not response.get("IsTruncated"):
+            return parts
+        marker = response["NextPartNumberMarker"]
+
+
+def parse_part_numbers(value: str) -> typing.List[int]:
+    """``1,2,5-8`` as part numbers."""
+    numbers = []
+    for item in filter(None, (value or "").split(",")):
+        first, _, last = item.partition("-")
+        numbers.extend(range(int(first), int(last or first) + 1))
+    if not numbers or len(numbers) > MULTIPART_MAX_PARTS or not all(1 <= number <= MULTIPART_MAX_PARTS for number in numbers):
+        raise ValueError(f"parts must be part numbers between 1 and {MULTIPART_MAX_PARTS}, e.g. 1,2,5-8")
+    return numbers
+
+
+def read_body(event) -> dict:
+    body = event.get("body") or "{}"
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode()
+    body = json.loads(body)
+    if not isinstance(body, dict):
+        raise ValueError("body must be a JSON object")
+    return body
+
+
+def multipart(action: str, bucket: str, key: str, event) -> dict:
+    """
+    Multipart uploads through the same function URL, selected with ``?multipart=``:
+
+        create    ?size=<bytes>: start the upload and sign the URLs of all its parts,
+                  {"key", "upload_id", "part_size", "parts": [{"PartNumber", "URL"}]}
+        sign      ?upload_id=...&parts=1,2,5-8: sign those parts again (expired URLs, resume)
+        parts     ?upload_id=...: the parts received so far, [{"PartNumber", "ETag", "Size"}]
+        complete  ?upload_id=... with {"parts": [{"PartNumber", "ETag"}]} as body; without
+                  a part list the parts received by S3 are used
+        abort     ?upload_id=...: drop the upload and its parts
+
+    The client PUTs each part to its URL, in parallel, and keeps the ETag of the response.
+    """
+    params = event.get("queryStringParameters") or {}
+    try:
+        if action == "create":
+            size = int(params.get("size", ""))
+            if size <= 0 or size > MULTIPART_MAX_PARTS * MULTIPART_MAX_PART_SIZE:
+                raise ValueError(f"size must be between 1 and {MULTIPART_MAX_PARTS * MULTIPART_MAX_PART_SIZE} bytes")
+            if object_exists(bucket, key):
+                return {"statusCode": 409, "body": f"{bucket}/{key} already exists"}
+            part_size = part_size_for(size)
+            upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+            parts = sign_parts(bucket, key, upload_id, range(1, math.ceil(size / part_size) + 1))
+            return json_response(200, {"key": key, "upload_id": upload_id, "part_size": part_size, "parts": parts})
+
+        upload_id = params.get("upload_id")
+        if not upload_id:
+            raise ValueError("upload_id is required")
+        if action == "sign":
+            return json_response(200, {"parts": sign_parts(bucket, key, upload_id, parse_part_numbers(params.get("parts")))})
+        if action == "parts":
+            return json_response(200, {"parts": uploaded_parts(bucket, key, upload_id)})
+        if action == "complete":
+            parts = read_body(event).get("parts") or uploaded_parts(bucket, key, upload_id)
+            if not all(isinstance(part, dict) and isinstance(part.get("PartNumber"), int) and isinstance(part.get("ETag"), str) for part in parts):
+                raise ValueError('parts must be [{"PartNumber": <int>, "ETag": <str>}]')
+            parts = sorted(({"PartNumber": part["PartNumber"], "ETag": part["ETag"]} for part in parts), key=lambda part: part["PartNumber"])
+            s3.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts})
+            return json_response(200, {"key": key, "parts": len(parts)})
+        if action == "abort":
+            s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            return json_response(200, {"key": key, "aborted": upload_id})
+    except (ValueError, TypeError) as e:
+        return {"statusCode": 400, "body": str(e)}
+    except ClientError as e:
+        return error_response(e)
+    return {"statusCode": 400, "body": f"unknown multipart action {action}"}
 
 
 def handler(event, context):
+    params = event.get("queryStringParameters") or {}
+    # ?refresh=1 drops the cached parameter and bucket check, e.g. after the buckets were recreated
+    if params.get("refresh"):
+        config_cache.invalidate()
+
     bucket = get_bucket_name()
 
     key = event["rawPath"].lstrip("/")
-    if not key:
+    method = event.get("requestContext", {}).get("http", {}).get("method", "GET")
+    if not key and method != "POST":
         raise ValueError("no key given")
 
-    # make sure the bucket exists
-    try: 
-        s3.head_bucket(Bucket=bucket)
-    except Exception:
-        s3.create_bucket(Bucket=bucket)
+    # make sure the bucket exists (checked once per CONFIG_TTL_SECONDS)
+    config_cache.ensure_bucket(s3, bucket)
+
+    # many archives at once: a POST to / with {"keys": [...]} (see presign_batch)
+    if not key:
+        return presign_batch(bucket, event)
+
+    # large archives are uploaded in parts (see multipart)
+    if params.get("multipart"):
+        return multipart(params["multipart"], bucket, key, event)
 
     # make sure the object does not exist
-    try:
-        s3.head_object(Bucket=bucket, Key=key)
+    if object_exists(bucket, key):
         return {"statusCode": 409, "body": f"{bucket}/{key} already exists"}
-    except ClientError as e:
-        if e.response["ResponseMetadata"]["HTTPStatusCode"] != 404:
-            raise
 
     # generate the pre-signed POST url
     url = s3.generate_presigned_post(Bucket=bucket, Key=key)
@@ -0,0 +1,75 @@
+"""
+Warm-container cache of the configuration lookups of the list and presign Lambdas: SSM
+parameters, Secrets Manager secrets and buckets known to exist. Each entry is kept for
+CONFIG_TTL_SECONDS, so a warm container asks AWS again at most that often; failed
+lookups are not cached. invalidate() drops entries explicitly, e.g. when a cached bucket
+turns out to be gone.
+
+This module is zipped next to the handler of each of those Lambdas by
+bin/build_lambdas.sh and imported as ``config_cache``.
+"""
+import json
+import os
+import threading
+import time
+
+CONFIG_TTL_SECONDS = float(os.getenv("CONFIG_TTL_SECONDS", "300"))
+
+
+class TTLCache:
+    """Values by key, each loaded on first use and again once ``ttl`` seconds have passed."""
+
+    def __init__(self, ttl: float = CONFIG_TTL_SECONDS, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        """The cached value of ``key``, or ``load()`` when it is missing or expired; None is not cached."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] > self.clock():
+                return cached[1]
+
+        value = load()
+        if value is not None:
+            with self._lock:
+                self._entries[key] = (self.clock() + self.ttl, value)
+        return value
+
+    def invalidate(self, kind: str = None, name: str = None) -> None:
+        """Drop the entry (kind, name), every entry of ``kind``, or everything."""
+        with self._lock:
+            for key in [key for key in self._entries if kind is None or (key[0] == kind and name in (None, key[1]))]:
+                del self._entries[key]
+
+
+_cache = TTLCache()
+
+
+def get_parameter(ssm, name: str) -> str:
+    """The value of an SSM parameter."""
+    return _cache.get(("parameter", name), lambda: ssm.get_parameter(Name=name)["Parameter"]["Value"])
+
+
+def get_secret(secretsmanager, name: str) -> dict:
+    """A Secrets Manager secret, parsed from its JSON SecretString."""
+    return _cache.get(("secret", name), lambda: json.loads(secretsmanager.get_secret_value(SecretId=name)["SecretString"]))
+
+
+def ensure_bucket(s3, bucket: str) -> None:
+    """Create ``bucket`` unless it exists; once seen, it is not checked again until the entry expires."""
+    def check():
+        try:
+            s3.head_bucket(Bucket=bucket)
+        except Exception:
+            s3.create_bucket(Bucket=bucket)
+        return True
+
+    _cache.get(("bucket", bucket), check)
+
+
+def invalidate(kind: str = None, name: str = None) -> None:
+    """Forget cached lookups: kind is "parameter", "secret" or "bucket"; no arguments clears everything."""
+    _cache.invalidate(kind, name)
@@ -0,0 +1,102 @@
+"""
+Layout and reader of the time-partitioned manifest of the processed bucket. The transform
+Lambda writes and compacts it (lambdas/transform/utils/manifest.py), the list Lambda
+reads it; both use the key layout and readers below, so they cannot drift apart:
+
+    manifest/segments/<YYYY-MM-DDTHH>/<epoch ms>-<uuid>.json   {"archive": ..., "entries": [...]}
+    manifest/hours/<YYYY-MM-DDTHH>.json                       {"entries": [...]}
+
+An entry is {"Key", "Size", "Timestamp" (ISO 8601, UTC), "Archive"}.
+
+This module is zipped next to the handler of each Lambda by bin/build_lambdas.sh and
+imported as ``manifest_reader``.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+MANIFEST_PREFIX = "manifest/"
+SEGMENTS_PREFIX = f"{MANIFEST_PREFIX}segments/"
+HOURS_PREFIX = f"{MANIFEST_PREFIX}hours/"
+HOUR_FORMAT = "%Y-%m-%dT%H"
+
+
+def hour_of(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime(HOUR_FORMAT)
+
+
+def stamp(moment: datetime) -> str:
+    """Entry timestamp; always with microseconds, so timestamps compare as strings."""
+    return moment.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def hours_between(since: datetime, until: datetime) -> list:
+    """The hour partitions from ``since`` to ``until``, both included."""
+    hour = since.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    hours = []
+    while hour <= until:
+        hours.append(hour.strftime(HOUR_FORMAT))
+        hour += timedelta(hours=1)
+    return hours
+
+
+def list_keys(s3, bucket: str, prefix: str) -> list:
+    keys, token = [], None
+    while True:
+        params = {"Bucket": bucket, "Prefix": prefix}
+        if token:
+            params["ContinuationToken"] = token
+        response = s3.list_objects_v2(**params)
+        keys.extend(obj["Key"] for obj in response.get("Contents", []))
+        if not response.get("IsTruncated"):
+            return keys
+        token = response.get("NextContinuationToken")
+
+
+def error_code(e: Exception):
+    return getattr(e, "response", {}).get("Error", {}).get("Code")
+
+
+def read_tagged(s3, bucket: str, key: str):
+    """The document at ``key`` and its ETag, or (None, None) when there is none."""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except Exception as e:
+        if error_code(e) in ("NoSuchKey", "404"):
+            return None, None
+        raise
+    return json.loads(response["Body"].read()), response.get("ETag")
+
+
+def read_document(s3, bucket: str, key: str):
+    return read_tagged(s3, bucket, key)[0]
+
+
+def merge_entries(*entry_lists) -> list:
+    """Entries by key, the latest placement winning, oldest first."""
+    merged = {}
+    for entries in entry_lists:
+        for entry in entries:
+            current = merged.get(entry["Key"])
+            if current is None or entry["Timestamp"] >= current["Timestamp"]:
+                merged[entry["Key"]] = entry
+    return sorted(merged.values(), key=lambda entry: entry["Timestamp"])
+
+
+def read_window(s3, bucket: str, since: datetime, until: datetime = None) -> list:
+    """
+    Entries placed from ``since`` to ``until`` (now by default), newest first, read from
+    the hour documents and segments of the hours the window covers only. A segment is
+    never in an earlier hour than its entries, so nothing in the window is missed.
+    """
+    until = until or datetime.now(timezone.utc)
+    lists = []
+    for hour in hours_between(since, until):
+        document = read_document(s3, bucket, f"{HOURS_PREFIX}{hour}.json")
+        if document is not None:
+            lists.append(document["entries"])
+        for key in list_keys(s3, bucket, f"{SEGMENTS_PREFIX}{hour}/"):
+            segment = read_document(s3, bucket, key)
+            if segment is not None:
+                lists.append(segment["entries"])
+    low, high = stamp(since), stamp(until)
+    return [entry for entry in reversed(merge_entries(*lists)) if low <= entry["Timestamp"] <= high]
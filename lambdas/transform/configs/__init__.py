@@ -0,0 +1,95 @@
+import os
+
+# How the transform Lambda reads an uploaded archive:
+#   "stream" - read the tar straight from the S3 response body, members never touch /tmp
+#   "disk"   - download the tar to /tmp and extract every member before importing it
+INGEST_MODE = os.getenv("INGEST_MODE", "stream")
+
+# Number of S3 event records (archives) ingested concurrently, each in its own /tmp
+# workspace; 1 handles them one after another.
+RECORD_WORKERS = int(os.getenv("RECORD_WORKERS", "4"))
+
+# Where the ingestion ledger (archives by ETag, members by content hash already written to
+# InfluxDB) is kept: "s3" (ledger/ in the processed bucket), "local" (LEDGER_PATH) or "off".
+LEDGER_STORE = os.getenv("LEDGER_STORE", "s3")
+LEDGER_PATH = os.getenv("LEDGER_PATH", "/tmp/ingestion_ledger")
+
+# Days an archive or member stays in the ledger; older entries are dropped on commit.
+LEDGER_RETENTION_DAYS = float(os.getenv("LEDGER_RETENTION_DAYS", "30"))
+
+# Per customer/server/measurement watermark of the latest timestamp written to InfluxDB,
+# kept in the ledger: "filter" drops rows at or before it, "backfill" ingests them anyway
+# (the watermark still only moves forward), "off" neither filters nor tracks. An event
+# with "backfill": true backfills that invocation only.
+WATERMARKS = os.getenv("WATERMARKS", "filter")
+
+# Number of archive members imported concurrently; 1 keeps the original one-at-a-time loop.
+MEMBER_WORKERS = int(os.getenv("MEMBER_WORKERS", "1"))
+
+# Executor used for the pandas parse/clean stage when MEMBER_WORKERS > 1: "process" or
+# "thread". A process pool that cannot be created (e.g. no /dev/shm) falls back to threads.
+MEMBER_POOL = os.getenv("MEMBER_POOL", "process")
+
+# Maximum number of line-protocol lines sent to InfluxDB in a single write request.
+INFLUX_BATCH_LINES = int(os.getenv("INFLUX_BATCH_LINES", "5000"))
+
+# Base URL of the InfluxDB HTTP API written to.
+INFLUX_URL = os.getenv("INFLUX_URL", "http://influxdb:8086")
+
+# Where Database sends line protocol (database.sinks): "influxdb" writes to INFLUX_URL,
+# "capture" keeps the payloads in memory and writes nothing (dry run).
+INFLUX_SINK = os.getenv("INFLUX_SINK", "influxdb")
+
+# Size of the HTTP connection pool of the shared InfluxDB client; should cover MEMBER_WORKERS.
+INFLUX_POOL_SIZE = int(os.getenv("INFLUX_POOL_SIZE", "10"))
+
+# Import members in chunks of this many rows (read -> clean -> serialise -> write per
+# chunk), so memory is bounded by the chunk rather than the file; 0 imports whole members.
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "0"))
+
+# Bytes of a chunked to_ingest/ artifact kept in memory before it is spooled to /tmp.
+ARTIFACT_SPOOL_BYTES = int(os.getenv("ARTIFACT_SPOOL_BYTES", str(8 * 1024 * 1024)))
+
+# Read import_data files through the ingestion plans compiled from subroutines_config.json
+# (pyarrow CSV reader, declared dtypes); "0" always uses pandas type inference.
+USE_INGESTION_PLANS = os.getenv("USE_INGESTION_PLANS", "1") == "1"
+
+# Format of the to_ingest/ artifacts: "csv" or "parquet" (compressed, typed timestamps,
+# dictionary-encoded customer/server).
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv")
+
+# Parquet compression codec used when OUTPUT_FORMAT is "parquet".
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+
+# Seconds a secret (e.g. the InfluxDB token) is cached before Secrets Manager is asked again.
+SECRET_TTL_SECONDS = float(os.getenv("SECRET_TTL_SECONDS", "300"))
+
+# Per-stage timing, rows, bytes and RSS change of the pipeline: "emf" prints them as
+# CloudWatch Embedded Metric Format log lines in METRICS_NAMESPACE, "off" does not.
+METRICS = os.getenv("METRICS", "emf")
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "TransformPipeline")
+
+# Also write the per-archive stage totals to InfluxDB as METRICS_MEASUREMENT ("1"), so
+# pipeline throughput can be charted next to the data in Grafana.
+METRICS_INFLUX = os.getenv("METRICS_INFLUX", "0") == "1"
+METRICS_MEASUREMENT = os.getenv("METRICS_MEASUREMENT", "pipeline_stats")
+
+# Level of the transform Lambda's logger (DEBUG, INFO, WARNING, ERROR); DataFrame dumps
+# and other per-file detail are logged at DEBUG and cost nothing above it.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Per-file and per-row DEBUG output is logged for one in this many calls per subroutine;
+# 1 logs every call.
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "20"))
+
+# Write log records from a background thread ("1") instead of the calling thread; the
+# queue is drained before each invocation returns.
+LOG_QUEUE = os.getenv("LOG_QUEUE", "1") == "1"
+
+# Record every object written to the processed bucket in the time-partitioned manifest
+# (manifest/ in the processed bucket, see utils/manifest.py) read by the list Lambda.
+MANIFEST = os.getenv("MANIFEST", "1") == "1"
+
+# Seconds after the end of an hour before its manifest segments are compacted into one
+# document, so late segments of that hour are not missed.
+MANIFEST_COMPACT_GRACE_SECONDS = float(os.getenv("MANIFEST_COMPACT_GRACE_SECONDS", "300"))
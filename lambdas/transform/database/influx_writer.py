@@ -1,109 +1,167 @@
-from influxdb_client import InfluxDBClient, WriteOptions, Point, WritePrecision
-from influxdb_client.client.exceptions import InfluxDBError
-from influxdb_client.client.write_api import SYNCHRONOUS
+import atexit
+import threading
 from datetime import datetime
 from utils.s3 import get_secret
+from utils.log_writer import get_logger
+from utils.metrics import current_labels, stage
+from database.line_protocol import dataframe_to_line_protocol
+from database.sinks import create_sink
+from configs import INFLUX_BATCH_LINES, INFLUX_SINK, INFLUX_URL
+
+logger = get_logger(__name__)
 
 class Database:
-    def __init__(self):
-        try:
-            secret_name = "influxdb-secrets"
-            secrets = get_secret(secret_name)
-            print("HELLO")
-            print(secrets)
-
-            # Validate that required secrets are present
-            if not secrets or not all(k in secrets for k in ('token', 'org', 'bucket')):
-                raise ValueError("Missing required secrets keys: 'token', 'org', or 'bucket'")
-            self.token = secrets['token']
-            self.org = secrets['org']
-            self.bucket = secrets['bucket']
-            self.url = "http://influxdb:8086"
+    def __init__(self, secret_name: str = "influxdb-secrets", sink=None, url: str = INFLUX_URL):
+        # Nothing is fetched or connected here: the secret is read (and cached with a TTL)
+        # on first use, the client is created by the first write.
+        self.secret_name = secret_name
+        self.url = url
+
+        # Where payloads go (database.sinks): InfluxDB at ``url`` by default, kept for the
+        # lifetime of the (warm) Lambda container
+        self.sink = sink if sink is not None else create_sink(INFLUX_SINK, url, self.credentials)
+        self._lock = threading.Lock()
+        # Line protocol waiting to be sent, per archive label of the writing thread (see
+        # utils.metrics); coalesced across files until a full batch is available or the
+        # archive is flushed, so concurrent records never send each other's lines
+        self._pending = {}
+        # Number of write requests InfluxDB did not accept, in total and per archive; an
+        # archive's count is compared before and after it to decide whether its members
+        # can be recorded as ingested
+        self.failed_writes = 0
+        self._failures = {}
+        atexit.register(self.close)
+
+    def credentials(self) -> dict:
+        """The InfluxDB secret (token, org, bucket), cached by get_secret for SECRET_TTL_SECONDS."""
+        secrets = get_secret(self.secret_name)
+        # Validate that required secrets are present
+        if not secrets or not all(k in secrets for k in ('token', 'org', 'bucket')):
+            raise ValueError("Missing required secrets keys: 'token', 'org', or 'bucket'")
+        return secrets
+
+    @property
+    def token(self):
+        return self.credentials()['token']
+
+    @property
+    def org(self):
+        return self.credentials()['org']
+
+    @property
+    def bucket(self):
+        return self.credentials()['bucket']
+
+
+    def summary_line(self, customer, server, filename) -> str:
+        """The customer_server record of a file, as line protocol."""
+        from influxdb_client import Point
+
+        # Ensure that the data values are valid
+        if not customer or not server or not filename:
+            raise ValueError(f"Invalid data for summary: customer={customer}, server={server}, filename={filename}")
+
+        # Get the current time in UTC and format it (same as your previous code)
+        current_time = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        # Create the summary point
+        summary_point = (
+            Point("customer_server")  # Measurement name
+            .field("customer", customer)
+            .field("server", server)
+            .field("filename", filename)
+            .field("_time", current_time)
+            .field("datetime", current_time)
+        )
 
+        logger.debug("Writing summary_point for customer=%s, server=%s, filename=%s at %s", customer, server, filename, current_time)
+        return summary_point.to_line_protocol()
+
+    def serialise(self, build, file):
+        """
+        Build a file's line protocol with ``build()``. A failure is counted against the
+        current archive, like a rejected write, and raised, so the importer reports the
+        member as not imported and the archive is not committed to the ledger.
+        """
+        try:
+            return build()
         except Exception as e:
-            # Log and raise the exception for visibility
-            print(f"Error initializing Database class: {e}")
+            print(f"An unexpected error occurred while serialising data for {file}: {e}")
+            self.count_failure(current_labels().get("archive"))
             raise
 
+    def queue_lines(self, lines, batch_size=INFLUX_BATCH_LINES):
+        """Add line protocol to the pending buffer of the current archive and send every full batch."""
+        archive = current_labels().get("archive")
+        with self._lock:
+            pending = self._pending.setdefault(archive, [])
+            pending.extend(lines)
+            batches = []
+            while len(pending) >= batch_size:
+                batches.append(pending[:batch_size])
+                del pending[:batch_size]
+        for batch in batches:
+            self.send_lines(batch, archive)
+
+    def count_failure(self, archive=None):
+        with self._lock:
+            self.failed_writes += 1
+            self._failures[archive] = self._failures.get(archive, 0) + 1
 
-    def write_summary_record(self, write_api, customer, server, filename):
+    def failures(self, archive) -> int:
+        """Writes of ``archive`` (an archive label) that failed so far."""
+        with self._lock:
+            return self._failures.get(archive, 0)
+
+    def send_lines(self, lines, archive=None):
+        payload = "\n".join(lines)
         try:
-            # Ensure that the data values are valid
-            if not customer or not server or not filename:
-                raise ValueError(f"Invalid data for summary: customer={customer}, server={server}, filename={filename}")
-        
-            # Get the current time in UTC and format it (same as your previous code)
-            current_time = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
-        
-            # Create the summary point
-            summary_point = (
-                Point("customer_server")  # Measurement name
-                .field("customer", customer)
-                .field("server", server)
-                .field("filename", filename)
-                .field("_time", current_time)
-                .field("datetime", current_time)
-            )
-        
-            print(f"Writing summary_point for customer={customer}, server={server}, filename={filename} at {current_time}")
-        
-            # Write the summary point to InfluxDB
-            write_api.write(bucket=self.bucket, org=self.org, record=summary_point)
-    
-        except Exception as e:
-            # Print the error with details for debugging
-            print(f"An unexpected error occurred while writing data for {filename} to customer_server: {customer}")
-            print(f"Error details: {str(e)}")
+            with stage("influx_send", rows=len(lines), bytes=len(payload)):
+                self.sink.write(payload, len(lines))
+        except Exception:
+            self.count_failure(archive)
+            raise
 
-    def write(self, data, file,customer,server):
-        """Write data to InfluxDB using batching with context management"""
+    def flush(self, archive=None):
+        """
+        Send the lines still pending for ``archive``, or for every archive when it is not
+        given. Called at archive boundaries.
+        """
+        with self._lock:
+            if archive is None:
+                buffers, self._pending = self._pending, {}
+            else:
+                buffers = {archive: self._pending.pop(archive, [])}
+        for label, lines in buffers.items():
+            try:
+                if lines:
+                    self.send_lines(lines, label)
+                    logger.debug("Flushed %d lines to InfluxDB", len(lines))
+            except Exception as e:
+                print(f"An unexpected error occurred while flushing {len(lines)} lines to InfluxDB: {e}")
+
+    def close(self):
+        """Flush pending data and release the sink's client; a later write creates a new one."""
+        self.flush()
         try:
-            # Open the client and write_api in a 'with' statement to ensure proper management
-            with InfluxDBClient(url=self.url, token=self.token) as client:
-                # Set write options: batch size, flush interval, jitter, etc.
-                write_options = WriteOptions(batch_size=1000, flush_interval=100, jitter_interval=100)
-                # Use write_api within the context
-                with client.write_api(write_options=write_options) as write_api:
-                    self.write_summary_record(write_api, customer, server, file)
-                    # Loop through each record and write it to InfluxDB
-                    for record in data:
-                        # Prepare the record for writing
-                        if 'datetime' in record:
-                            record['_time'] = record.pop('datetime')
-                            if isinstance(record['_time'], str):
-                                record['_time'] = datetime.strptime(record['_time'], '%Y-%m-%dT%H:%M:%S')
-                            record['_time'] = record['_time'].replace(tzinfo=None)
-                            record['_time'] = record['_time'].strftime('%Y-%m-%dT%H:%M:%SZ')
-
-                        point = Point(record['_measurement'])
-
-                        # Add tags and fields dynamically
-                        if "customer" in record:
-                            point.tag("customer", record["customer"])
-                        if "server" in record:
-                            point.tag("server", record["server"])
-                        if "digits" in record:
-                            point.tag("pagesize", record["digits"])
-                        if "name" in record:
-                            point.tag("metric", record["name"])
-                        if "area" in record:
-                            point.tag("metric", record["area"])
-
-                        for field, value in record.items():
-                            if field not in ['_measurement', 'customer', 'server', '_time']:
-                                point.field(field, value)
-
-                        point.time(record['_time'], WritePrecision.S)
-
-                        # Write the point to InfluxDB asynchronously (handled by batching)
-                        #print(f"Writing record for {file}")
-                        write_api.write(bucket=self.bucket, org=self.org, record=point)
-
-                    # Flush data to ensure all points are written before closing
-                    write_api.flush()
-                      # Write the summary record at the end
-
-
-            print(f"All data for {file} successfully written to InfluxDB")
+            self.sink.close()
         except Exception as e:
-            print(f"An unexpected error occurred while writing data for {file}: {e}")
+            print(f"Error closing InfluxDB client: {e}")
+
+    def write_dataframe(self, df, file, customer, server, batch_size=INFLUX_BATCH_LINES, summary=True):
+        """
+        Write a cleaned DataFrame to InfluxDB as pre-serialised line protocol.
+
+        Rows are serialised column-wise (database.line_protocol), not as a Point each. Lines
+        go through the shared pending buffer, so small files are coalesced into payloads of
+        ``batch_size`` lines; the remainder is sent by ``flush()``. ``summary=False`` skips
+        the customer_server record, for the later chunks of a chunked import.
+
+        Serialisation errors and rejected batches are raised, and counted as failed writes
+        of the current archive (see serialise).
+        """
+        with stage("influx_write", rows=len(df)):
+            lines = self.serialise(lambda: ([self.summary_line(customer, server, file)] if summary else []) + dataframe_to_line_protocol(df), file)
+            self.queue_lines(lines, batch_size)
+
+        logger.debug("All data for %s queued for InfluxDB (%d lines)", file, len(lines))
@@ -0,0 +1,180 @@
+import math
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+# Same escaping rules as influxdb_client's Point
+_ESCAPE_MEASUREMENT = str.maketrans({
+    ',': r'\,',
+    ' ': r'\ ',
+    '\n': r'\n',
+    '\t': r'\t',
+    '\r': r'\r',
+})
+
+_ESCAPE_KEY = str.maketrans({
+    ',': r'\,',
+    '=': r'\=',
+    ' ': r'\ ',
+    '\n': r'\n',
+    '\t': r'\t',
+    '\r': r'\r',
+})
+
+_ESCAPE_STRING = str.maketrans({
+    '"': r'\"',
+    '\\': r'\\',
+})
+
+# (tag key, column) pairs in the order the Point-per-record write applied them; "area" overrides "name"
+TAG_COLUMNS = [
+    ("customer", "customer"),
+    ("server", "server"),
+    ("pagesize", "digits"),
+    ("metric", "name"),
+    ("metric", "area"),
+]
+
+# Columns that are never written as fields ("datetime" becomes the point timestamp)
+NON_FIELD_COLUMNS = ['_measurement', 'customer', 'server', '_time', 'datetime']
+
+
+def format_tag_value(value) -> str:
+    """Render a single tag value the way Point.tag does; an empty string means 'no tag'."""
+    if value is None:
+        return ''
+    escaped = str(value).translate(_ESCAPE_KEY)
+    if escaped.endswith('\\'):
+        escaped += ' '
+    return escaped
+
+
+def format_field_value(value):
+    """Render a single field value the way Point.field does, or None when it is skipped."""
+    if value is None:
+        return None
+    if isinstance(value, (float, Decimal, np.floating)):
+        if not math.isfinite(value):
+            return None
+        text = str(value)
+        return text[:-2] if text.endswith('.0') else text
+    if isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_)):
+        return f"{value}i"
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value)).lower()
+    if isinstance(value, str):
+        return f'"{value.translate(_ESCAPE_STRING)}"'
+    raise ValueError(f'Type: "{type(value)}" of field is not supported.')
+
+
+def format_measurement(value) -> str:
+    return str(value).translate(_ESCAPE_MEASUREMENT)
+
+
+def format_distinct(values: pd.Series, formatter):
+    """
+    Factorize a column and apply ``formatter`` once per distinct value.
+
+    Returns ``(codes, formatted)`` with ``formatted[codes]`` being the formatted column.
+    Missing values are formatted one by one since None and NaN render differently.
+    """
+    codes, uniques = pd.factorize(values)
+    formatted = [formatter(value) for value in uniques]
+    missing = np.flatnonzero(codes == -1)
+    if len(missing):
+        codes[missing] = np.arange(len(formatted), len(formatted) + len(missing))
+        formatted += [formatter(value) for value in values.iloc[missing]]
+    return codes, formatted
+
+
+def field_values(values: pd.Series) -> np.ndarray:
+    """Format a field column; cells that Point would skip come back as None."""
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return np.where(values.to_numpy(), 'true', 'false').astype(object)
+    if pd.api.types.is_float_dtype(dtype):
+        text = np.array([t[:-2] if t.endswith('.0') else t for t in values.astype(str).to_numpy()], dtype=object)
+        text[~np.isfinite(values.to_numpy())] = None
+        return text
+    if pd.api.types.is_integer_dtype(dtype):
+        return (values.astype(str) + 'i').to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+        return ('"' + values.str.translate(_ESCAPE_STRING) + '"').to_numpy(dtype=object)
+    return np.array([format_field_value(value) for value in values], dtype=object)
+
+
+def epoch_seconds(values: pd.Series) -> np.ndarray:
+    """Convert a datetime column to integer epoch seconds; NaT comes back as None."""
+    if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+        values = pd.to_datetime(values, format='%Y-%m-%dT%H:%M:%S')
+    if getattr(values.dt, 'tz', None) is not None:
+        # The Point-per-record write dropped the timezone and kept the wall clock time
+        values = values.dt.tz_localize(None)
+    seconds = values.to_numpy(dtype='datetime64[s]').astype('int64').astype(str).astype(object)
+    seconds[values.isna().to_numpy()] = None
+    return seconds
+
+
+def dataframe_to_line_protocol(df: pd.DataFrame) -> list:
+    """
+    Serialise a cleaned DataFrame to InfluxDB line protocol, one line per row.
+
+    Produces the same bytes as building a Point per record (as the former Database.write
+    did, see legacy_lines in tests/test_line_protocol.py), but works column by column:
+    tags shared by the whole file are rendered once, fields are formatted per column and
+    timestamps come straight from the datetime64 values (second precision). Rows without any field or timestamp are dropped.
+    """
+    if df.empty or '_measurement' not in df.columns or 'datetime' not in df.columns:
+        return []
+
+    rows = len(df)
+
+    # Later columns win for the same tag key, then tags are written sorted by key
+    tag_sources = {}
+    for tag, column in TAG_COLUMNS:
+        if column in df.columns:
+            tag_sources[tag] = column
+
+    # Measurement and tag set: rendered once when constant across the file (the usual
+    # case), otherwise one string per row
+    codes, formatted = format_distinct(df['_measurement'], format_measurement)
+    head_codes, head_parts = [codes], [formatted]
+    for tag in sorted(tag_sources):
+        codes, formatted = format_distinct(df[tag_sources[tag]], format_tag_value)
+        key = tag.translate(_ESCAPE_KEY)
+        head_codes.append(codes)
+        head_parts.append([f",{key}={value}" if value != '' else '' for value in formatted])
+    combinations, head_index = np.unique(np.column_stack(head_codes), axis=0, return_inverse=True)
+    heads = [''.join(parts[code] for parts, code in zip(head_parts, combination)) for combination in combinations]
+    if len(heads) == 1:
+        head_template, head_values = heads[0].replace('%', '%%'), None
+    else:
+        head_template, head_values = '%s', np.array(heads, dtype=object)[head_index.ravel()]
+
+    keys, columns = [], []
+    for column in sorted(c for c in df.columns if c not in NON_FIELD_COLUMNS):
+        keys.append(str(column).translate(_ESCAPE_KEY).replace('%', '%%'))
+        columns.append(field_values(df[column]))
+    seconds = epoch_seconds(df['datetime'])
+
+    # One %-template per combination of present fields; normally every row has them all
+    present = np.column_stack([values != None for values in columns]) if columns else np.zeros((rows, 0), dtype=bool)  # noqa: E711
+    patterns, pattern_codes = np.unique(present, axis=0, return_inverse=True)
+    templates = [
+        f"{head_template} " + ','.join(f"{keys[i]}=%s" for i in np.flatnonzero(pattern)) + " %s"
+        for pattern in patterns
+    ]
+    complete = [bool(pattern.all()) for pattern in patterns]
+    keep = present.any(axis=1) & (seconds != None)  # noqa: E711
+
+    lines = []
+    rows_values = zip(*columns, seconds) if head_values is None else zip(head_values, *columns, seconds)
+    for code, row, wanted in zip(pattern_codes.ravel(), rows_values, keep):
+        if not wanted:
+            continue
+        if not complete[code]:
+            row = tuple(value for value in row if value is not None)
+        lines.append(templates[code] % row)
+    return lines
+
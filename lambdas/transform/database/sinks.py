@@ -0,0 +1,114 @@
+"""
+Destinations of the line-protocol payloads sent by Database.
+
+A sink takes one payload (newline-separated line protocol, precision seconds) per write
+request and raises when it is not accepted:
+
+  InfluxDBSink - the InfluxDB HTTP API through influxdb_client (production)
+  CaptureSink  - keeps every payload in memory (tests, benchmarks, dry runs)
+
+Pointing an InfluxDBSink at database.standin.InfluxWriteStandIn exercises the real client
+and HTTP path without an InfluxDB.
+"""
+import threading
+
+from configs import INFLUX_POOL_SIZE
+
+SINKS = ("influxdb", "capture")
+
+
+class InfluxDBSink:
+    """
+    Writes payloads with one long-lived InfluxDB client, whose HTTP connection pool is
+    shared by every write. ``credentials`` returns the token, org and bucket; the client
+    is created on the first write and rebuilt when the token changes (rotation).
+    """
+
+    def __init__(self, url: str, credentials, pool_size: int = INFLUX_POOL_SIZE):
+        self.url = url
+        self.credentials = credentials
+        self.pool_size = pool_size
+        self._client = None
+        self._client_token = None
+        self._write_api = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        from influxdb_client import InfluxDBClient
+
+        credentials = self.credentials()
+        stale = None
+        with self._lock:
+            if self._client is not None and self._client_token != credentials['token']:
+                stale, self._client, self._write_api = self._client, None, None
+            if self._client is None:
+                self._client = InfluxDBClient(url=self.url, token=credentials['token'], org=credentials['org'], connection_pool_maxsize=self.pool_size)
+                self._client_token = credentials['token']
+            client = self._client
+        if stale is not None:
+            stale.close()
+        return client
+
+    @property
+    def write_api(self):
+        """Synchronous write API on the shared client: one HTTP request per payload, no background thread."""
+        from influxdb_client.client.write_api import SYNCHRONOUS
+
+        client = self.client
+        with self._lock:
+            if self._write_api is None:
+                self._write_api = client.write_api(write_options=SYNCHRONOUS)
+            return self._write_api
+
+    def write(self, payload: str, lines: int) -> None:
+        from influxdb_client import WritePrecision
+
+        write_api = self.write_api
+        credentials = self.credentials()
+        write_api.write(bucket=credentials['bucket'], org=credentials['org'], record=payload, write_precision=WritePrecision.S)
+
+    def close(self) -> None:
+        """Release the client; a later write creates a new one."""
+        with self._lock:
+            write_api, client = self._write_api, self._client
+            self._write_api, self._client = None, None
+        if write_api is not None:
+            write_api.close()
+        if client is not None:
+            client.close()
+
+
+class CaptureSink:
+    """Keeps every payload in memory instead of sending it; ``text()`` joins them like InfluxDB would see them."""
+
+    def __init__(self):
+        self.payloads = []
+        self.lines = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def batches(self) -> int:
+        return len(self.payloads)
+
+    def write(self, payload: str, lines: int) -> None:
+        with self._lock:
+            self.payloads.append(payload)
+            self.lines += lines
+            self.bytes += len(payload.encode("utf-8"))
+
+    def text(self) -> str:
+        return "\n".join(self.payloads)
+
+    def close(self) -> None:
+        pass
+
+
+def create_sink(kind: str, url: str, credentials):
+    """Build the sink selected by INFLUX_SINK ("influxdb" or "capture")."""
+    if kind == "influxdb":
+        return InfluxDBSink(url, credentials)
+    if kind == "capture":
+        return CaptureSink()
+    raise ValueError(f"Unknown InfluxDB sink {kind!r}, expected one of {SINKS}")
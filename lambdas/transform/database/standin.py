@@ -0,0 +1,147 @@
+"""
+Local stand-in for the InfluxDB ``/api/v2/write`` endpoint.
+
+Accepts write requests like InfluxDB (gzip or plain line protocol, 204 No Content) and
+records each one instead of storing points: bytes, lines, handling latency, org, bucket
+and precision, and optionally the payload itself. Point a Database (InfluxDBSink) at
+``url`` to measure batching and serialisation, or to compare payloads byte for byte,
+without a running InfluxDB:
+
+    with InfluxWriteStandIn() as standin:
+        db = Database(sink=InfluxDBSink(standin.url, lambda: {"token": "t", "org": "o", "bucket": "b"}))
+        ...
+        standin.summary()
+"""
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+from urllib.parse import parse_qs, urlsplit
+
+WRITE_PATH = "/api/v2/write"
+
+
+class WriteRequest(NamedTuple):
+    org: str
+    bucket: str
+    precision: str
+    bytes: int          # body as sent, i.e. compressed when gzip is used
+    lines: int
+    seconds: float      # from the first byte of the body to the response
+    payload: bytes      # decompressed body; empty unless keep_payloads
+
+
+class WriteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        started = time.perf_counter()
+        body = self.rfile.read(length)
+        if url.path != WRITE_PATH:
+            return self.reply(404, {"code": "not found", "message": f"path not found: {url.path}"})
+
+        standin = self.server.standin
+        payload = gzip.decompress(body) if self.headers.get("Content-Encoding") == "gzip" else body
+        if standin.delay:
+            time.sleep(standin.delay)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        lines = sum(1 for line in payload.split(b"\n") if line.strip())
+        standin.add(WriteRequest(query.get("org", ""), query.get("bucket", ""), query.get("precision", "ns"), length, lines,
+                                 time.perf_counter() - started, payload if standin.keep_payloads else b""))
+
+        if standin.status >= 400:
+            return self.reply(standin.status, {"code": "internal error", "message": "rejected by the stand-in"})
+        self.reply(standin.status)
+
+    def do_GET(self):
+        # Health check, as served by InfluxDB
+        if urlsplit(self.path).path in ("/health", "/ping"):
+            return self.reply(200, {"name": "influxdb", "status": "pass"})
+        self.reply(404, {"code": "not found", "message": "path not found"})
+
+    def reply(self, status: int, document: dict = None):
+        body = json.dumps(document).encode() if document is not None else b""
+        self.send_response(status)
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class InfluxWriteStandIn:
+    """
+    The stand-in server, run on a background thread. ``delay`` adds seconds of latency
+    to every write, ``status`` is answered to every write (e.g. 500 to test failures).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, status: int = 204, keep_payloads: bool = True):
+        self.delay = delay
+        self.status = status
+        self.keep_payloads = keep_payloads
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), WriteHandler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add(self, request: WriteRequest) -> None:
+        with self._lock:
+            self.requests.append(request)
+
+    def payloads(self) -> list:
+        """Decompressed payloads in the order they were received."""
+        with self._lock:
+            return [request.payload for request in self.requests]
+
+    def summary(self) -> dict:
+        """Batch count, lines, bytes and handling latency percentiles (ms) of the writes so far."""
+        with self._lock:
+            requests = list(self.requests)
+        latencies = sorted(request.seconds * 1000 for request in requests)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else 0.0
+
+        return {
+            "batches": len(requests),
+            "lines": sum(request.lines for request in requests),
+            "bytes": sum(request.bytes for request in requests),
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = []
+
+    def start(self) -> "InfluxWriteStandIn":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="influx-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,5 +1,88 @@
+import numpy as np
 import pandas as pd
 
+from etl.timestamps import datetime_column
+from utils.metrics import timed
+from utils.log_writer import Lazy, frame_info, get_logger, log_sampled
+
+# Collectors print counters they cannot read as (close to) the int64 maximum
+LARGE_VALUE_THRESHOLD = 9023372036854775800
+
+# Object columns holding at least some str values, so the .str accessor can be used
+STRING_INFERRED_TYPES = ("string", "mixed", "mixed-integer", "empty")
+
+# Object columns that may hold int/float values
+NUMERIC_INFERRED_TYPES = ("integer", "floating", "mixed-integer-float", "mixed-integer", "mixed")
+
+logger = get_logger(__name__)
+
+def invalid_value_masks(values: pd.Series):
+    """
+    Find the cells of a column that have to be replaced by -1.
+
+    Parameters:
+        values (pd.Series): The column to inspect.
+
+    Returns:
+        tuple: Boolean arrays (large_value, nan_string) marking int/float values above
+        LARGE_VALUE_THRESHOLD and strings that read 'nan' in any case.
+    """
+    no_match = np.zeros(len(values), dtype=bool)
+
+    if pd.api.types.is_bool_dtype(values.dtype):
+        return no_match, no_match
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return values.to_numpy() > LARGE_VALUE_THRESHOLD, no_match
+    if not pd.api.types.is_object_dtype(values.dtype):
+        return no_match, no_match
+
+    # Mixed object columns: only the str cells take part in the 'nan' test and only the
+    # int/float cells in the large value test.
+    inferred = pd.api.types.infer_dtype(values, skipna=True)
+    large_value, nan_string = no_match, no_match
+    is_string = pd.Series(no_match, index=values.index)
+
+    if inferred in STRING_INFERRED_TYPES:
+        lowered = values.str.lower()
+        is_string = lowered.notna()
+        nan_string = lowered.eq('nan').to_numpy()
+
+    if inferred in NUMERIC_INFERRED_TYPES:
+        numbers = pd.to_numeric(values.where(~is_string), errors='coerce')
+        large_value = (numbers > LARGE_VALUE_THRESHOLD).to_numpy()
+
+    return large_value, nan_string
+
+def holds_minus_one(dtype) -> bool:
+    """Return True when assigning -1 into a column of this dtype keeps the dtype unchanged."""
+    return (
+        pd.api.types.is_object_dtype(dtype)
+        or pd.api.types.is_float_dtype(dtype)
+        or pd.api.types.is_signed_integer_dtype(dtype)
+    )
+
+def replace_invalid_values(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replace sentinel counters and 'nan' strings with -1, in place.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to process.
+
+    Returns:
+        pd.DataFrame: The same DataFrame.
+    """
+    for column in df.columns:
+        if column not in ['datetime', 'customer', 'server']:
+            condition_large_value, condition_nan = invalid_value_masks(df[column])
+            # Skip empty assignments, but only where pandas would leave the dtype alone:
+            # assigning -1 into bool/uint/datetime columns upcasts them even with no match.
+            always_assign = not holds_minus_one(df[column].dtype)
+            if always_assign or condition_large_value.any():
+                df.loc[condition_large_value, column] = -1
+            if always_assign or condition_nan.any():
+                df.loc[condition_nan, column] = -1
+    return df
+
 def convert_numeric_columns_to_float(df):
     """
     Convert all numeric columns in a DataFrame to float.
@@ -15,24 +98,42 @@ def convert_numeric_columns_to_float(df):
     df[numeric_cols] = df[numeric_cols].astype(float)
     return df
 
-def clean_data(df: pd.DataFrame, header: str, customer: str, server: str, sub_key: str, digits) -> pd.DataFrame:
+def drop_ingested_rows(df: pd.DataFrame, watermark) -> pd.DataFrame:
+    """
+    Drop the rows whose datetime is at or before ``watermark``, the latest timestamp
+    already ingested for this measurement. Rows without a datetime are kept.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame with a parsed 'datetime' column.
+        watermark (pd.Timestamp): The watermark, or None to keep every row.
+
+    Returns:
+        pd.DataFrame: ``df`` itself when nothing is dropped, otherwise the remaining rows.
+    """
+    if watermark is None or 'datetime' not in df.columns:
+        return df
+    ingested = (df['datetime'] <= watermark).to_numpy()
+    if not ingested.any():
+        return df
+    print(f"Dropping {int(ingested.sum())} of {len(df)} rows at or before {watermark}")
+    return df.loc[~ingested].copy()
+
+@timed("clean")
+def clean_data(df: pd.DataFrame, header: str, customer: str, server: str, sub_key: str, digits, watermark=None) -> pd.DataFrame:
     df = df.copy()
-    for column in df.columns:
-        if column not in ['datetime', 'customer', 'server']:
-            condition_large_value = (df[column].apply(lambda x: isinstance(x, (int, float)) and x > 9023372036854775800))
-            condition_nan = (df[column].apply(lambda x: isinstance(x, str) and x.lower() == 'nan'))
-            df.loc[condition_large_value, column] = -1
-            df.loc[condition_nan, column] = -1
+    replace_invalid_values(df)
 
     if 'datetime' in df.columns:
-        df['datetime'] = pd.to_datetime(df['datetime'])
+        df['datetime'] = datetime_column(df, sub_key)
     else:
         if 'date' in df.columns and 'time' in df.columns:
-            df['datetime'] = pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str))
+            df['datetime'] = datetime_column(df, sub_key)
             df.drop(columns=['date', 'time'], inplace=True)
         else:
             print("ERROR: No 'datetime', 'date', or 'time' columns found!")
 
+    df = drop_ingested_rows(df, watermark)
+
     if 'datetime' in df.columns:
         cols = ['datetime'] + [col for col in df.columns if col != 'datetime']
         df = df[cols]
@@ -56,6 +157,5 @@ def clean_data(df: pd.DataFrame, header: str, customer: str, server: str, sub_ke
 
     df = convert_numeric_columns_to_float(df)
 
-    print(f"Cleaned Data Overview for {customer}-{server}:")
-    print(df.info())
+    log_sampled(logger, ("clean", sub_key), "Cleaned Data Overview for %s-%s:\n%s", customer, server, Lazy(frame_info, df))
     return df
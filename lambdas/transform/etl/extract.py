@@ -1,27 +1,50 @@
 import os
+import io
 import boto3
 import tarfile
-import re
+from contextlib import nullcontext
 from urllib.parse import unquote_plus
 from typing import List, Dict
-from utils.s3 import move_s3_object,get_processed_bucket_name, get_raw_bucket_name
+from utils.s3 import place_s3_object,get_processed_bucket_name, get_raw_bucket_name
+from utils.metrics import labels, stage
+from utils.log_writer import get_logger
 from etl.load import *
+from etl.ledger import member_digest, file_digest
+from importers.registry import IMPORTERS
+from importers.router import router_for
+from configs import MEMBER_WORKERS, MEMBER_POOL, IMPORT_CHUNK_ROWS
+
+logger = get_logger(__name__)
+
+def member_pool(workers: int, subroutine_config, s3, log, db, ledger=None):
+    """Return a MemberPool context for ``workers`` > 1, or a no-op context for serial imports."""
+    if workers <= 1:
+        return nullcontext()
+    from etl.parallel import MemberPool
+    return MemberPool(workers, subroutine_config, s3, log, db, kind=MEMBER_POOL, ledger=ledger)
+
+def place_member(s3, s3_key: str, extracted_file_path: str = None, data: bytes = None) -> None:
+    """Store a raw member in the processed bucket with a single PUT."""
+    place_s3_object(s3, s3_key, body=data, file_path=extracted_file_path if data is None else None)
+    print(f"Successfully uploaded {s3_key} to s3://{get_processed_bucket_name()}/{s3_key}")
+
+def extract_and_create_structure(tar_file_path: str, extracted_dir_path: str, file_key_prefix: str, file_key_server: str,s3,log,db,subroutine_config, workers: int = MEMBER_WORKERS, ledger=None) -> None:
+    """
+    Extract a downloaded tar archive to ``extracted_dir_path`` and import every member.
 
-def extract_and_create_structure(tar_file_path: str, extracted_dir_path: str, file_key_prefix: str, file_key_server: str,s3,log,db,subroutine_config) -> None:
-
-    # Debugging: Print objects
-    print("S3 Object:", s3)
-    print("Log Object:", log)
-    print("DB Object:", db)
+    With an ArchiveLedger, members whose content was already ingested are skipped, rows
+    at or before their measurement's watermark are dropped and the imported members are
+    recorded in it.
+    """
 
     # Ensure target directory structure exists
     if not os.path.exists(extracted_dir_path):
         os.makedirs(extracted_dir_path)
 
     # Open the tar file and extract the contents
-    with tarfile.open(tar_file_path, "r") as tar:
+    with tarfile.open(tar_file_path, "r") as tar, member_pool(workers, subroutine_config, s3, log, db, ledger) as pool:
         extracted_files = tar.getnames()
-        print(f"Extracted files: {extracted_files}")
+        logger.debug("Extracted files: %s", extracted_files)
 
         # Iterate through extracted files and upload to S3
         for file_name in extracted_files:
@@ -32,77 +55,133 @@ def extract_and_create_structure(tar_file_path: str, extracted_dir_path: str, fi
 
             # Build the S3 key with the full directory structure
             s3_key = f"extracted/{file_name}"
-            print(f"Uploading {file_name} to s3://{get_raw_bucket_name()}/extracted")
-
-            # Extract the file
-            tar.extract(file_name, path=extracted_dir_path)
+            print(f"Uploading {file_name} to s3://{get_processed_bucket_name()}/extracted")
+
+            with labels(member=file_name):
+                # Extract the file
+                with stage("extract") as extracted:
+                    tar.extract(file_name, path=extracted_dir_path)
+                    extracted.bytes = os.path.getsize(extracted_file_path) if os.path.isfile(extracted_file_path) else None
+
+                on_imported = None
+                if ledger is not None:
+                    digest = file_digest(extracted_file_path)
+                    if ledger.seen(digest):
+                        print(f"Skipping {file_name}, already ingested")
+                        continue
+                    on_imported = lambda digest=digest: ledger.record(digest)
+
+                if pool is not None:
+                    pool.submit(file_name, extracted_file_path, lambda s3_key=s3_key, path=extracted_file_path: place_member(s3, s3_key, extracted_file_path=path), on_imported=on_imported)
+                    continue
 
-            # Upload to S3
-            s3.upload_file(extracted_file_path, get_raw_bucket_name(), s3_key)
-            try:
-                produce_import_files(subroutine_config, get_raw_bucket_name(), extracted_file_path, file_name, log, db,s3)
-            except Exception as e:
-                print(f"Error in produce_import_files: {e}")
-                log.error(f"Error in produce_import_files: {e}")
+                with stage("member", bytes=extracted.bytes):
+                    try:
+                        if produce_import_files(subroutine_config, get_raw_bucket_name(), extracted_file_path, file_name, log, db,s3, ledger=ledger) and on_imported:
+                            on_imported()
+                    except Exception as e:
+                        print(f"Error in produce_import_files: {e}")
+                        log.error(f"Error in produce_import_files: {e}")
 
-            try:
-                move_s3_object(get_raw_bucket_name(), get_processed_bucket_name(), s3_key)
-                print(f"Successfully uploaded {file_name} to s3://{get_raw_bucket_name()}/{s3_key}")
-            except Exception as e:
-                print(f"Error move produce_import_files: {e}")
-                log.error(f"Error move produce_import_files: {e}")
+                    try:
+                        place_member(s3, s3_key, extracted_file_path=extracted_file_path)
+                    except Exception as e:
+                        print(f"Error move produce_import_files: {e}")
+                        log.error(f"Error move produce_import_files: {e}")
 
 
-def produce_import_files(subroutine_config, bucket_name, extracted_file_path, file_name, log, db, s3):
+def stream_and_create_structure(fileobj, file_key_prefix: str, file_key_server: str, s3, log, db, subroutine_config, workers: int = MEMBER_WORKERS, ledger=None) -> None:
     """
-    Process a file from S3 after it has been uploaded.
+    Read a tar archive as a stream and import every member straight from memory.
+
+    The archive is opened in sequential mode ("r|*"), so it can be fed directly from an
+    S3 get_object body; each member is read once and handed to the importers as a
+    file object, nothing is written to /tmp. With ``workers`` > 1 members are imported
+    concurrently through a MemberPool. With an ArchiveLedger, members whose content was
+    already ingested are skipped, rows at or before their measurement's watermark are
+    dropped and the imported members are recorded in it.
     """
-    s3_key = f"extracted/{file_name}"
-    try:
-        match = re.match(r"^(\S+?)_(\S+?)_(\d{4}-\d{2}-\d{2})_(.*)", s3_key) or \
-                re.match(r"^(\S+?)_(\S+?)_(.*-\d{2}:\d{2}-\d{2}:\d{2})_(.*)", s3_key) or \
-                re.match(r"^(\S+?)_(\S+?)_([^\_]+)_(.*)", extracted_file_path)
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar, member_pool(workers, subroutine_config, s3, log, db, ledger) as pool:
+        for member in tar:
+            file_name = member.name
+            if not member.isfile():
+                continue
+            if file_name.startswith('._'):
+                print(f"Skipping Apple Double file: {file_name}")
+                continue
+
+            with labels(member=file_name):
+                # Members of a streamed archive can only be read before moving to the next one
+                with stage("extract") as extracted:
+                    data = tar.extractfile(member).read()
+                    extracted.bytes = len(data)
+
+                on_imported = None
+                if ledger is not None:
+                    digest = member_digest(data)
+                    if ledger.seen(digest):
+                        print(f"Skipping {file_name}, already ingested")
+                        continue
+                    on_imported = lambda digest=digest: ledger.record(digest)
+
+                s3_key = f"extracted/{file_name}"
+                print(f"Uploading {file_name} to s3://{get_processed_bucket_name()}/extracted")
+
+                if pool is not None:
+                    pool.submit(file_name, s3_key, lambda s3_key=s3_key, data=data: place_member(s3, s3_key, data=data), source=io.BytesIO(data), on_imported=on_imported)
+                    continue
+
+                with stage("member", bytes=len(data)):
+                    try:
+                        if produce_import_files(subroutine_config, get_raw_bucket_name(), s3_key, file_name, log, db, s3, source=io.BytesIO(data), ledger=ledger) and on_imported:
+                            on_imported()
+                    except Exception as e:
+                        print(f"Error in produce_import_files: {e}")
+                        log.error(f"Error in produce_import_files: {e}")
 
-        if match:
-            customer, server, date, filename = match.groups()
-            customer = re.match(r".*/([^/]+)$", customer).group(1)
-            subroutine_key = filename
+                    try:
+                        place_member(s3, s3_key, data=data)
+                    except Exception as e:
+                        print(f"Error move produce_import_files: {e}")
+                        log.error(f"Error move produce_import_files: {e}")
 
-            print(f"CUSTOMER{customer}")
 
-            # Modify the subroutine key as needed
-            subroutine_key = re.sub(r"_for_graph", "", subroutine_key)
-            subroutine_key = re.sub(r"_\d+$", "", subroutine_key)
-            subroutine_key = re.sub(r"_\d+.log$", "", subroutine_key)
-            subroutine_key = re.sub(r".log$", "", subroutine_key)
+def resolve_import(subroutine_config, extracted_file_path, file_name, log):
+    """
+    Work out which importer handles a member and the arguments it is called with.
 
-            match = re.search(r"_(\d+)k", subroutine_key)
+    Returns a tuple (func_name, header, customer, server, subroutine_key, digits), or None
+    when the member name does not map onto a configured subroutine.
+    """
+    route = router_for(subroutine_config, IMPORTERS).resolve(file_name, log)
+    if route is None:
+        return None
+    return route.func_name, route.header, route.customer, route.server, route.subroutine_key, route.digits
 
-            if match:
-                # Save the digits into a separate variable
-                digits = int(match.group(1))
 
-                # Modify the subroutine_key to remove the digits but keep '_k'
-                subroutine_key = re.sub(r"_\d+k", "_k", subroutine_key)
-            else:
-                # Set digits to None if no match is found
-                digits = 0
-
-            # Check if subroutine exists and call it
-            if subroutine_key in subroutine_config:
-                header = subroutine_config[subroutine_key]['VALUES']['IMPORT'][0][1]
-                func_name = subroutine_config[subroutine_key]['SUB']
-
-                # Dynamically call the function using globals()
-                func = globals().get(func_name)
-                if func:
-                    func(header, extracted_file_path, customer, server, subroutine_key, file_name, digits,s3,db)
-                else:
-                    log.error(f"Function {func_name} not found.")
+def produce_import_files(subroutine_config, bucket_name, extracted_file_path, file_name, log, db, s3, source=None, ledger=None):
+    """
+    Process a file from S3 after it has been uploaded.
+
+    ``source`` is an optional file object holding the member contents; when it is not
+    given the importer reads ``extracted_file_path`` from disk. ``ledger`` is the
+    ArchiveLedger holding the watermarks. With IMPORT_CHUNK_ROWS set the member is
+    imported in chunks. Returns True when the member was imported.
+    """
+    s3_key = f"extracted/{file_name}"
+    try:
+        route = router_for(subroutine_config, IMPORTERS).resolve(file_name, log)
+        if route:
+            customer, server, subroutine_key, digits, func_name, header, importer = route
+
+            if IMPORT_CHUNK_ROWS > 0 and func_name in PARSERS:
+                return import_chunked(func_name, header, source if source is not None else extracted_file_path, customer, server, subroutine_key, digits, s3, db, ledger=ledger)
+
+            if importer:
+                return bool(importer(header, source if source is not None else extracted_file_path, customer, server, subroutine_key, file_name, digits,s3,db, ledger=ledger))
             else:
-                log.error(f"No subroutine found for {subroutine_key}")
-        else:
-            log.error(f"Errors for {file_name} no pattern found")
+                log.error(f"Function {func_name} not found.")
 
     except Exception as e:
         log.error(f"Failed to process S3 file {s3_key}: {e}")
+    return False
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+# Prefix of the ledger documents in the processed bucket
+LEDGER_PREFIX = "ledger/"
+
+# WATERMARKS modes: filter rows and advance the watermarks, only advance them (backfill),
+# or neither
+WATERMARK_MODES = ("filter", "backfill", "off")
+
+
+def member_digest(data: bytes) -> str:
+    """Content hash identifying an archive member independently of its archive."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def watermark_key(subroutine_key: str, digits) -> str:
+    """Measurement a watermark is kept for: the subroutine plus its page size digits."""
+    return f"{subroutine_key}:{int(digits or 0)}"
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """member_digest of a member extracted to disk, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class S3LedgerStore:
+    """Ledger documents stored as JSON objects under ledger/ in a bucket."""
+
+    def __init__(self, s3, bucket: str, prefix: str = LEDGER_PREFIX):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def read(self, name: str):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}{name}")
+        except Exception as e:
+            if getattr(e, "response", {}).get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return json.loads(response["Body"].read())
+
+    def write(self, name: str, document: dict) -> None:
+        self.s3.put_object(Bucket=self.bucket, Key=f"{self.prefix}{name}", Body=json.dumps(document).encode("utf-8"))
+
+
+class LocalLedgerStore:
+    """Ledger documents stored as JSON files in a local directory (development and tests)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def read(self, name: str):
+        try:
+            with open(os.path.join(self.root, name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write(self, name: str, document: dict) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, name)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(document, f)
+        os.replace(f"{path}.tmp", path)
+
+
+class ArchiveLedger:
+    """
+    The ledger of one customer/server, opened for one archive.
+
+    ``ingested`` tells whether the archive (by ETag) was already ingested completely,
+    ``seen`` whether a member with the same content was. Members imported by this run are
+    collected with ``record`` and written by IngestionLedger.commit; the archive is
+    ``complete`` once every member that was not seen has been recorded.
+
+    ``watermark`` is the latest timestamp ingested per measurement when the archive was
+    opened; rows at or before it are dropped. ``advance`` collects the new watermarks,
+    which only take effect once committed, so members of the same archive are all
+    filtered against the same snapshot.
+    """
+
+    def __init__(self, name: str, etag: str, document: dict, watermarks: str = "filter"):
+        if watermarks not in WATERMARK_MODES:
+            raise ValueError(f"Unknown watermark mode {watermarks!r}, expected one of {WATERMARK_MODES}")
+        self.name = name
+        self.etag = etag
+        self.archives = document.get("archives", {})
+        self.members = document.get("members", {})
+        self.watermarks = document.get("watermarks", {})
+        self.mode = watermarks
+        self.imported = []
+        self.pending = set()
+        self.advanced = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ingested(self) -> bool:
+        return self.etag in self.archives
+
+    def seen(self, digest: str) -> bool:
+        if digest in self.members:
+            return True
+        with self._lock:
+            self.pending.add(digest)
+        return False
+
+    def record(self, digest: str) -> None:
+        with self._lock:
+            self.imported.append(digest)
+
+    @property
+    def complete(self) -> bool:
+        with self._lock:
+            return self.pending.issubset(self.imported)
+
+    def watermark(self, subroutine_key: str, digits):
+        """The measurement's watermark as a Timestamp, or None when rows are not filtered."""
+        if self.mode != "filter":
+            return None
+        epoch = self.watermarks.get(watermark_key(subroutine_key, digits))
+        return None if epoch is None else pd.Timestamp(epoch, unit="s")
+
+    def advance(self, subroutine_key: str, digits, df: pd.DataFrame) -> None:
+        """Raise the measurement's pending watermark to the latest datetime of ``df``."""
+        if self.mode == "off" or 'datetime' not in df.columns or not pd.api.types.is_datetime64_dtype(df['datetime'].dtype):
+            return
+        latest = df['datetime'].max()
+        if pd.isna(latest):
+            return
+        epoch = int(latest.value // 10**9)
+        key = watermark_key(subroutine_key, digits)
+        with self._lock:
+            self.advanced[key] = max(epoch, self.advanced.get(key, epoch))
+
+
+class IngestionLedger:
+    """
+    Archives (by S3 ETag) and members (by content hash) already written to InfluxDB,
+    one document per customer/server.
+
+    A document is read when an archive is opened and re-read, merged and written when it
+    is committed, so archives of the same customer/server ingested concurrently in this
+    container do not drop each other's entries; watermarks only ever move forward.
+    Archive and member entries older than ``retention_days`` are dropped on commit.
+    """
+
+    def __init__(self, store, retention_days: float = 30, watermarks: str = "filter"):
+        self.store = store
+        self.retention = retention_days * 86400
+        self.watermarks = watermarks
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def document_name(customer: str, server: str) -> str:
+        return f"{customer}_{server}.json".replace("/", "%2F")
+
+    def open(self, customer: str, server: str, etag: str, backfill: bool = False) -> ArchiveLedger:
+        """
+        Snapshot the customer/server ledger for one archive. ``backfill`` ingests rows at
+        or before the watermarks too (they still only move forward).
+        """
+        name = self.document_name(customer, server)
+        watermarks = "backfill" if backfill and self.watermarks == "filter" else self.watermarks
+        return ArchiveLedger(name, etag, self.store.read(name) or {}, watermarks)
+
+    def commit(self, archive: ArchiveLedger, complete: bool) -> None:
+        """
+        Record the members imported for ``archive``, and the archive itself when every
+        member was imported (``complete``).
+        """
+        if not archive.imported and not complete:
+            return
+        now = int(time.time())
+        with self._lock:
+            document = self.store.read(archive.name) or {}
+            archives = document.setdefault("archives", {})
+            members = document.setdefault("members", {})
+            watermarks = document.setdefault("watermarks", {})
+            for digest in archive.imported:
+                members[digest] = now
+            if complete:
+                archives[archive.etag] = now
+            for key, epoch in archive.advanced.items():
+                watermarks[key] = max(epoch, watermarks.get(key, epoch))
+            for entries in (archives, members):
+                for key in [key for key, recorded in entries.items() if now - recorded > self.retention]:
+                    del entries[key]
+            self.store.write(archive.name, document)
+
+
+def create_ledger(kind: str, s3=None, bucket: str = None, path: str = None, retention_days: float = 30, watermarks: str = "filter"):
+    """Build the IngestionLedger selected by LEDGER_STORE ("s3", "local" or "off" for None)."""
+    if kind == "off":
+        return None
+    if kind == "s3":
+        return IngestionLedger(S3LedgerStore(s3, bucket), retention_days, watermarks)
+    if kind == "local":
+        return IngestionLedger(LocalLedgerStore(path), retention_days, watermarks)
+    raise ValueError(f"Unknown ledger store {kind!r}, expected 's3', 'local' or 'off'")
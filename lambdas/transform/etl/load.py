@@ -1,156 +1,266 @@
+import io
+import itertools
 import os
 import uuid
 from datetime import datetime
 import boto3
 import re
 import pandas as pd
-from utils.s3 import move_s3_object,get_processed_bucket_name, get_raw_bucket_name
+from utils.s3 import place_s3_object,get_processed_bucket_name, get_raw_bucket_name
+from utils.metrics import current_labels, source_size, stage
+from utils.log_writer import get_logger, log_sampled
 from etl.clean import clean_data
+from etl.plan import get_plan, get_unpivot, finish_planned_frame
+from etl.reshape import unpivot_pairs
+from etl.output import ChunkedArtifact, serialise_frame
+from configs import USE_INGESTION_PLANS, OUTPUT_FORMAT, IMPORT_CHUNK_ROWS
 
-def import_data(header, filename, customer, server, subroutine_key, file, digits,s3,db):
+logger = get_logger(__name__)
+
+def member_name(source) -> str:
+    """Name of the member a parser reads: its path, or the member label of a streamed source."""
+    return source if isinstance(source, str) else current_labels().get("member", "<stream>")
+
+def log_frame(df, filename, header, subroutine_key):
+    """DEBUG dump of a parsed member, sampled per subroutine; rendered only when it is logged."""
+    log_sampled(logger, ("frame", subroutine_key), "DataFrame for %s with header: %s\n%s", member_name(filename), header, df)
+
+def read_csv(source, **kwargs) -> pd.DataFrame:
+    """pd.read_csv timed as the parse stage of a member."""
+    with stage("parse", bytes=source_size(source)) as parsed:
+        df = pd.read_csv(source, **kwargs)
+        parsed.rows = len(df)
+    return df
+
+def read_data(header, filename, customer, server, subroutine_key, digits, watermark=None):
+    plan = get_plan(subroutine_key, header) if USE_INGESTION_PLANS else None
+    if plan is not None:
+        try:
+            with stage("parse", bytes=source_size(filename)) as parsed:
+                df = plan.read(filename)
+                parsed.rows = len(df)
+            df = finish_planned_frame(df, customer, server, subroutine_key, digits, watermark)
+            logger.debug("DataFrame for %s read with the %s ingestion plan", member_name(filename), subroutine_key)
+            return df
+        except Exception as e:
+            logger.warning("Ingestion plan for %s does not fit %s (%s), inferring types instead", subroutine_key, member_name(filename), e)
+            if hasattr(filename, 'seek'):
+                filename.seek(0)
+
+    df = read_csv(filename, header=0)
+    df.columns = df.columns.str.strip()
+    df = clean_data(df, header, customer, server, subroutine_key,digits, watermark)
+    log_frame(df, filename, header, subroutine_key)
+    return df
+
+def read_partitions(header, filename, customer, server, subroutine_key, digits, watermark=None):
+    columns = [
+        "date","time","partnum", "npages", "nused", "npdata", "nrows", "flgs", "seqsc", "lkrqs", "lkwts",
+        "ucnt", "touts", "isrd", "iswrt", "isrwt", "isdel", "dlks", "bfrd", "bfwrt", "nextns", "area"
+    ]
+
+    # Load the file with specified columns
+    df = read_csv(
+        filename,
+        header=None,
+        names=columns,
+        sep=","
+    )
+    df.columns = df.columns.str.strip()
+    df = clean_data(df, header, customer, server, subroutine_key,digits, watermark)
+    df = df[~df['flgs'].apply(lambda x: isinstance(x, str))]
+    log_frame(df, filename, header, subroutine_key)
+    return df
+
+def read_unpivot(header, filename, customer, server, subroutine_key, digits, watermark=None):
+    # Wide logs with one group of columns per entity, reshaped to one row per entity
+    unpivot = get_unpivot(subroutine_key)
+    df = read_csv(filename, header=0)
+    df = unpivot_pairs(df, unpivot.group_size, unpivot.name_suffix, unpivot.decimals)
+
+    df.columns = df.columns.str.strip()
+    df = clean_data(df, header, customer, server, unpivot.measurement, digits, watermark)
+    log_frame(df, filename, header, subroutine_key)
+    return df
+
+def read_cpu_by_app(header, filename, customer, server, subroutine_key, digits, watermark=None):
+    # "<app> core,<app> percentage" column pairs; kept for configs that still name this SUB
+    df = read_csv(filename, header=0)
+    df = unpivot_pairs(df, 2, " core", 2)
+
+    df.columns = df.columns.str.strip()
+    df = clean_data(df, header, customer, server, 'cpu_by_app',digits, watermark)
+    log_frame(df, filename, header, subroutine_key)
+    return df
+
+def read_data_onstat_l(header, filename, customer, server, subroutine_key, digits, watermark=None):
+    column_names = ['date', 'time', 'epoch', 'pbuffer', 'pbufused', 'pbufsize', 'ppct_io', 'lbuffer', 'lbufused', 'lbufsize', 'physused']
+
+    # Load the CSV file with custom headers
+    df = read_csv(
+        filename,
+        names=column_names,  # Use custom column names
+        header=0,  # The first row will be skipped (since you are providing column names)
+        encoding='utf-8',  # Ensure the encoding is correct
+        skip_blank_lines=True,  # Skip blank lines if any
+        on_bad_lines='skip',  # Skip any problematic lines
+        delimiter=','  # Specify comma as delimiter
+    )
+
+    df.columns = df.columns.str.strip()
+    df = clean_data(df, header, customer, server, subroutine_key, digits, watermark)
+    log_frame(df, filename, header, subroutine_key)
+    return df
+
+def member_watermark(ledger, subroutine_key, digits):
+    """Watermark the member's rows are filtered against, None without an ArchiveLedger."""
+    return ledger.watermark(subroutine_key, digits) if ledger is not None else None
+
+def publish_import_file(df, customer, server, subroutine_key, digits, s3, db, output_format=OUTPUT_FORMAT, ledger=None):
+    """
+    Write a cleaned DataFrame to the to_ingest/ area of the processed bucket and send it
+    to InfluxDB. The artifact is serialised in memory as CSV or Parquet (OUTPUT_FORMAT)
+    and placed with a single PUT. With an ArchiveLedger the measurement's watermark is
+    advanced to the latest timestamp written; a frame the watermark emptied is not
+    published at all.
+    """
+    if df.empty and member_watermark(ledger, subroutine_key, digits) is not None:
+        print(f"No rows after the {subroutine_key} watermark, nothing to publish")
+        return
+    uuid_tmp=uuid.uuid4()
+    with stage("serialise", rows=len(df)) as serialised:
+        body, extension = serialise_frame(df, output_format)
+        serialised.bytes = len(body)
+    # Create a dynamic filename
+    filename_s3 = f"{customer}_{server}_{subroutine_key}_{uuid_tmp}_{digits}.{extension}"
+    s3_key = f"to_ingest/{filename_s3}"
+    place_s3_object(s3, s3_key, body=body)
+    print(f"My S3 {s3_key} ({len(body)} bytes)")
+    # Send to InfluxDB; raises when the rows cannot be serialised or a batch is rejected
+    db.write_dataframe(df,s3_key,customer,server)
+    # Only rows handed to InfluxDB move the watermark, and the archive's new watermarks are
+    # committed only if InfluxDB accepted every write of the archive (process_record)
+    if ledger is not None:
+        ledger.advance(subroutine_key, digits, df)
+
+def import_data(header, filename, customer, server, subroutine_key, file, digits,s3,db, ledger=None):
     try:
-        records = []
-        df = pd.read_csv(filename, header=0)
-        df.columns = df.columns.str.strip()
-        df = clean_data(df, header, customer, server, subroutine_key,digits)
-        print(f"DataFrame for {filename} with header: {header}")
-        print(df)
-        uuid_tmp=uuid.uuid4()
-        # Create a dynamic filename
-        filename_new = f"{customer}_{server}_{subroutine_key}_{uuid_tmp}.csv"
-        filename_s3 = f"{customer}_{server}_{subroutine_key}_{uuid_tmp}_{digits}.csv"
-        tmp_file_path = os.path.join('/tmp', filename_new)
-        df.to_csv(tmp_file_path, index=False)
-        s3_key = f"to_ingest/{filename_s3}"
-        s3.upload_file(tmp_file_path, get_raw_bucket_name(), s3_key)
-        print(f"My S3 {s3_key}")
-        print(f"My tmp {filename_new}")
-        records = df.to_dict(orient="records")
-        db.write(records,s3_key,customer,server)  # Send to InfluxD
-        move_s3_object(get_raw_bucket_name(), get_processed_bucket_name(), s3_key)
-        print(f"Hopefully uploaded {filename_new} to s3://{get_processed_bucket_name()}/{s3_key}")
+        df = read_data(header, filename, customer, server, subroutine_key, digits, member_watermark(ledger, subroutine_key, digits))
+        publish_import_file(df, customer, server, subroutine_key, digits, s3, db, ledger=ledger)
+        return True
 
     except Exception as e:
         print(f"ERROR: Failed to process {filename}: {e}")
+        return False
 
-def import_partitions(header, filename, customer, server, subroutine_key, file, digits,s3,db):
+def import_partitions(header, filename, customer, server, subroutine_key, file, digits,s3,db, ledger=None):
     try:
-        records = []
-        columns = [
-            "date","time","partnum", "npages", "nused", "npdata", "nrows", "flgs", "seqsc", "lkrqs", "lkwts",
-            "ucnt", "touts", "isrd", "iswrt", "isrwt", "isdel", "dlks", "bfrd", "bfwrt", "nextns", "area"
-        ]
-
-        # Load the file with specified columns
-        df = pd.read_csv(
-            filename,
-            header=None,
-            names=columns,
-            sep=","
-        )
-        df.columns = df.columns.str.strip()
-        print(df)
-        df = clean_data(df, header, customer, server, subroutine_key,digits)
-        df = df[~df['flgs'].apply(lambda x: isinstance(x, str))]
-        print(f"DataFrame for {filename} with header: {header}")
-        uuid_tmp=uuid.uuid4()
-        # Create a dynamic filename
-        filename_new = f"{customer}_{server}_{subroutine_key}_{uuid_tmp}.csv"
-        filename_s3 = f"{customer}_{server}_{subroutine_key}_{uuid_tmp}_{digits}.csv"
-        tmp_file_path = os.path.join('/tmp', filename_new)
-        df.to_csv(tmp_file_path, index=False)
-        s3_key = f"to_ingest/{filename_s3}"
-        s3.upload_file(tmp_file_path, get_raw_bucket_name(), s3_key)
-        print(f"My S3 {s3_key}")
-        print(f"My tmp {filename_new}")
-        records = df.to_dict(orient="records")
-        db.write(records,s3_key,customer,server)  # Send to InfluxD
-        move_s3_object(get_raw_bucket_name(), get_processed_bucket_name(), s3_key)
-        print(f"Hopefully uploaded {filename_new} to s3://{get_processed_bucket_name()}/{s3_key}")
+        df = read_partitions(header, filename, customer, server, subroutine_key, digits, member_watermark(ledger, subroutine_key, digits))
+        publish_import_file(df, customer, server, subroutine_key, digits, s3, db, ledger=ledger)
+        return True
 
     except Exception as e:
         print(f"ERROR: Failed to process {filename}: {e}")
+        return False
 
-def cpu_by_app(header, filename, customer, server, subroutine_key, file, digits, s3,db):
+def cpu_by_app(header, filename, customer, server, subroutine_key, file, digits, s3,db, ledger=None):
     try:
-        records = []
-        df = pd.read_csv(filename, header=0)
-        # have to split up the record into seperate rows
-        data = []
-        for _, row in df.iterrows():
-            timestamp = row[0]  # DateTime column
-            for i in range(1, len(row), 2):
-                metric_name = df.columns[i].replace(" core", "")  # Remove " core" suffix for metric name
-                cores = row[i]
-                percentage = row[i + 1]
-
-                # Append the structured row
-                data.append({
-                    "datetime": timestamp,
-                    "metric": metric_name,
-                    "cores": round(cores, 2),
-                    "percentage": round(percentage, 2),
-                })
-
-        # Create the structured DataFrame
-        df = pd.DataFrame(data)
-
-        df.columns = df.columns.str.strip()
-        df = clean_data(df, header, customer, server, 'cpu_by_app',digits)
-        print(f"DataFrame for {filename} with header: {header}")
-        print(df)
-        uuid_tmp=uuid.uuid4()
-        # Create a dynamic filename
-        filename_new = f"{customer}_{server}_{subroutine_key}_{uuid_tmp}.csv"
-        filename_s3 = f"{customer}_{server}_{subroutine_key}_{uuid_tmp}_{digits}.csv"
-        tmp_file_path = os.path.join('/tmp', filename_new)
-        df.to_csv(tmp_file_path, index=False)
-        s3_key = f"to_ingest/{filename_s3}"
-        s3.upload_file(tmp_file_path, get_raw_bucket_name(), s3_key)
-        print(f"My S3 {s3_key}")
-        print(f"My tmp {filename_new}")
-        records = df.to_dict(orient="records")
-        db.write(records,s3_key,customer,server)  # Send to InfluxD
-        move_s3_object(get_raw_bucket_name(), get_processed_bucket_name(), s3_key)
-        print(f"Hopefully uploaded {filename_new} to s3://{get_processed_bucket_name()}/{s3_key}")
+        df = read_cpu_by_app(header, filename, customer, server, subroutine_key, digits, member_watermark(ledger, subroutine_key, digits))
+        publish_import_file(df, customer, server, subroutine_key, digits, s3, db, ledger=ledger)
+        return True
 
     except Exception as e:
         print(f"ERROR: Failed to process {filename}: {e}")
+        return False
 
-def import_data_onstat_l(header, filename, customer, server, subroutine_key, file, digits, s3,db):
+def import_unpivot(header, filename, customer, server, subroutine_key, file, digits, s3,db, ledger=None):
     try:
-        records = []
-        column_names = ['date', 'time', 'epoch', 'pbuffer', 'pbufused', 'pbufsize', 'ppct_io', 'lbuffer', 'lbufused', 'lbufsize', 'physused']
-
-# Load the CSV file with custom headers
-        df = pd.read_csv(
-            filename,
-            names=column_names,  # Use custom column names
-            header=0,  # The first row will be skipped (since you are providing column names)
-            encoding='utf-8',  # Ensure the encoding is correct
-            skip_blank_lines=True,  # Skip blank lines if any
-            on_bad_lines='skip',  # Skip any problematic lines
-            delimiter=','  # Specify comma as delimiter
-        )
-        
-        df.columns = df.columns.str.strip()
-        df = clean_data(df, header, customer, server, subroutine_key, digits)
-        print(f"DataFrame for {filename} with header: {header}")
-        print(df)
-        uuid_tmp=uuid.uuid4()
-        # Create a dynamic filename
-        filename_new = f"{customer}_{server}_{subroutine_key}_{uuid_tmp}.csv"
-        filename_s3 = f"{customer}_{server}_{subroutine_key}_{uuid_tmp}.csv"
-        tmp_file_path = os.path.join('/tmp', filename_new)
-        df.to_csv(tmp_file_path, index=False)
-        s3_key = f"to_ingest/{filename_s3}"
-        s3.upload_file(tmp_file_path, get_raw_bucket_name(), s3_key)
-        print(f"My S3 {s3_key}")
-        print(f"My tmp {filename_new}")
-        records = df.to_dict(orient="records")
-        db.write(records,s3_key,customer,server)  # Send to InfluxD
-        move_s3_object(get_raw_bucket_name(), get_processed_bucket_name(), s3_key)
-        print(f"Hopefully uploaded {filename_new} to s3://{get_processed_bucket_name()}/{s3_key}")
+        df = read_unpivot(header, filename, customer, server, subroutine_key, digits, member_watermark(ledger, subroutine_key, digits))
+        publish_import_file(df, customer, server, subroutine_key, digits, s3, db, ledger=ledger)
+        return True
 
     except Exception as e:
         print(f"ERROR: Failed to process {filename}: {e}")
+        return False
+
+def import_data_onstat_l(header, filename, customer, server, subroutine_key, file, digits, s3,db, ledger=None):
+    try:
+        df = read_data_onstat_l(header, filename, customer, server, subroutine_key, digits, member_watermark(ledger, subroutine_key, digits))
+        publish_import_file(df, customer, server, subroutine_key, digits, s3, db, ledger=ledger)
+        return True
+
+    except Exception as e:
+        print(f"ERROR: Failed to process {filename}: {e}")
+        return False
+
+# Parse/clean stage of every importer, keyed by the SUB name used in subroutines_config.json.
+# These are plain module-level functions so they can be shipped to a process pool.
+PARSERS = {
+    "import_data": read_data,
+    "import_partitions": read_partitions,
+    "cpu_by_app": read_cpu_by_app,
+    "import_unpivot": read_unpivot,
+    "import_data_onstat_l": read_data_onstat_l,
+}
+
+# SUBs whose files have no header line; every other member starts with one
+HEADERLESS_SUBS = ("import_partitions",)
+
+def iter_row_chunks(source, chunk_rows: int, has_header: bool = True):
+    """
+    Split a CSV member into BytesIO chunks of at most ``chunk_rows`` lines, each starting
+    with the member's header line, so every chunk reads like a small file of its own.
+
+    ``source`` is a path or a binary file object; it is read line by line.
+    """
+    f = open(source, 'rb') if isinstance(source, str) else source
+    try:
+        header_line = f.readline() if has_header else b""
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                break
+            yield io.BytesIO(header_line + b"".join(lines))
+    finally:
+        if f is not source:
+            f.close()
+
+def import_chunked(func_name, header, filename, customer, server, subroutine_key, digits, s3, db, ledger=None, chunk_rows=IMPORT_CHUNK_ROWS, output_format=OUTPUT_FORMAT):
+    """
+    Import a member ``chunk_rows`` rows at a time (IMPORT_CHUNK_ROWS).
+
+    Every chunk goes through the SUB's parser, is appended to the artifact and written to
+    InfluxDB before the next one is read, so memory is bounded by the chunk size whatever
+    the size of the file. The artifact is placed with a single PUT once complete.
+    Returns True when the member was imported.
+    """
+    try:
+        parser = PARSERS[func_name]
+        watermark = member_watermark(ledger, subroutine_key, digits)
+        artifact = ChunkedArtifact(output_format)
+        try:
+            s3_key = f"to_ingest/{customer}_{server}_{subroutine_key}_{uuid.uuid4()}_{digits}.{artifact.extension}"
+            for chunk in iter_row_chunks(filename, chunk_rows, func_name not in HEADERLESS_SUBS):
+                df = parser(header, chunk, customer, server, subroutine_key, digits, watermark)
+                if df.empty and watermark is not None:
+                    continue
+                with stage("serialise", rows=len(df)):
+                    artifact.write(df)
+                # One summary record per member, as for a whole-file import
+                db.write_dataframe(df, s3_key, customer, server, summary=artifact.chunks == 1)
+                # After the write only, as in publish_import_file
+                if ledger is not None:
+                    ledger.advance(subroutine_key, digits, df)
+
+            if artifact.chunks == 0:
+                print(f"No rows after the {subroutine_key} watermark, nothing to publish")
+                return True
+            place_s3_object(s3, s3_key, body=artifact.finish())
+            print(f"My S3 {s3_key} ({artifact.rows} rows in {artifact.chunks} chunks)")
+        finally:
+            artifact.close()
+        return True
+
+    except Exception as e:
+        print(f"ERROR: Failed to process {filename} in chunks: {e}")
+        return False
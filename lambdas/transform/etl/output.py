@@ -0,0 +1,109 @@
+import io
+import tempfile
+
+import pandas as pd
+
+from configs import PARQUET_COMPRESSION, ARTIFACT_SPOOL_BYTES
+
+# Low-cardinality text columns stored dictionary-encoded in Parquet
+DICTIONARY_COLUMNS = ['customer', 'server', '_measurement']
+
+
+def frame_to_csv(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def frame_to_arrow(df: pd.DataFrame):
+    """
+    Convert a cleaned DataFrame to an Arrow table for Parquet.
+
+    ``datetime`` becomes a millisecond timestamp, customer/server/_measurement are
+    dictionary encoded and object columns mixing text and numbers (left by the inferring
+    reader) are stored as text, since a Parquet column has a single type.
+    """
+    import pyarrow as pa
+
+    df = df.copy(deep=False)
+    for column in df.columns:
+        if pd.api.types.is_object_dtype(df[column].dtype) and pd.api.types.infer_dtype(df[column], skipna=True) not in ('string', 'empty'):
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for column in DICTIONARY_COLUMNS:
+        if column in table.column_names:
+            index = table.schema.get_field_index(column)
+            table = table.set_column(index, column, table[column].cast(pa.string()).dictionary_encode())
+    if 'datetime' in table.column_names:
+        index = table.schema.get_field_index('datetime')
+        table = table.set_column(index, 'datetime', table['datetime'].cast(pa.timestamp('ms')))
+    return table
+
+
+def frame_to_parquet(df: pd.DataFrame, compression: str = PARQUET_COMPRESSION) -> bytes:
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(frame_to_arrow(df), buffer, compression=compression)
+    return buffer.getvalue()
+
+
+# Serialiser and file extension per OUTPUT_FORMAT
+SERIALISERS = {
+    'csv': (frame_to_csv, 'csv'),
+    'parquet': (frame_to_parquet, 'parquet'),
+}
+
+
+def serialise_frame(df: pd.DataFrame, output_format: str):
+    """Return (body, extension) for a cleaned DataFrame in the requested output format."""
+    if output_format not in SERIALISERS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {sorted(SERIALISERS)}")
+    serialise, extension = SERIALISERS[output_format]
+    return serialise(df), extension
+
+
+class ChunkedArtifact:
+    """
+    One to_ingest/ artifact built from a member's cleaned chunks, one chunk at a time.
+
+    CSV chunks are appended with the header written once, Parquet chunks become row
+    groups of a single file (cast to the schema of the first chunk). The output is kept in
+    a spooled file that moves to /tmp past ``spool_bytes``, so neither the frames nor the
+    serialised artifact have to be held in memory as a whole.
+    """
+
+    def __init__(self, output_format: str, compression: str = PARQUET_COMPRESSION, spool_bytes: int = ARTIFACT_SPOOL_BYTES):
+        if output_format not in SERIALISERS:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {sorted(SERIALISERS)}")
+        self.output_format = output_format
+        self.extension = SERIALISERS[output_format][1]
+        self.compression = compression
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+        self.rows = 0
+        self.chunks = 0
+        self._parquet = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.output_format == 'csv':
+            self.file.write(df.to_csv(index=False, header=self.chunks == 0).encode('utf-8'))
+        else:
+            import pyarrow.parquet as pq
+
+            table = frame_to_arrow(df)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.file, table.schema, compression=self.compression)
+            else:
+                table = table.cast(self._parquet.schema_arrow)
+            self._parquet.write_table(table)
+        self.rows += len(df)
+        self.chunks += 1
+
+    def finish(self):
+        """Complete the artifact and return its file object, rewound for upload."""
+        if self._parquet is not None:
+            self._parquet.close()
+        self.file.seek(0)
+        return self.file
+
+    def close(self) -> None:
+        self.file.close()
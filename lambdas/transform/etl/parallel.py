@@ -0,0 +1,163 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from etl.extract import resolve_import
+from etl.load import PARSERS, import_chunked, member_watermark, publish_import_file
+from etl.plan import compile_plans
+from utils.log_writer import get_logger, init_worker
+from utils.metrics import call_with_labels, current_labels, labels, record
+from configs import IMPORT_CHUNK_ROWS
+
+# Parse workers start from a clean server process instead of forking the Lambda process,
+# whose record, I/O and log-queue threads may hold a lock at the moment of the fork
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def init_parse_worker(level: int, subroutine_config: dict) -> None:
+    """
+    Initializer of the parse processes: they start without the state the Lambda process
+    set up, so set up logging (see init_worker) and compile the ingestion plans, unpivots
+    and datetime formats of ``subroutine_config`` again.
+    """
+    init_worker(level)
+    compile_plans(subroutine_config)
+
+
+def create_parse_pool(workers: int, kind: str, log, subroutine_config: dict):
+    """
+    Create the executor used for the pandas parse/clean stage.
+
+    AWS Lambda has no /dev/shm, so multiprocessing primitives (and therefore a process
+    pool) cannot be created there; in that case parsing falls back to threads. Workers
+    are started with PARSE_START_METHOD, never forked from this multi-threaded process,
+    and compile ``subroutine_config`` themselves (init_parse_worker).
+    """
+    if kind == "process":
+        try:
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(PARSE_START_METHOD),
+                                       initializer=init_parse_worker, initargs=(get_logger().getEffectiveLevel(), subroutine_config))
+        except (OSError, NotImplementedError) as e:
+            log.warning(f"Process pool unavailable ({e}), parsing members in threads")
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+class MemberPool:
+    """
+    Bounded worker pool that imports archive members concurrently.
+
+    Each member is parsed and cleaned in the parse pool (processes by default), then
+    written to S3 and InfluxDB from an I/O thread pool. At most ``workers * 2`` members
+    are in flight at once, so a streamed archive is never held in memory as a whole.
+    """
+
+    def __init__(self, workers: int, subroutine_config, s3, log, db, kind: str = "process", io_workers: int = None, ledger=None):
+        self.subroutine_config = subroutine_config
+        self.ledger = ledger
+        self.s3 = s3
+        self.log = log
+        self.db = db
+        self.parse_pool = create_parse_pool(workers, kind, log, subroutine_config)
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers or workers * 2)
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.outstanding = 0
+        self.done = threading.Condition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, file_name: str, extracted_file_path: str, place_raw, source=None, on_imported=None):
+        """
+        Queue a member for import.
+
+        ``place_raw`` is a callable that stores the raw member in its final S3 location; it runs on an I/O
+        thread once the member has been imported. ``source`` is the in-memory member for
+        streamed archives, otherwise the importer reads ``extracted_file_path``.
+        ``on_imported`` is called once the member has been written to S3 and InfluxDB.
+        The member stage is timed from here until its raw copy is placed, with the
+        caller's metric labels.
+        """
+        member = (current_labels(), time.perf_counter())
+        self.slots.acquire()
+        with self.done:
+            self.outstanding += 1
+
+        try:
+            route = resolve_import(self.subroutine_config, extracted_file_path, file_name, self.log)
+            parser = PARSERS.get(route[0]) if route else None
+            if route and parser is None:
+                self.log.error(f"Function {route[0]} not found.")
+        except Exception as e:
+            self.log.error(f"Failed to process S3 file extracted/{file_name}: {e}")
+            route, parser = None, None
+
+        if parser is None:
+            self.io_pool.submit(self._finish, file_name, place_raw, None, None, None, member)
+            return
+
+        func_name, header, customer, server, subroutine_key, digits = route
+        if IMPORT_CHUNK_ROWS > 0:
+            # Chunked imports read, clean and write chunk by chunk on the I/O thread
+            chunked = lambda: import_chunked(
+                func_name, header, source if source is not None else extracted_file_path,
+                customer, server, subroutine_key, digits, self.s3, self.db, ledger=self.ledger
+            )
+            self.io_pool.submit(self._finish, file_name, place_raw, route, chunked, on_imported, member)
+            return
+
+        try:
+            parsed = self.parse_pool.submit(
+                call_with_labels, member[0], parser, header, source if source is not None else extracted_file_path,
+                customer, server, subroutine_key, digits, member_watermark(self.ledger, subroutine_key, digits)
+            )
+        except Exception as e:
+            self.log.error(f"Error in produce_import_files: {e}")
+            self.io_pool.submit(self._finish, file_name, place_raw, None, None, None, member)
+            return
+        parsed.add_done_callback(lambda future: self.io_pool.submit(self._finish, file_name, place_raw, route, future, on_imported, member))
+
+    def _finish(self, file_name, place_raw, route, parsed, on_imported, member=None):
+        """
+        Write an imported member and place its raw copy. ``parsed`` is the Future of the
+        parse stage, or for chunked imports a callable doing the whole import. ``member``
+        holds the metric labels and start time of the member.
+        """
+        member_labels, started = member or ({}, time.perf_counter())
+        try:
+            with labels(**member_labels):
+                if route is not None:
+                    func_name, header, customer, server, subroutine_key, digits = route
+                    try:
+                        if callable(parsed):
+                            imported = parsed()
+                        else:
+                            publish_import_file(parsed.result(), customer, server, subroutine_key, digits, self.s3, self.db, ledger=self.ledger)
+                            imported = True
+                        if imported and on_imported is not None:
+                            on_imported()
+                    except Exception as e:
+                        print(f"ERROR: Failed to process {file_name}: {e}")
+                        self.log.error(f"Error in produce_import_files: {e}")
+
+                try:
+                    place_raw()
+                except Exception as e:
+                    print(f"Error move produce_import_files: {e}")
+                    self.log.error(f"Error move produce_import_files: {e}")
+                record("member", time.perf_counter() - started)
+        finally:
+            self.slots.release()
+            with self.done:
+                self.outstanding -= 1
+                self.done.notify_all()
+
+    def close(self):
+        """Wait for every queued member to be imported, then shut both pools down."""
+        with self.done:
+            self.done.wait_for(lambda: self.outstanding == 0)
+        self.parse_pool.shutdown()
+        self.io_pool.shutdown()
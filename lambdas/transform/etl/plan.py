@@ -0,0 +1,184 @@
+import io
+
+import pandas as pd
+
+from etl.clean import replace_invalid_values, drop_ingested_rows
+from utils.metrics import timed
+from etl.timestamps import DATETIME_FORMATS, DEFAULT_DATETIME_FORMAT, combine_date_time, parse_datetimes
+
+# Compiled plans by subroutine key, filled once at cold start by compile_plans()
+PLANS = {}
+UNPIVOTS = {}
+
+# Importers whose files have a header line followed by date,time (or datetime) and the
+# values in VALUES.IMPORT order; the others have their own layout.
+PLANNED_SUBS = ("import_data",)
+
+
+class PlanMismatch(ValueError):
+    """The file does not have the layout the plan was compiled for."""
+
+
+class IngestionPlan:
+    """
+    Everything needed to read one subroutine's files without type inference.
+
+    Built from a subroutines_config.json entry: ``header`` gives the target column names
+    (``datetime`` first), the optional ``TYPES`` map overrides the default float64 of a
+    column ("string" for text columns) and ``DATETIME_FORMAT`` the timestamp format.
+    """
+
+    def __init__(self, subroutine_key: str, header: str, types: dict = None, datetime_format: str = DEFAULT_DATETIME_FORMAT):
+        self.subroutine_key = subroutine_key
+        self.header = header
+        self.target_names = header.split(',')
+        self.value_names = [name for name in self.target_names if name != 'datetime']
+        types = types or {}
+        self.dtypes = {name: types.get(name, "float64") for name in self.value_names}
+        self.datetime_format = datetime_format
+
+    def source_columns(self, file_columns):
+        """
+        Map the file's own column names onto the plan.
+
+        Returns (time_columns, value_columns): the date/time columns to read and the file
+        columns holding the plan's values, positionally, extra trailing columns dropped.
+        """
+        if file_columns[:1] == ['datetime']:
+            time_columns = ['datetime']
+        elif file_columns[:2] == ['date', 'time']:
+            time_columns = ['date', 'time']
+        else:
+            raise PlanMismatch(f"no date/time columns in {file_columns[:2]}")
+
+        value_columns = file_columns[len(time_columns):len(time_columns) + len(self.value_names)]
+        if len(value_columns) < len(self.value_names):
+            raise PlanMismatch(f"{len(value_columns)} value columns, plan expects {len(self.value_names)}")
+        if len(set(file_columns)) != len(file_columns):
+            raise PlanMismatch("duplicate column names")
+        return time_columns, value_columns
+
+    def read(self, source) -> pd.DataFrame:
+        """
+        Read a file with the pyarrow CSV reader and return it with the target column names:
+        ``datetime`` first, then the values with their declared dtypes.
+
+        Raises PlanMismatch (or a pyarrow/pandas parse error) when the file does not fit
+        the plan; callers fall back to the inferring reader.
+        """
+        import pyarrow as pa
+        from pyarrow import csv
+
+        if hasattr(source, 'read'):
+            data = source.read()
+        else:
+            with open(source, 'rb') as f:
+                data = f.read()
+        first_line = data.split(b'\n', 1)[0].decode('utf-8')
+        file_columns = [name.strip() for name in first_line.rstrip('\r').split(',')]
+        time_columns, value_columns = self.source_columns(file_columns)
+
+        column_types = {column: pa.string() for column in time_columns}
+        for column, name in zip(value_columns, self.value_names):
+            column_types[column] = pa.string() if self.dtypes[name] == "string" else pa.type_for_alias(self.dtypes[name])
+
+        table = csv.read_csv(
+            io.BytesIO(data),
+            read_options=csv.ReadOptions(column_names=file_columns, skip_rows=1),
+            convert_options=csv.ConvertOptions(
+                column_types=column_types,
+                include_columns=time_columns + value_columns,
+                strings_can_be_null=True,
+            ),
+        )
+        df = table.to_pandas()
+
+        try:
+            if time_columns == ['date', 'time']:
+                timestamps = combine_date_time(df['date'], df['time'], self.datetime_format)
+            else:
+                timestamps = parse_datetimes(df['datetime'], self.datetime_format)
+        except ValueError:
+            # Missing values come back as NaT, a wrong format still raises
+            if time_columns == ['date', 'time']:
+                timestamps = df['date'] + ' ' + df['time']
+            else:
+                timestamps = df['datetime']
+            timestamps = pd.to_datetime(timestamps, format=self.datetime_format)
+        df = df.drop(columns=time_columns)
+        df.columns = self.value_names
+        df.insert(0, 'datetime', timestamps)
+        return df
+
+
+class UnpivotPlan:
+    """
+    How to reshape a wide log with one group of columns per entity (see etl.reshape).
+
+    Built from the ``UNPIVOT`` entry of a subroutine: ``GROUP_SIZE`` columns per entity,
+    the ``NAME_SUFFIX`` removed from the first column of a group to get the entity name,
+    optional ``ROUND`` decimals and the ``MEASUREMENT`` name (defaults to the key).
+    """
+
+    def __init__(self, subroutine_key: str, header: str, spec: dict):
+        self.subroutine_key = subroutine_key
+        self.header = header
+        self.group_size = int(spec.get('GROUP_SIZE', 2))
+        self.name_suffix = spec.get('NAME_SUFFIX', '')
+        self.decimals = spec.get('ROUND')
+        self.measurement = spec.get('MEASUREMENT', subroutine_key)
+
+
+def compile_plans(subroutine_config: dict) -> dict:
+    """
+    Compile an IngestionPlan for every subroutine whose files fit the planned layout and
+    an UnpivotPlan for every subroutine with an UNPIVOT entry.
+    """
+    PLANS.clear()
+    UNPIVOTS.clear()
+    DATETIME_FORMATS.clear()
+    for subroutine_key, entry in subroutine_config.items():
+        DATETIME_FORMATS[subroutine_key] = entry.get('DATETIME_FORMAT', DEFAULT_DATETIME_FORMAT)
+        if 'UNPIVOT' in entry:
+            UNPIVOTS[subroutine_key] = UnpivotPlan(subroutine_key, entry['VALUES']['IMPORT'][0][1], entry['UNPIVOT'])
+        if entry.get('SUB') not in PLANNED_SUBS:
+            continue
+        header = entry['VALUES']['IMPORT'][0][1]
+        PLANS[subroutine_key] = IngestionPlan(
+            subroutine_key,
+            header,
+            types=entry.get('TYPES'),
+            datetime_format=entry.get('DATETIME_FORMAT', DEFAULT_DATETIME_FORMAT),
+        )
+    return PLANS
+
+
+def get_plan(subroutine_key: str, header: str):
+    """Return the compiled plan for a subroutine, or None if there is none for this header."""
+    plan = PLANS.get(subroutine_key)
+    if plan is None or plan.header != header:
+        return None
+    return plan
+
+
+def get_unpivot(subroutine_key: str) -> UnpivotPlan:
+    """Return the compiled UNPIVOT entry of a subroutine."""
+    if subroutine_key not in UNPIVOTS:
+        raise ValueError(f"No UNPIVOT entry compiled for {subroutine_key}")
+    return UNPIVOTS[subroutine_key]
+
+
+@timed("clean")
+def finish_planned_frame(df: pd.DataFrame, customer: str, server: str, sub_key: str, digits, watermark=None) -> pd.DataFrame:
+    """
+    The part of clean_data a planned read still needs: the watermark filter, sentinel
+    replacement and the customer/server/_measurement/digits columns. Names and dtypes
+    are already final.
+    """
+    df = drop_ingested_rows(df, watermark)
+    replace_invalid_values(df)
+    df['customer'] = customer
+    df['server'] = server
+    df['_measurement'] = sub_key
+    df['digits'] = float(digits)
+    return df
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+
+def round_values(values: np.ndarray, decimals: int) -> np.ndarray:
+    """
+    Round like Python's round(value, decimals), which the per-row importers used.
+
+    np.round scales by 10**decimals first and can pick the other neighbour when the
+    scaled value lands within float error of a .5 tie; only those cells are rounded one
+    by one.
+    """
+    rounded = np.round(values, decimals)
+    if not np.issubdtype(values.dtype, np.floating):
+        return rounded
+
+    scaled = np.abs(values * 10.0 ** decimals)
+    with np.errstate(invalid="ignore"):
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) <= scaled * 8 * np.finfo(values.dtype).eps + 1e-12
+    if near_tie.any():
+        rounded[near_tie] = [round(value, decimals) for value in values[near_tie].tolist()]
+    return rounded
+
+
+def unpivot_pairs(df: pd.DataFrame, group_size: int, name_suffix: str = "", decimals: int = None) -> pd.DataFrame:
+    """
+    Reshape a wide log with one group of ``group_size`` columns per entity into one row
+    per (input row, entity).
+
+    The first column is the row timestamp; it is repeated for every entity as "datetime".
+    The entity name is taken from the first column of its group with ``name_suffix``
+    removed, e.g. "TOTAL core", "TOTAL percentage" -> entity "TOTAL".
+
+    Parameters:
+        df (pd.DataFrame): The wide DataFrame, timestamp column first.
+        group_size (int): Number of value columns per entity.
+        name_suffix (str): Removed from the first column name of each group.
+        decimals (int): Round the values to this many decimals, if given.
+
+    Returns:
+        pd.DataFrame: Columns "datetime", "metric" and value_0 .. value_{group_size - 1}, rows
+        ordered by input row, then entity.
+    """
+    value_columns = df.columns[1:]
+    if len(value_columns) % group_size:
+        raise ValueError(f"{len(value_columns)} value columns do not split into groups of {group_size}")
+
+    entities = len(value_columns) // group_size
+    rows = len(df)
+    values = df.iloc[:, 1:].to_numpy().reshape(rows * entities, group_size)
+    if decimals is not None:
+        values = round_values(values, decimals)
+
+    names = [column.replace(name_suffix, "") for column in value_columns[::group_size]]
+    long = pd.DataFrame(values, columns=[f"value_{i}" for i in range(group_size)])
+    long.insert(0, "metric", np.tile(np.array(names, dtype=object), rows))
+    long.insert(0, "datetime", np.repeat(df.iloc[:, 0].to_numpy(), entities))
+    return long
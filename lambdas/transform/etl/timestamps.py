@@ -0,0 +1,135 @@
+"""
+Timestamp parsing for collector logs.
+
+Dates and times are parsed with the known format of the subroutine instead of letting
+pandas infer a format for every concatenated "date time" string: a date is parsed once
+per run of equal dates (and memoised across files), zero-padded times are decoded
+straight from their bytes. The result is a datetime64[ns] column; the line protocol writer
+turns it into epoch seconds in one vectorised pass.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Parse format for the datetime column (or "date time" for files with separate columns)
+DEFAULT_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# DATETIME_FORMAT by subroutine key, filled once at cold start by etl.plan.compile_plans()
+DATETIME_FORMATS = {}
+
+# Distinct date strings remembered across files
+DATE_CACHE_SIZE = 4096
+
+EPOCH = datetime(1970, 1, 1)
+NANOSECONDS = 10**9
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(value: str, date_format: str) -> int:
+    """Nanoseconds since the epoch of midnight on ``value``."""
+    delta = datetime.strptime(value, date_format) - EPOCH
+    return (delta.days * 86400 + delta.seconds) * NANOSECONDS + delta.microseconds * 1000
+
+
+def clock_seconds(times: np.ndarray):
+    """
+    Seconds since midnight of zero-padded "HH:MM:SS" strings, decoded straight from
+    their bytes, or None when any value has another shape.
+    """
+    try:
+        raw = times.astype("S9").view(np.uint8).reshape(-1, 9)
+    except (UnicodeEncodeError, ValueError):
+        return None
+    digits = raw[:, [0, 1, 3, 4, 6, 7]] - ord("0")
+    if not ((digits <= 9).all() and (raw[:, [2, 5]] == ord(":")).all() and (raw[:, 8] == 0).all()):
+        return None
+    digits = digits.astype(np.int64)
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 2] * 10 + digits[:, 3]
+    seconds = digits[:, 4] * 10 + digits[:, 5]
+    if (hours > 23).any() or (minutes > 59).any() or (seconds > 59).any():
+        return None
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def seconds_of_day(times: pd.Series, time_format: str) -> np.ndarray:
+    """
+    Seconds since midnight of each time string. Times the byte decoder cannot take,
+    e.g. without zero padding, go through strptime once per distinct value.
+    """
+    values = times.to_numpy(dtype=object)
+    if time_format == "%H:%M:%S":
+        seconds = clock_seconds(values)
+        if seconds is not None:
+            return seconds
+
+    codes, distinct = pd.factorize(values)
+    if (codes < 0).any():
+        raise ValueError("Missing time values")
+    parsed = [datetime.strptime(t, time_format) for t in distinct]
+    return np.array([t.hour * 3600 + t.minute * 60 + t.second for t in parsed], dtype=np.int64)[codes]
+
+
+def day_nanoseconds(dates: pd.Series, date_format: str) -> np.ndarray:
+    """
+    Nanoseconds since the epoch of midnight on each date. Logs hold long runs of the
+    same date, so only the first date of every run is looked up in the parse_date cache.
+    """
+    values = dates.to_numpy(dtype=object)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+    days = np.empty(len(starts), dtype=np.int64)
+    for i, start in enumerate(starts):
+        value = values[start]
+        if type(value) is not str:
+            raise ValueError(f"Invalid date value {value!r}")
+        days[i] = parse_date(value, date_format)
+    return np.repeat(days, np.diff(np.append(starts, len(values))))
+
+
+def combine_date_time(dates: pd.Series, times: pd.Series, datetime_format: str = DEFAULT_DATETIME_FORMAT) -> pd.Series:
+    """
+    Parse separate date and time columns with a known "<date format> <time format>".
+
+    Raises ValueError when a value is missing or does not match the format.
+    """
+    date_format, _, time_format = datetime_format.partition(" ")
+    stamps = day_nanoseconds(dates, date_format) + seconds_of_day(times, time_format) * NANOSECONDS
+    return pd.Series(stamps.view("datetime64[ns]"), index=dates.index)
+
+
+def parse_datetimes(values: pd.Series, datetime_format: str = DEFAULT_DATETIME_FORMAT) -> pd.Series:
+    """
+    Parse a datetime column with a known format, once per distinct value.
+
+    Raises ValueError when a value is missing or does not match the format.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+    codes, distinct = pd.factorize(values)
+    if (codes < 0).any():
+        raise ValueError("Missing datetime values")
+    parsed = pd.to_datetime(pd.Index(distinct), format=datetime_format).to_numpy()
+    return pd.Series(parsed[codes], index=values.index)
+
+
+def datetime_column(df: pd.DataFrame, sub_key: str) -> pd.Series:
+    """
+    The parsed datetime of a frame with either a 'datetime' column or 'date' and
+    'time' columns, using the DATETIME_FORMAT of ``sub_key``.
+
+    Files that do not follow that format fall back to pandas' format inference.
+    """
+    datetime_format = DATETIME_FORMATS.get(sub_key, DEFAULT_DATETIME_FORMAT)
+    if 'datetime' in df.columns:
+        try:
+            return parse_datetimes(df['datetime'], datetime_format)
+        except (ValueError, TypeError):
+            return pd.to_datetime(df['datetime'])
+    try:
+        return combine_date_time(df['date'], df['time'], datetime_format)
+    except (ValueError, TypeError):
+        return pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str))
@@ -1,26 +1,29 @@
 import os
+import shutil
+import tempfile
 import uuid
-from datetime import datetime
-import boto3
-import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from urllib.parse import unquote_plus
-from typing import List, Dict
+from typing import Dict
 import json
-import pandas as pd
-from database.influx_writer import Database
+from utils import manifest, metrics
 from utils.log_writer import Logger
-from etl.clean import clean_data
-from etl.extract import extract_and_create_structure 
-from utils.s3 import move_s3_object,get_processed_bucket_name, get_raw_bucket_name
+from utils.s3 import delete_s3_objects, get_processed_bucket_name, get_s3_client
+from configs import INGEST_MODE, RECORD_WORKERS, LEDGER_STORE, LEDGER_PATH, LEDGER_RETENTION_DAYS, WATERMARKS, MANIFEST
 
-# Initialize S3 client
-endpoint_url = "https://localhost.localstack.cloud:4566"  # LocalStack URL
-s3 = boto3.client("s3", endpoint_url=endpoint_url)
+# Heavy dependencies (pandas, pyarrow, influxdb_client) and the clients built from them
+# are created by the first invocation through the cached getters below, not at import.
+# A warm container reuses them; only the secret behind Database is refreshed (TTL).
 
-log = Logger(log_file="/tmp/lambda_logs.log")
+@lru_cache(maxsize=None)
+def get_log() -> Logger:
+    return Logger(log_file="/tmp/lambda_logs.log")
 
-# Execution setup
-db = Database()
+@lru_cache(maxsize=None)
+def get_db():
+    from database.influx_writer import Database
+    return Database()
 
 # Load subroutines from the config file
 def load_subroutines_config(filepath: str) -> Dict:
@@ -31,19 +34,134 @@ def load_subroutines_config(filepath: str) -> Dict:
         print(f"ERROR: Failed to load subroutines config: {e}")
         return {}
 
-subroutine_config = load_subroutines_config("./subroutines_config.json")
+@lru_cache(maxsize=None)
+def get_subroutine_config(filepath: str = "./subroutines_config.json") -> Dict:
+    """The subroutines config, with its ingestion plans compiled once per container."""
+    from etl.plan import compile_plans
 
-def handler(event, context):
-    for record in event["Records"]:
-        source_bucket = record["s3"]["bucket"]["name"]
-        key = unquote_plus(record["s3"]["object"]["key"])
+    subroutine_config = load_subroutines_config(filepath)
+    compile_plans(subroutine_config)
+    return subroutine_config
+
+def process_record(record, s3, log, db, subroutine_config, ledger=None, backfill: bool = False) -> Dict:
+    """
+    Ingest the archive of one S3 event record in its own /tmp workspace.
 
-        tmp_file_path = f"/tmp/{uuid.uuid4()}.tar"
-        s3.download_file(source_bucket, key, tmp_file_path)
+    With an IngestionLedger an archive whose ETag was already ingested is skipped, as are
+    members whose content was and rows at or before their measurement's watermark
+    (unless ``backfill``). Errors are caught and reported in the result, so one bad
+    archive does not stop the other records of the event.
+    """
+    from etl.extract import extract_and_create_structure, stream_and_create_structure
 
-        extracted_dir_path = f"/tmp/extracted/{uuid.uuid4()}"
+    source_bucket = record["s3"]["bucket"]["name"]
+    key = unquote_plus(record["s3"]["object"]["key"])
+    result = {"bucket": source_bucket, "key": key, "status": "succeeded"}
+
+    workspace = tempfile.mkdtemp(prefix="record-", dir="/tmp")
+    try:
         file_key_prefix = key.split('_')[0]
         file_key_server = key.split('_')[1]
 
-        extract_and_create_structure(tmp_file_path, extracted_dir_path, file_key_prefix, file_key_server,s3,log,db,subroutine_config)
-        s3.delete_object(Bucket=source_bucket, Key=key)
+        archive = None
+        ingested = False
+        failed_writes = db.failures(key)
+        with metrics.labels(customer=file_key_prefix, server=file_key_server, archive=key), metrics.stage("archive") as archive_stage:
+            try:
+                if INGEST_MODE == "stream":
+                    # The body itself is read member by member in the extract stage
+                    with metrics.stage("download") as download:
+                        response = s3.get_object(Bucket=source_bucket, Key=key)
+                        download.bytes = archive_stage.bytes = response.get("ContentLength")
+                    etag, body = response["ETag"], response["Body"]
+                else:
+                    etag, body = (s3.head_object(Bucket=source_bucket, Key=key)["ETag"] if ledger is not None else None), None
+
+                if ledger is not None:
+                    archive = ledger.open(file_key_prefix, file_key_server, etag, backfill=backfill)
+                if archive is not None and archive.ingested:
+                    log.info(f"Skipping s3://{source_bucket}/{key}, archive {etag} was already ingested")
+                    result["status"] = "skipped"
+                    archive = None
+                    if body is not None:
+                        body.close()
+                elif body is not None:
+                    # Feed the response body straight into tarfile, no download/extract round trip
+                    stream_and_create_structure(body, file_key_prefix, file_key_server,s3,log,db,subroutine_config, ledger=archive)
+                else:
+                    tmp_file_path = os.path.join(workspace, f"{uuid.uuid4()}.tar")
+                    with metrics.stage("download") as download:
+                        s3.download_file(source_bucket, key, tmp_file_path)
+                        download.bytes = archive_stage.bytes = os.path.getsize(tmp_file_path)
+
+                    extracted_dir_path = os.path.join(workspace, "extracted")
+                    extract_and_create_structure(tmp_file_path, extracted_dir_path, file_key_prefix, file_key_server,s3,log,db,subroutine_config, ledger=archive)
+                ingested = True
+            finally:
+                # Archive boundary: send whatever the members left in this archive's InfluxDB buffer
+                db.flush(key)
+                # Members only count as ingested once InfluxDB has accepted every write of this archive
+                if archive is not None and db.failures(key) == failed_writes:
+                    ledger.commit(archive, complete=ingested and archive.complete)
+    except Exception as e:
+        log.error(f"Failed to ingest s3://{source_bucket}/{key}: {e}")
+        result.update(status="failed", error=str(e))
+    finally:
+        # Stage totals of the archive, including the archive stage itself (METRICS_INFLUX)
+        with metrics.labels(archive=key):
+            if metrics.publish(db, key):
+                db.flush(key)
+        # The archive's artifacts, as one segment of the manifest read by the list Lambda
+        try:
+            manifest.publish(s3, get_processed_bucket_name(), key)
+        except Exception as e:
+            print(f"Error writing the manifest segment of {key}: {e}")
+        shutil.rmtree(workspace, ignore_errors=True)
+    return result
+
+@lru_cache(maxsize=None)
+def get_ledger():
+    from etl.ledger import create_ledger
+    return create_ledger(LEDGER_STORE, s3=get_s3_client(), bucket=get_processed_bucket_name(), path=LEDGER_PATH, retention_days=LEDGER_RETENTION_DAYS, watermarks=WATERMARKS)
+
+def handler(event, context):
+    s3 = get_s3_client()
+    log = get_log()
+    db = get_db()
+    subroutine_config = get_subroutine_config()
+    ledger = get_ledger()
+    try:
+        backfill = bool(event.get("backfill"))
+
+        records = event["Records"]
+        workers = max(1, min(RECORD_WORKERS, len(records)))
+        if workers == 1:
+            results = [process_record(record, s3, log, db, subroutine_config, ledger, backfill) for record in records]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="record") as pool:
+                results = list(pool.map(lambda record: process_record(record, s3, log, db, subroutine_config, ledger, backfill), records))
+
+        # Processed (or already ingested) archives by bucket, removed with batched DeleteObjects;
+        # failed ones stay in place
+        processed_archives = {}
+        for result in results:
+            if result["status"] != "failed":
+                processed_archives.setdefault(result["bucket"], []).append(result["key"])
+        for bucket, keys in processed_archives.items():
+            delete_s3_objects(s3, bucket, keys)
+
+        # Merge the manifest segments of closed hours; only uncompacted segments are listed
+        if MANIFEST:
+            try:
+                manifest.compact(s3, get_processed_bucket_name())
+            except Exception as e:
+                print(f"Error compacting the manifest: {e}")
+
+        failed = [result for result in results if result["status"] == "failed"]
+        if failed:
+            # Fail the invocation so the event still reaches the dead-letter topic
+            raise RuntimeError(f"{len(failed)} of {len(results)} archives failed: " + ", ".join(f"{r['key']} ({r['error']})" for r in failed))
+        return {"results": results}
+    finally:
+        # Queued log records are written before the container can be frozen
+        log.flush()
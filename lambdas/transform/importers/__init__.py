@@ -0,0 +1 @@
+from importers.router import FilenameRouter, ImporterRegistry, Route, parse_member_name, router_for
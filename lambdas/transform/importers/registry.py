@@ -0,0 +1,11 @@
+from etl.load import cpu_by_app, import_data, import_data_onstat_l, import_partitions, import_unpivot
+from importers.router import ImporterRegistry
+
+# The transform Lambda's importers, by the SUB name used in subroutines_config.json
+IMPORTERS = ImporterRegistry(
+    import_data=import_data,
+    import_partitions=import_partitions,
+    cpu_by_app=cpu_by_app,
+    import_unpivot=import_unpivot,
+    import_data_onstat_l=import_data_onstat_l,
+)
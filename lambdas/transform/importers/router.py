@@ -0,0 +1,135 @@
+"""
+Routing of archive member names to importers.
+
+Only the standard library is used here, so the module can be shipped with anything
+that ingests collector archives: the transform Lambda imports it as importers.router,
+transform_singlefile and the pre_lambda scripts as router.py, a symbolic link to this file.
+"""
+import re
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional
+
+# Member name layouts, tried in order on "extracted/<member>": a date, a time range, or
+# any third field between customer/server and the file part. Each comes with a linear
+# search for the text it cannot match without, which skips the expensive backtracking
+# of the non-greedy groups on names of another layout.
+NAME_PATTERNS = (
+    (re.compile(r"_\d{4}-\d{2}-\d{2}_"), re.compile(r"^(\S+?)_(\S+?)_(\d{4}-\d{2}-\d{2})_(.*)")),
+    (re.compile(r"-\d{2}:\d{2}-\d{2}:\d{2}_"), re.compile(r"^(\S+?)_(\S+?)_(.*-\d{2}:\d{2}-\d{2}:\d{2})_(.*)")),
+    (None, re.compile(r"^(\S+?)_(\S+?)_([^\_]+)_(.*)")),
+)
+
+# The customer is the last path component of the first field
+CUSTOMER_PATTERN = re.compile(r".*/([^/]+)$")
+
+# Removed from the file part, in this order, to get the subroutine key
+KEY_SUFFIXES = (
+    re.compile(r"_for_graph"),
+    re.compile(r"_\d+$"),
+    re.compile(r"_\d+.log$"),
+    re.compile(r".log$"),
+)
+
+# Page size in keys like buffer_16k: the digits are kept apart and the key becomes buffer_k
+PAGE_SIZE_PATTERN = re.compile(r"_(\d+)k")
+PAGE_SIZE_SUB = re.compile(r"_\d+k")
+
+# Distinct member names remembered by a router
+ROUTE_CACHE_SIZE = 4096
+
+
+class Route(NamedTuple):
+    customer: str
+    server: str
+    subroutine_key: str
+    digits: int
+    func_name: str
+    header: str
+    importer: Optional[Callable]
+
+
+class ImporterRegistry(dict):
+    """Importer functions by the SUB name used in subroutines_config.json."""
+
+    def register(self, name: str):
+        """Decorator adding a function to the registry under ``name``."""
+        def decorator(func):
+            self[name] = func
+            return func
+        return decorator
+
+
+def parse_member_name(file_name: str):
+    """
+    Split a member name into (customer, server, subroutine_key, digits), or return None
+    when it matches none of the NAME_PATTERNS.
+    """
+    name = f"extracted/{file_name}"
+    for required, pattern in NAME_PATTERNS:
+        match = pattern.match(name) if required is None or required.search(name) else None
+        if match:
+            break
+    else:
+        return None
+
+    customer, server, _, subroutine_key = match.groups()
+    customer = CUSTOMER_PATTERN.match(customer).group(1)
+    for suffix in KEY_SUFFIXES:
+        subroutine_key = suffix.sub("", subroutine_key)
+
+    match = PAGE_SIZE_PATTERN.search(subroutine_key)
+    if match:
+        return customer, server, PAGE_SIZE_SUB.sub("_k", subroutine_key), int(match.group(1))
+    return customer, server, subroutine_key, 0
+
+
+class FilenameRouter:
+    """
+    Maps member names to their Route, built once from subroutines_config.json.
+
+    Results, including the reason a name cannot be routed, are kept in an LRU cache of
+    ``cache_size`` names, so a name is parsed once per container.
+    """
+
+    def __init__(self, subroutine_config: dict, registry: ImporterRegistry, cache_size: int = ROUTE_CACHE_SIZE):
+        self.subroutine_config = subroutine_config
+        self.registry = registry
+        self._route = lru_cache(maxsize=cache_size)(self._build_route)
+
+    def _build_route(self, file_name: str):
+        """The Route for ``file_name``, or the error message explaining why there is none."""
+        parsed = parse_member_name(file_name)
+        if parsed is None:
+            return f"Errors for {file_name} no pattern found"
+        customer, server, subroutine_key, digits = parsed
+
+        if subroutine_key not in self.subroutine_config:
+            return f"No subroutine found for {subroutine_key}"
+        subroutine = self.subroutine_config[subroutine_key]
+        func_name = subroutine['SUB']
+        header = subroutine['VALUES']['IMPORT'][0][1]
+        return Route(customer, server, subroutine_key, digits, func_name, header, self.registry.get(func_name))
+
+    def resolve(self, file_name: str, log) -> Optional[Route]:
+        """Route a member, logging why when it cannot be routed."""
+        route = self._route(file_name)
+        if isinstance(route, str):
+            log.error(route)
+            return None
+        return route
+
+    def cache_info(self):
+        return self._route.cache_info()
+
+
+# Router of the config last asked for; rebuilt when a different config object is passed
+_router = None
+
+
+def router_for(subroutine_config: dict, registry: ImporterRegistry) -> FilenameRouter:
+    """Return the FilenameRouter for this config and registry, building it on first use."""
+    global _router
+    router = _router
+    if router is None or router.subroutine_config is not subroutine_config or router.registry is not registry:
+        router = _router = FilenameRouter(subroutine_config, registry)
+    return router
@@ -1,17 +1,118 @@
+import atexit
+import io
+import itertools
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+
+from configs import LOG_LEVEL, LOG_SAMPLE_EVERY, LOG_QUEUE
+
+# Name of the application logger; modules log through children of it (get_logger)
+LOGGER_NAME = "AppLogger"
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+def get_logger(name: str = None) -> logging.Logger:
+    """
+    The application logger, or a child of it for a module (``get_logger(__name__)``).
+    Children use the handlers of the Logger below; until one is created only warnings
+    and errors reach stderr. Process pool workers are set up with init_worker.
+    """
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def init_worker(level: int = logging.WARNING) -> None:
+    """
+    Process pool initializer: log to stderr at ``level`` from the worker itself. A forked
+    worker would otherwise keep the parent's QueueHandler, whose listener thread does
+    not exist in the child, and every record it logs would be lost.
+    """
+    logger = get_logger()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+class Lazy:
+    """
+    Defer an expensive rendering (a DataFrame summary, a long list) until a handler
+    formats the record: ``log.debug("%s", Lazy(frame_info, df))`` costs nothing when
+    DEBUG is off.
+    """
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+def frame_info(df) -> str:
+    """The text of ``df.info()``, which otherwise only prints to stdout."""
+    buffer = io.StringIO()
+    df.info(buf=buffer)
+    return buffer.getvalue()
+
+
+class Sampler:
+    """Let through the 1st, (every+1)th, (2*every+1)th... call per key; ``every`` <= 1 lets everything through."""
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        self.every = every
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, key) -> bool:
+        if self.every <= 1:
+            return True
+        with self._lock:
+            counter = self._counters.setdefault(key, itertools.count())
+            return next(counter) % self.every == 0
+
+
+_sampler = Sampler()
+
+
+def log_sampled(logger: logging.Logger, key, message: str, *args, level: int = logging.DEBUG) -> None:
+    """
+    Log per-row or per-file output for only one in LOG_SAMPLE_EVERY calls with the same
+    ``key``. The level is checked first, so a disabled level skips the sampler too.
+    """
+    if logger.isEnabledFor(level) and _sampler(key):
+        logger.log(level, message, *args)
+
 
 class Logger:
-    def __init__(self, log_file: str = '/tmp/default.log', default_level: str = "INFO"):
+    def __init__(self, log_file: str = '/tmp/default.log', default_level: str = LOG_LEVEL, use_queue: bool = LOG_QUEUE):
         """
         Initialise the Logger instance.
 
         Args:
             log_file (str): Path to the log file. If None, logs will only be sent to CloudWatch (console).
             default_level (str): The default logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL).
+            use_queue (bool): Hand records to a background thread that writes them to stdout
+                and the file, off the calling thread; flush() waits until they are written.
         """
-        self.logger = logging.getLogger("AppLogger")
-        self.logger.setLevel(logging.DEBUG)  # Capture all levels; handlers will filter appropriately.
+        level = getattr(logging, default_level.upper(), logging.INFO)
+        self.logger = get_logger()
+        # Gate on the logger itself, so a disabled level returns before any formatting
+        self.logger.setLevel(level)
+        self.logger.propagate = False
+        # A second Logger replaces the handlers instead of duplicating every line
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
 
         # Formatter for log messages
         formatter = logging.Formatter(
@@ -19,48 +120,76 @@ class Logger:
         )
 
         # Console handler (CloudWatch Logs by default)
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(getattr(logging, default_level.upper(), logging.INFO))
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
+        handlers = [logging.StreamHandler()]
 
         # Optional file handler for `/tmp` directory in Lambda
         if log_file:
             # Ensure the log file path is in `/tmp`, the only writable directory in Lambda
             if not log_file.startswith("/tmp/"):
                 log_file = f"/tmp/{os.path.basename(log_file)}"
-            file_handler = logging.FileHandler(log_file)
-            file_handler.setLevel(getattr(logging, default_level.upper(), logging.INFO))
-            file_handler.setFormatter(formatter)
-            self.logger.addHandler(file_handler)
+            handlers.append(logging.FileHandler(log_file))
+
+        for handler in handlers:
+            handler.setLevel(level)
+            handler.setFormatter(formatter)
+
+        self.listener = None
+        if use_queue:
+            self.listener = logging.handlers.QueueListener(queue.SimpleQueue(), *handlers, respect_handler_level=True)
+            self.logger.addHandler(logging.handlers.QueueHandler(self.listener.queue))
+            self.listener.start()
+            atexit.register(self.close)
+        else:
+            for handler in handlers:
+                self.logger.addHandler(handler)
+
+    def enabled(self, level: str) -> bool:
+        """Whether ``level`` is logged; check it before building an expensive message."""
+        return self.logger.isEnabledFor(getattr(logging, level.upper(), logging.INFO))
 
-    def log(self, level: str, message: str):
+    def log(self, level: str, message: str, *args):
         """
         Log a message at the specified level.
 
         Args:
             level (str): Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL).
-            message (str): The message to log.
+            message (str): The message to log, %-formatted with ``args`` only when the level is enabled.
         """
         level = level.upper()
-        if level not in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
-            self.logger.warning(f"Invalid log level: {level}. Defaulting to INFO.")
+        if level not in LEVELS:
+            self.logger.warning("Invalid log level: %s. Defaulting to INFO.", level)
             level = "INFO"
 
-        log_method = getattr(self.logger, level.lower())
-        log_method(message)
+        self.logger.log(getattr(logging, level), message, *args)
+
+    def info(self, message: str, *args):
+        self.log("INFO", message, *args)
+
+    def debug(self, message: str, *args):
+        self.log("DEBUG", message, *args)
+
+    def warning(self, message: str, *args):
+        self.log("WARNING", message, *args)
 
-    def info(self, message: str):
-        self.log("INFO", message)
+    def error(self, message: str, *args):
+        self.log("ERROR", message, *args)
 
-    def debug(self, message: str):
-        self.log("DEBUG", message)
+    def critical(self, message: str, *args):
+        self.log("CRITICAL", message, *args)
 
-    def warning(self, message: str):
-        self.log("WARNING", message)
+    def sample(self, key, message: str, *args, level: str = "DEBUG"):
+        """Log only one in LOG_SAMPLE_EVERY messages with the same ``key`` (per-row or per-file output)."""
+        log_sampled(self.logger, key, message, *args, level=getattr(logging, level.upper(), logging.DEBUG))
 
-    def error(self, message: str):
-        self.log("ERROR", message)
+    def flush(self):
+        """Wait until every queued record is written; call before the invocation returns (the container may be frozen)."""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+            self.listener.start()
+        for handler in self.listener.handlers if self.listener is not None else self.logger.handlers:
+            handler.flush()
 
-    def critical(self, message: str):
-        self.log("CRITICAL", message)
+    def close(self):
+        """Write what is queued and stop the background thread."""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
@@ -0,0 +1,107 @@
+"""
+Time-partitioned manifest of the objects the transform Lambda writes to the processed
+bucket, so the list Lambda can show recent artifacts without listing the bucket. The key
+layout and the readers are shared with the list Lambda (lambdas/shared/manifest_reader.py).
+
+Every object placed with place_s3_object is noted under the archive label of the
+calling thread (see utils.metrics). At the end of an archive its entries are written as
+one segment of the current hour:
+
+    manifest/segments/<YYYY-MM-DDTHH>/<epoch ms>-<uuid>.json   {"archive": ..., "entries": [...]}
+
+Segments of hours that have closed (plus MANIFEST_COMPACT_GRACE_SECONDS) are merged into
+one document per hour and deleted:
+
+    manifest/hours/<YYYY-MM-DDTHH>.json                       {"entries": [...]}
+
+A reader of a time window (manifest_reader.read_window) gets the hour documents and
+segments of the hours it covers.
+"""
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Key layout and readers shared with the list Lambda
+from manifest_reader import HOURS_PREFIX, SEGMENTS_PREFIX, error_code, hour_of, list_keys, merge_entries, read_document, read_tagged, stamp
+from utils.metrics import current_labels
+from configs import MANIFEST, MANIFEST_COMPACT_GRACE_SECONDS
+
+# Entries noted per archive label and not yet written
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def note(key: str, size=None) -> None:
+    """Remember an object placed in the processed bucket, for the archive being ingested by this thread."""
+    if not MANIFEST:
+        return
+    entry = {
+        "Key": key,
+        "Size": size,
+        "Timestamp": stamp(datetime.now(timezone.utc)),
+        "Archive": current_labels().get("archive"),
+    }
+    with _pending_lock:
+        _pending.setdefault(entry["Archive"], []).append(entry)
+
+
+def publish(s3, bucket: str, archive: str):
+    """
+    Write the entries noted for ``archive`` (and any noted outside an archive) as a
+    segment of the current hour. Returns the segment key, or None when there was nothing
+    to write.
+    """
+    with _pending_lock:
+        entries = [entry for name in (archive, None) for entry in _pending.pop(name, [])]
+    if not entries:
+        return None
+    now = datetime.now(timezone.utc)
+    segment = f"{SEGMENTS_PREFIX}{hour_of(now)}/{int(now.timestamp() * 1000)}-{uuid.uuid4().hex}.json"
+    s3.put_object(Bucket=bucket, Key=segment, Body=json.dumps({"archive": archive, "entries": entries}).encode("utf-8"))
+    return segment
+
+
+def compact(s3, bucket: str, now: datetime = None, grace_seconds: float = MANIFEST_COMPACT_GRACE_SECONDS) -> list:
+    """
+    Merge the segments of every hour that closed at least ``grace_seconds`` ago into its
+    hour document and delete them. Only uncompacted segments are listed, so the cost
+    does not grow with the bucket. Returns the hours compacted.
+
+    Compactions may run concurrently: the hour document is only replaced if it is still
+    the one that was read, and an hour is left for the next run when another compaction
+    got there first or removed a listed segment (its entries are then in a newer hour
+    document than ours). Segments left in place stay readable, so nothing is lost.
+    """
+    from utils.s3 import delete_s3_objects
+
+    now = now or datetime.now(timezone.utc)
+    # Hours up to this one ended at least grace_seconds ago
+    closed = hour_of(now - timedelta(hours=1, seconds=grace_seconds))
+    by_hour = {}
+    for key in list_keys(s3, bucket, SEGMENTS_PREFIX):
+        hour = key[len(SEGMENTS_PREFIX):].split("/", 1)[0]
+        if hour <= closed:
+            by_hour.setdefault(hour, []).append(key)
+
+    compacted = []
+    for hour, segments in sorted(by_hour.items()):
+        hour_key = f"{HOURS_PREFIX}{hour}.json"
+        existing, etag = read_tagged(s3, bucket, hour_key)
+        documents = [read_document(s3, bucket, key) for key in segments]
+        if any(document is None for document in documents):
+            print(f"Manifest segments of {hour} were compacted concurrently, leaving the hour for the next run")
+            continue
+        entries = merge_entries((existing or {"entries": []})["entries"], *(document["entries"] for document in documents))
+        # Conditional on the hour document read above (or on there being none)
+        condition = {"IfMatch": etag} if existing is not None else {"IfNoneMatch": "*"}
+        try:
+            s3.put_object(Bucket=bucket, Key=hour_key, Body=json.dumps({"entries": entries}).encode("utf-8"), **condition)
+        except Exception as e:
+            if error_code(e) not in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise
+            print(f"Manifest hour {hour} was written concurrently ({error_code(e)}), leaving it for the next run")
+            continue
+        delete_s3_objects(s3, bucket, segments)
+        compacted.append(hour)
+    return compacted
@@ -0,0 +1,219 @@
+"""
+Per-stage instrumentation of the transform pipeline.
+
+Every stage (download, extract, parse, clean, serialise, s3_put, influx_write,
+influx_send) and every member and archive records its wall time, rows and bytes; stages
+timed with ``stage`` also record how much the RSS of the process changed over them. Each record is printed as a CloudWatch Embedded Metric Format
+(EMF) line, so CloudWatch turns the log line into metrics by stage. With METRICS_INFLUX
+the records of an archive are also summed per stage and written to InfluxDB as the
+METRICS_MEASUREMENT self-monitoring measurement.
+
+Labels (customer, server, archive, member) are kept per thread; work handed to another
+thread or process takes them along through ``current_labels`` and ``call_with_labels``.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from configs import METRICS, METRICS_NAMESPACE, METRICS_INFLUX, METRICS_MEASUREMENT
+
+# Labels written as EMF dimensions; the others (archive, member) are plain properties
+DIMENSIONS = ("Stage",)
+
+UNITS = {
+    "Duration": "Milliseconds",
+    "Rows": "Count",
+    "Bytes": "Bytes",
+    "RowsPerSecond": "Count/Second",
+    "RSSDelta": "Megabytes",
+}
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_local = threading.local()
+
+# Per archive and stage totals waiting to be written to InfluxDB
+_totals = {}
+_totals_lock = threading.Lock()
+
+
+def current_labels() -> dict:
+    """The labels of the calling thread."""
+    return dict(getattr(_local, "labels", {}))
+
+
+@contextmanager
+def labels(**values):
+    """Add labels to every stage recorded by this thread inside the block."""
+    previous = getattr(_local, "labels", {})
+    _local.labels = {**previous, **values}
+    try:
+        yield
+    finally:
+        _local.labels = previous
+
+
+def call_with_labels(values: dict, func, *args, **kwargs):
+    """Call ``func`` with the labels of another thread; module level so process pools can pickle it."""
+    with labels(**values):
+        return func(*args, **kwargs)
+
+
+def rss_mib():
+    """
+    Current resident set size of this process in MiB, from /proc/self/statm; None where
+    there is no /proc. Unlike ru_maxrss it goes down again when memory is released, so the
+    difference over a stage is what the stage kept (other threads of the process included).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def source_size(source):
+    """Size in bytes of a path, bytes or BytesIO source, or None when it cannot be told cheaply."""
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if isinstance(source, str):
+        try:
+            return os.path.getsize(source)
+        except OSError:
+            return None
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer().nbytes
+    return None
+
+
+class Stage:
+    """The record of a stage being timed; set ``rows`` and ``bytes`` inside the block."""
+
+    __slots__ = ("name", "rows", "bytes")
+
+    def __init__(self, name: str, rows=None, bytes=None):
+        self.name = name
+        self.rows = rows
+        self.bytes = bytes
+
+
+def emf_document(name: str, seconds: float, rows=None, bytes=None, values: dict = None, namespace: str = METRICS_NAMESPACE, rss_delta=None) -> dict:
+    """Build the EMF document of one stage record."""
+    metrics = {"Duration": round(seconds * 1000, 3)}
+    if rss_delta is not None:
+        metrics["RSSDelta"] = round(rss_delta, 1)
+    if rows is not None:
+        metrics["Rows"] = rows
+        if seconds > 0:
+            metrics["RowsPerSecond"] = round(rows / seconds, 1)
+    if bytes is not None:
+        metrics["Bytes"] = bytes
+
+    document = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [list(DIMENSIONS)],
+                "Metrics": [{"Name": metric, "Unit": UNITS[metric]} for metric in metrics],
+            }],
+        },
+        "Stage": name,
+    }
+    document.update({key: value for key, value in (values or {}).items() if value is not None})
+    document.update(metrics)
+    return document
+
+
+def record(name: str, seconds: float, rows=None, bytes=None, rss_delta=None):
+    """
+    Report a finished stage: an EMF log line, and the InfluxDB totals with METRICS_INFLUX.
+    ``rss_delta`` is the change of the RSS over the stage in MiB, when it was measured.
+    """
+    if METRICS != "emf" and not METRICS_INFLUX:
+        return
+    values = current_labels()
+    if METRICS == "emf":
+        print(json.dumps(emf_document(name, seconds, rows, bytes, values, rss_delta=rss_delta), separators=(",", ":")))
+    if METRICS_INFLUX:
+        key = (values.get("archive"), values.get("customer"), values.get("server"), name)
+        with _totals_lock:
+            totals = _totals.setdefault(key, {"calls": 0, "seconds": 0.0, "rows": 0, "bytes": 0, "rss_delta": 0.0})
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["rows"] += rows or 0
+            totals["bytes"] += bytes or 0
+            totals["rss_delta"] = max(totals["rss_delta"], rss_delta or 0.0)
+
+
+@contextmanager
+def stage(name: str, rows=None, bytes=None):
+    """Time the block as stage ``name``; the yielded Stage takes the rows and bytes it handled."""
+    timed = Stage(name, rows, bytes)
+    rss = rss_mib()
+    started = time.perf_counter()
+    try:
+        yield timed
+    finally:
+        seconds = time.perf_counter() - started
+        rss_delta = rss_mib() - rss if rss is not None else None
+        record(name, seconds, timed.rows, timed.bytes, rss_delta=rss_delta)
+
+
+def timed(name: str):
+    """Decorator timing every call as stage ``name``, with the length of the result as rows."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name) as timed_stage:
+                result = func(*args, **kwargs)
+                timed_stage.rows = len(result) if hasattr(result, "__len__") else None
+            return result
+        return wrapper
+    return decorator
+
+
+def influx_lines(archive: str, measurement: str = METRICS_MEASUREMENT) -> list:
+    """
+    Remove the per-stage totals of ``archive`` and return them as line protocol, one
+    point per stage tagged with stage, customer and server. Stages recorded outside any
+    archive (e.g. the flush of these totals) are reported with the next archive.
+    """
+    from database.line_protocol import format_field_value, format_measurement, format_tag_value
+
+    with _totals_lock:
+        keys = [key for key in _totals if key[0] in (archive, None)]
+        totals = [(key, _totals.pop(key)) for key in keys]
+
+    now = int(time.time())
+    lines = []
+    for (archive, customer, server, name), total in totals:
+        tags = "".join(f",{key}={format_tag_value(value)}" for key, value in (("customer", customer), ("server", server), ("stage", name)) if value)
+        fields = {
+            "archive": archive or "",
+            "calls": total["calls"],
+            "duration_ms": round(total["seconds"] * 1000, 3),
+            "rows": total["rows"],
+            "bytes": total["bytes"],
+            "rows_per_second": round(total["rows"] / total["seconds"], 1) if total["seconds"] > 0 else 0.0,
+            "max_rss_delta_mib": round(total["rss_delta"], 1),
+        }
+        rendered = ",".join(f"{key}={format_field_value(value)}" for key, value in fields.items())
+        lines.append(f"{format_measurement(measurement)}{tags} {rendered} {now}")
+    return lines
+
+
+def publish(db, archive: str) -> bool:
+    """
+    Queue the InfluxDB totals of ``archive`` on ``db`` (METRICS_INFLUX), to be sent with
+    the next flush. Returns True when lines were queued.
+    """
+    if not METRICS_INFLUX:
+        return False
+    lines = influx_lines(archive)
+    if lines:
+        db.queue_lines(lines)
+    return bool(lines)
@@ -1,9 +1,27 @@
-import boto3
 import json
+import threading
+import time
+from functools import lru_cache
+
+from configs import SECRET_TTL_SECONDS
+from utils import manifest
+from utils.metrics import source_size, stage
 
-# Initialize S3 client
 endpoint_url = "https://localhost.localstack.cloud:4566"  # LocalStack URL
-s3 = boto3.client("s3", endpoint_url=endpoint_url)
+
+@lru_cache(maxsize=None)
+def get_client(service_name: str):
+    """
+    Return the boto3 client for a service, created on first use.
+
+    boto3 is imported here rather than at module level, and each client is built once
+    and reused for the lifetime of the (warm) Lambda container.
+    """
+    import boto3
+    return boto3.client(service_name, endpoint_url=endpoint_url)
+
+def get_s3_client():
+    return get_client("s3")
 
 def get_processed_bucket_name() -> str:
     return "localstack-s3etl-app-processed"
@@ -11,6 +29,62 @@ def get_processed_bucket_name() -> str:
 def get_raw_bucket_name() -> str:
     return "localstack-s3etl-app-raw"
 
+def place_s3_object(client, object_key: str, body: bytes = None, file_path: str = None, bucket: str = None):
+    """
+    Write a final artifact straight to its destination with a single PUT.
+
+    Args:
+        client: The boto3 S3 client to use.
+        object_key (str): The key (path) of the object in the destination bucket.
+        body (bytes, optional): The object content.
+        file_path (str, optional): A local file to upload instead of ``body``.
+        bucket (str, optional): The destination bucket, the processed bucket by default.
+    """
+    processed = bucket is None
+    if processed:
+        bucket = get_processed_bucket_name()
+
+    size = source_size(file_path if file_path is not None else body)
+    with stage("s3_put", bytes=size):
+        if file_path is not None:
+            client.upload_file(file_path, bucket, object_key)
+        else:
+            client.put_object(Bucket=bucket, Key=object_key, Body=body)
+    if processed:
+        # Listed by the list Lambda from the manifest instead of a bucket scan
+        manifest.note(object_key, size)
+    print(f"Placed {object_key} in s3://{bucket}/{object_key}")
+
+# DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+
+def delete_s3_objects(client, bucket: str, object_keys) -> list:
+    """
+    Delete objects with batched DeleteObjects requests instead of one request per key.
+
+    Args:
+        client: The boto3 S3 client to use.
+        bucket (str): The bucket holding the objects.
+        object_keys (list): The keys to delete.
+
+    Returns:
+        list: The per-key errors reported by S3 (empty when everything was deleted).
+    """
+    object_keys = list(object_keys)
+    errors = []
+    for start in range(0, len(object_keys), DELETE_BATCH_SIZE):
+        batch = object_keys[start:start + DELETE_BATCH_SIZE]
+        response = client.delete_objects(
+            Bucket=bucket,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+        )
+        errors.extend(response.get('Errors', []))
+        print(f"Deleted {len(batch) - len(response.get('Errors', []))} objects from s3://{bucket}")
+
+    for error in errors:
+        print(f"Error deleting {error.get('Key')} from {bucket}: {error.get('Code')} {error.get('Message')}")
+    return errors
+
 def move_s3_object(source_bucket: str, destination_bucket: str, object_key: str, destination_key: str = None):
     """
     Moves an object from one S3 bucket to another by copying it to the destination and deleting it from the source.
@@ -26,6 +100,7 @@ def move_s3_object(source_bucket: str, destination_bucket: str, object_key: str,
         destination_key = object_key
 
     try:
+        s3 = get_s3_client()
         # Copy the object to the destination bucket
         s3.copy_object(
             CopySource={'Bucket': source_bucket, 'Key': object_key},
@@ -43,9 +118,30 @@ def move_s3_object(source_bucket: str, destination_bucket: str, object_key: str,
     except Exception as e:
         print(f"Error moving {object_key} from {source_bucket} to {destination_bucket}: {e}")
 
-def get_secret(secret_name):
+# Secrets by name: (expiry on the monotonic clock, parsed secret)
+_secret_cache = {}
+_secret_lock = threading.Lock()
+
+def get_secret(secret_name, ttl: float = SECRET_TTL_SECONDS):
+    """
+    Return the parsed secret, fetched from Secrets Manager at most once per ``ttl`` seconds.
+
+    Failed lookups (None) are not cached, so the next call tries again.
+    """
+    with _secret_lock:
+        cached = _secret_cache.get(secret_name)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+    secrets = fetch_secret(secret_name)
+    if secrets is not None:
+        with _secret_lock:
+            _secret_cache[secret_name] = (time.monotonic() + ttl, secrets)
+    return secrets
+
+def fetch_secret(secret_name):
     """Retrieve and parse the secret from Secrets Manager."""
-    client = boto3.client("secretsmanager", endpoint_url=endpoint_url)
+    client = get_client("secretsmanager")
     
     try:
         # Retrieve the secret value
@@ -10,6 +10,9 @@ import pandas as pd
 from influxdb_client import InfluxDBClient, WriteOptions, Point, WritePrecision
 from influxdb_client.client.exceptions import InfluxDBError
 from influxdb_client.client.write_api import SYNCHRONOUS
+# Shared with the transform Lambda: router.py links to lambdas/transform/importers/router.py
+# (standard library only) and is zipped next to this handler
+from router import FilenameRouter, ImporterRegistry
 
 # Initialize S3 client
 endpoint_url = "https://localhost.localstack.cloud:4566"  # LocalStack URL
@@ -408,56 +411,29 @@ def import_data_onstat_l(header, filename, customer, server, subroutine_key, fil
     except Exception as e:
         print(f"ERROR: Failed to process {filename}: {e}")
 
+# Importers by the SUB name used in subroutines_config.json
+IMPORTERS = ImporterRegistry(
+    import_data=import_data,
+    import_partitions=import_partitions,
+    cpu_by_app=cpu_by_app,
+    import_data_onstat_l=import_data_onstat_l,
+)
+
+router = FilenameRouter(subroutine_config, IMPORTERS)
+
 def produce_import_files(subroutine_config, bucket_name, extracted_file_path, file_name, log):
     """
     Process a file from S3 after it has been uploaded.
     """
     s3_key = f"extracted/{file_name}"
     try:
-        match = re.match(r"^(\S+?)_(\S+?)_(\d{4}-\d{2}-\d{2})_(.*)", s3_key) or \
-                re.match(r"^(\S+?)_(\S+?)_(.*-\d{2}:\d{2}-\d{2}:\d{2})_(.*)", s3_key) or \
-                re.match(r"^(\S+?)_(\S+?)_([^\_]+)_(.*)", extracted_file_path)
-
-        if match:
-            customer, server, date, filename = match.groups()
-            customer = re.match(r".*/([^/]+)$", customer).group(1)
-            subroutine_key = filename
-            
-            print(f"CUSTOMER{customer}")
-
-            # Modify the subroutine key as needed
-            subroutine_key = re.sub(r"_for_graph", "", subroutine_key)
-            subroutine_key = re.sub(r"_\d+$", "", subroutine_key)
-            subroutine_key = re.sub(r"_\d+.log$", "", subroutine_key)
-            subroutine_key = re.sub(r".log$", "", subroutine_key)
-
-            match = re.search(r"_(\d+)k", subroutine_key)
-
-            if match:
-                # Save the digits into a separate variable
-                digits = int(match.group(1))
-    
-                # Modify the subroutine_key to remove the digits but keep '_k'
-                subroutine_key = re.sub(r"_\d+k", "_k", subroutine_key)
+        route = router.resolve(file_name, log)
+        if route:
+            customer, server, subroutine_key, digits, func_name, header, importer = route
+            if importer:
+                importer(header, extracted_file_path, customer, server, subroutine_key, file_name, digits)
             else:
-                # Set digits to None if no match is found
-                digits = 0
-
-            # Check if subroutine exists and call it
-            if subroutine_key in subroutine_config:
-                header = subroutine_config[subroutine_key]['VALUES']['IMPORT'][0][1]
-                func_name = subroutine_config[subroutine_key]['SUB']
-
-                # Dynamically call the function using globals()
-                func = globals().get(func_name)
-                if func:
-                    func(header, extracted_file_path, customer, server, subroutine_key, file_name, digits)
-                else:
-                    log.error(f"Function {func_name} not found.")
-            else:
-                log.error(f"No subroutine found for {subroutine_key}")
-        else:
-            log.error(f"Errors for {file_name} no pattern found")
+                log.error(f"Function {func_name} not found.")
 
     except Exception as e:
         log.error(f"Failed to process S3 file {s3_key}: {e}")
@@ -0,0 +1 @@
+../transform/importers/router.py
\ No newline at end of file
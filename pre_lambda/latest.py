@@ -11,6 +11,7 @@ import sys
 from influxdb_client import InfluxDBClient, WriteOptions, Point, WritePrecision
 from influxdb_client.client.exceptions import InfluxDBError
 from influxdb_client.client.write_api import SYNCHRONOUS
+from router import ImporterRegistry, router_for
 class Database:
     def __init__(self):
         self.token = "my-super-secret-auth-token"
@@ -279,6 +280,11 @@ subroutines = {
     },
 }
 
+# Member names are routed by the module shared with the Lambdas (router.py links to
+# lambdas/transform/importers/router.py). SUB holds the importer function itself here,
+# so every function is registered under itself.
+IMPORTERS = ImporterRegistry((subroutine['SUB'], subroutine['SUB']) for subroutine in subroutines.values())
+
 # Function to handle file movement on error
 def move_file(indir, outdir, error_folder, file, log):
     source = os.path.join(indir, file)
@@ -302,35 +308,13 @@ def produce_import_files(subroutines, indir, config, log, db):
         if not os.path.isfile(file_path):
             continue  # Skip if it's not a file
 
-        # Try to match the file with patterns and extract data
-        match = re.match(r"^(\S+?)_(\S+?)_(\d{4}-\d{2}-\d{2})_(.*)", file) or \
-                re.match(r"^(\S+?)_(\S+?)_(.*-\d{2}:\d{2}-\d{2}:\d{2})_(.*)", file) or \
-                re.match(r"^(\S+?)_(\S+?)_([^\_]+)_(.*)", file)
-
-        if match:
-            customer, server, date, filename = match.groups()
-            subroutine_key = filename
-
-            # Clean up the filename to match subroutine keys
-            subroutine_key = re.sub(r"_for_graph", "", subroutine_key)
-            subroutine_key = re.sub(r"_\d+k", "_k", subroutine_key)
-            subroutine_key = re.sub(r"_\d+$", "", subroutine_key)
-            subroutine_key = re.sub(r"_\d+.log$", "", subroutine_key)
-            subroutine_key = re.sub(r".log$", "", subroutine_key)
-            print("SUB ", subroutine_key)
-
-            # Check if subroutine exists and call it
-            if subroutine_key in subroutines:
-                func = subroutines[subroutine_key]['SUB']
-                header = subroutines[subroutine_key]['VALUES']['IMPORT'][0][1]
-                
-                # Execute the function with filename, header, and database
-                func(header, file_path, db, customer,server,subroutine_key)
-            else:
-                log.error(f"No subroutine found for {file}")
-                move_file(config.INDIR, config.OUTDIR, 'err', file, log)
+        # Route the file like the Lambdas do (router.py)
+        route = router_for(subroutines, IMPORTERS).resolve(file, log)
+        if route:
+            print("SUB ", route.subroutine_key)
+            # Execute the function with filename, header, and database
+            route.importer(route.header, file_path, db, route.customer, route.server, route.subroutine_key)
         else:
-            log.error(f"Errors for {file} no pattern found")
             move_file(config.INDIR, config.OUTDIR, 'err', file, log)
         move_file(config.INDIR, config.OUTDIR, 'err', file, log)
 
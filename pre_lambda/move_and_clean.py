@@ -8,6 +8,8 @@ from datetime import datetime
 from typing import List, Dict, Callable
 import sys
 import json  # For loading JSON files
+# Shared with the Lambdas (router.py links to lambdas/transform/importers/router.py, standard library only)
+from router import ImporterRegistry, router_for
 
 # Load subroutines from the config file
 def load_subroutines_config(filepath: str) -> Dict:
@@ -86,6 +88,18 @@ def import_data(header, filename, customer, server, subroutine_key, file):
     except Exception as e:
         print(f"ERROR: Failed to process {filename}: {e}")
 
+# Importers by the SUB name used in subroutines_config.json
+IMPORTERS = ImporterRegistry(import_data=import_data)
+
+# Function to handle file movement on error
+def move_file(indir, outdir, error_folder, file, log):
+    source = os.path.join(indir, file)
+    destination_dir = os.path.join(outdir)
+    os.makedirs(destination_dir, exist_ok=True)
+    destination = os.path.join(destination_dir, file)
+    shutil.move(source, destination)
+    log.debug(f"Moved {file} to {destination_dir}")
+
 # Modified to use subroutine_config loaded from file
 def produce_import_files(subroutine_config, indir, config, log):
     try:
@@ -99,41 +113,14 @@ def produce_import_files(subroutine_config, indir, config, log):
         if not os.path.isfile(file_path):
             continue  # Skip if it's not a file
 
-        match = re.match(r"^(\S+?)_(\S+?)_(\d{4}-\d{2}-\d{2})_(.*)", file) or \
-                re.match(r"^(\S+?)_(\S+?)_(.*-\d{2}:\d{2}-\d{2}:\d{2})_(.*)", file) or \
-                re.match(r"^(\S+?)_(\S+?)_([^\_]+)_(.*)", file)
-
-        if match:
-            customer, server, date, filename = match.groups()
-            subroutine_key = filename
-
-            subroutine_key = re.sub(r"_for_graph", "", subroutine_key)
-            subroutine_key = re.sub(r"_\d+k", "_k", subroutine_key)
-            subroutine_key = re.sub(r"_\d+$", "", subroutine_key)
-            subroutine_key = re.sub(r"_\d+.log$", "", subroutine_key)
-            subroutine_key = re.sub(r".log$", "", subroutine_key)
-            print(subroutine_config)
-
-            # Check if subroutine exists and call it
-            if subroutine_key in subroutine_config:
-                header = subroutine_config[subroutine_key]['VALUES']['IMPORT'][0][1]
-                # Assuming subroutine_config contains the function names as strings
-                func_name = subroutine_config[subroutine_key]['SUB']
-
-                # Dynamically call the function using getattr
-                func = globals().get(func_name)  # Use globals() if the function is globally defined
-                print(func)
-                if func:
-                    func(header, file_path, customer, server, subroutine_key, file)
-                else:
-                    log.error(f"Function {func_name} not found.")
-
-            else:
-                log.error(f"No subroutine found for {file}")
-                move_file(config.INDIR, config.OUTDIR, 'err', file, log)
-        else:
-            log.error(f"Errors for {file} no pattern found")
+        # Route the file like the Lambdas do (router.py)
+        route = router_for(subroutine_config, IMPORTERS).resolve(file, log)
+        if route is None:
             move_file(config.INDIR, config.OUTDIR, 'err', file, log)
+        elif route.importer:
+            route.importer(route.header, file_path, route.customer, route.server, route.subroutine_key, file)
+        else:
+            log.error(f"Function {route.func_name} not found.")
 
 # Execution setup
 log = Logger()
@@ -0,0 +1 @@
+../lambdas/transform/importers/router.py
\ No newline at end of file
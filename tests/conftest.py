@@ -0,0 +1,217 @@
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import tarfile
+from datetime import datetime, timezone
+
+import pytest
+
+TESTS = os.path.dirname(__file__)
+LAMBDAS = os.path.join(TESTS, "..", "lambdas")
+
+# The transform Lambda is packaged flat (handler.py next to etl/, utils/, ...), so its
+# modules import each other as top-level packages.
+sys.path.insert(0, os.path.join(LAMBDAS, "transform"))
+
+# Modules shared by the Lambdas, zipped next to each of their handlers
+sys.path.insert(0, os.path.join(LAMBDAS, "shared"))
+
+SUBROUTINES_CONFIG = os.path.join(TESTS, "subroutines_config.json")
+SAMPLE_ARCHIVE = os.path.join(TESTS, "test_files", "test_customer.plc_1728569682-110000-133000.tar")
+
+
+def load_subroutine_config() -> dict:
+    with open(SUBROUTINES_CONFIG) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def subroutine_config():
+    return load_subroutine_config()
+
+
+def sample_members():
+    """(file name, content) of every file of the sample archive, without the ._ metadata files."""
+    with tarfile.open(SAMPLE_ARCHIVE) as tar:
+        for member in tar.getmembers():
+            file_name = os.path.basename(member.name)
+            if member.isfile() and not file_name.startswith("._"):
+                yield file_name, tar.extractfile(member).read()
+
+
+def build_archive(members: dict) -> bytes:
+    """An uncompressed tar archive of ``members`` ({name: content})."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def load_lambda(name: str, monkeypatch):
+    """A fresh copy of lambdas/<name>/handler.py (the list and presign Lambdas are single files)."""
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    spec = importlib.util.spec_from_file_location(f"{name}_handler", os.path.join(LAMBDAS, name, "handler.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class NoSuchKey(Exception):
+    """A missing key, with the error code boto3 reports for it."""
+
+    response = {"Error": {"Code": "NoSuchKey"}, "ResponseMetadata": {"HTTPStatusCode": 404}}
+
+
+class RecordingS3:
+    """
+    In-memory stand-in for the boto3 S3 client. Objects are kept per bucket as
+    {"Body", "Size", "LastModified"}; ``calls`` records every call as (operation, Bucket,
+    Key), or the number of keys for delete_objects, and ``listed`` every listing as
+    (Bucket, Prefix). Deleted keys are recorded in ``deleted`` but kept, so an archive can
+    be ingested again; delete_objects reports the keys in ``failing`` as errors.
+    """
+
+    class exceptions:
+        NoSuchKey = NoSuchKey
+
+    def __init__(self, buckets: dict = None, failing=()):
+        self.buckets = {}
+        for bucket, objects in (buckets or {}).items():
+            self.buckets[bucket] = {}
+            for key, obj in objects.items():
+                self.add(bucket, key, **obj)
+        self.failing = set(failing)
+        self.calls = []
+        self.listed = []
+        self.deleted = []
+
+    def add(self, bucket: str, key: str, Body: bytes = b"", Size: int = None, LastModified: datetime = None):
+        self.buckets.setdefault(bucket, {})[key] = {
+            "Body": Body,
+            "Size": len(Body) if Size is None else Size,
+            "LastModified": LastModified or datetime.now(timezone.utc),
+        }
+
+    def objects(self, bucket: str = None) -> dict:
+        """Content by key, of ``bucket`` or of every bucket."""
+        return {key: obj["Body"] for name, objects in self.buckets.items() if bucket in (None, name) for key, obj in objects.items()}
+
+    def head_bucket(self, Bucket):
+        self.calls.append(("head_bucket", Bucket, None))
+
+    def create_bucket(self, Bucket):
+        self.calls.append(("create_bucket", Bucket, None))
+
+    def head_object(self, Bucket, Key):
+        from botocore.exceptions import ClientError
+
+        self.calls.append(("head_object", Bucket, Key))
+        if Key not in self.buckets.get(Bucket, {}):
+            raise ClientError({"Error": {"Code": "404"}, "ResponseMetadata": {"HTTPStatusCode": 404}}, "HeadObject")
+        return {"ETag": self.etag(Bucket, Key)}
+
+    def etag(self, bucket: str, key: str) -> str:
+        return f'"{hashlib.md5(self.buckets[bucket][key]["Body"]).hexdigest()}"'
+
+    def get_object(self, Bucket, Key):
+        self.calls.append(("get_object", Bucket, Key))
+        if Key not in self.buckets.get(Bucket, {}):
+            raise NoSuchKey(Key)
+        return {"Body": io.BytesIO(self.buckets[Bucket][Key]["Body"]), "ETag": self.etag(Bucket, Key)}
+
+    def put_object(self, Bucket, Key, Body, **conditions):
+        self.calls.append(("put_object", Bucket, Key))
+        self.add(Bucket, Key, Body.read() if hasattr(Body, "read") else Body)
+
+    def upload_file(self, Filename, Bucket, Key):
+        self.calls.append(("upload_file", Bucket, Key))
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        self.listed.append((Bucket, Prefix))
+        objects = self.buckets.get(Bucket, {})
+        return {"Contents": [{"Key": key, "Size": objects[key]["Size"], "LastModified": objects[key]["LastModified"]}
+                             for key in sorted(objects) if key.startswith(Prefix)]}
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [entry["Key"] for entry in Delete["Objects"]]
+        self.calls.append(("delete_objects", Bucket, len(keys)))
+        self.deleted.extend((Bucket, key) for key in keys if key not in self.failing)
+        return {"Errors": [{"Key": key, "Code": "AccessDenied", "Message": "denied"} for key in keys if key in self.failing]}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"https://signed/{Params['Bucket']}/{Params['Key']}"
+
+    def generate_presigned_post(self, Bucket, Key):
+        return {"url": f"https://upload/{Bucket}", "fields": {"key": Key}}
+
+
+class RecordingSSM:
+    """Parameters named after their last path segment (.../buckets/raw is "raw"); counts the lookups."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_parameter(self, Name):
+        self.calls += 1
+        return {"Parameter": {"Value": Name.rsplit("/", 1)[1]}}
+
+
+class RecordingLog:
+    """Stand-in for utils.log_writer.Logger: ``messages`` holds everything logged, ``errors`` the errors."""
+
+    def __init__(self):
+        self.messages = []
+        self.errors = []
+        self.flushed = False
+
+    def info(self, message):
+        self.messages.append(message)
+
+    def warning(self, message):
+        self.messages.append(message)
+
+    def error(self, message):
+        self.messages.append(message)
+        self.errors.append(message)
+
+    def flush(self):
+        self.flushed = True
+
+
+class RecordingDatabase:
+    """
+    Stand-in for database.influx_writer.Database: keeps the line protocol of every write
+    in ``lines`` and the (file, DataFrame) pairs in ``writes``. ``failed_writes`` is what
+    failures() reports for every archive.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.writes = []
+        self.summaries = 0
+        self.flushes = 0
+        self.failed_writes = 0
+
+    def write_dataframe(self, df, file, customer, server, summary=True):
+        from database.line_protocol import dataframe_to_line_protocol
+        from utils import metrics
+
+        with metrics.stage("influx_write", rows=len(df)):
+            self.lines.extend(dataframe_to_line_protocol(df))
+        self.writes.append((file, df))
+        self.summaries += summary
+
+    def queue_lines(self, lines):
+        self.lines.extend(lines)
+
+    def flush(self, archive=None):
+        self.flushes += 1
+
+    def failures(self, archive):
+        return self.failed_writes
@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+from conftest import RecordingDatabase, RecordingLog, RecordingS3, load_subroutine_config, sample_members
+from database.line_protocol import dataframe_to_line_protocol
+from etl.extract import resolve_import
+from etl.load import PARSERS, import_chunked, iter_row_chunks
+from etl.output import frame_to_csv
+from etl.plan import compile_plans
+
+
+def routed_members():
+    subroutine_config = load_subroutine_config()
+    compile_plans(subroutine_config)
+    for file_name, data in sample_members():
+        route = resolve_import(subroutine_config, f"extracted/{file_name}", file_name, RecordingLog())
+        if route is not None and route[0] in PARSERS:
+            yield file_name.split("_", 3)[3], route, data
+
+
+def test_iter_row_chunks_repeats_the_header_line():
+    chunks = [chunk.read() for chunk in iter_row_chunks(io.BytesIO(b"h\n1\n2\n3\n"), 2)]
+    headerless = [chunk.read() for chunk in iter_row_chunks(io.BytesIO(b"1\n2\n3"), 2, has_header=False)]
+
+    assert chunks == [b"h\n1\n2\n", b"h\n3\n"]
+    assert headerless == [b"1\n2\n", b"3"]
+
+
+@pytest.mark.parametrize("route,data", [(route, data) for _, route, data in routed_members()], ids=[name for name, _, _ in routed_members()])
+def test_chunked_import_matches_whole_member_import(route, data):
+    func_name, header, customer, server, subroutine_key, digits = route
+    df = PARSERS[func_name](header, io.BytesIO(data), customer, server, subroutine_key, digits)
+
+    s3, db = RecordingS3(), RecordingDatabase()
+    assert import_chunked(func_name, header, io.BytesIO(data), customer, server, subroutine_key, digits, s3, db, chunk_rows=100, output_format="csv")
+
+    assert db.lines == dataframe_to_line_protocol(df)
+    assert db.summaries == 1
+    assert list(s3.objects().values()) == [frame_to_csv(df)]
@@ -0,0 +1,66 @@
+import io
+import os
+import tarfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.clean import clean_data, replace_invalid_values
+
+
+def legacy_replace_invalid_values(df):
+    """The per-cell implementation replace_invalid_values has to stay identical to."""
+    for column in df.columns:
+        if column not in ['datetime', 'customer', 'server']:
+            condition_large_value = (df[column].apply(lambda x: isinstance(x, (int, float)) and x > 9023372036854775800))
+            condition_nan = (df[column].apply(lambda x: isinstance(x, str) and x.lower() == 'nan'))
+            df.loc[condition_large_value, column] = -1
+            df.loc[condition_nan, column] = -1
+    return df
+
+
+def sample_members():
+    file_path = os.path.join(os.path.dirname(__file__), "test_files/test_customer.plc_1728569682-110000-133000.tar")
+    with tarfile.open(file_path) as tar:
+        for member in tar.getmembers():
+            if member.isfile() and not os.path.basename(member.name).startswith("._"):
+                yield member.name, tar.extractfile(member).read()
+
+
+def test_replace_invalid_values_matches_legacy_on_mixed_columns():
+    df = pd.DataFrame({
+        "date": ["2024-10-10", "2024-10-10", "2024-10-10", "2024-10-10"],
+        "ints": np.array([1, 9223372036854775807, 3, 9023372036854775801], dtype="int64"),
+        "floats": [1.5, np.nan, 9.3e18, 2.0],
+        "strings": ["OK", "NaN", "nan", "NAN"],
+        "mixed": pd.Series(["nan", 9223372036854775807, 2.5, None], dtype=object),
+        "numbers_as_objects": pd.Series([1.0, 9.3e18, 3, None], dtype=object),
+        "flags": [True, False, True, False],
+        "unsigned": np.array([1, 2, 18446744073709551615, 4], dtype="uint64"),
+        "datetime": ["nan", "nan", "nan", "nan"],
+    })
+
+    expected = legacy_replace_invalid_values(df.copy())
+    result = replace_invalid_values(df.copy())
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize("data", [data for _, data in sample_members()], ids=[name.split("_", 3)[3] for name, _ in sample_members()])
+def test_clean_data_matches_legacy_on_sample_archive(data):
+    df = pd.read_csv(io.BytesIO(data), header=0)
+    df.columns = df.columns.str.strip()
+
+    expected = legacy_replace_invalid_values(df.copy())
+    result = replace_invalid_values(df.copy())
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_clean_data_drops_rows_at_or_before_the_watermark():
+    df = pd.DataFrame({"date": ["2024-10-10"] * 3, "time": ["11:00:05", "11:00:10", "11:00:15"], "locks": [1, 2, 3]})
+
+    cleaned = clean_data(df, "datetime,total_locks", "c", "s", "total_locks", 0, watermark=pd.Timestamp("2024-10-10 11:00:10"))
+
+    assert cleaned["datetime"].dt.strftime("%H:%M:%S").tolist() == ["11:00:15"]
+    assert cleaned["total_locks"].tolist() == [3.0]
@@ -0,0 +1,66 @@
+import pytest
+
+import config_cache
+from config_cache import TTLCache
+from conftest import RecordingS3, RecordingSSM, load_lambda
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_values_are_reloaded_after_the_ttl_and_failures_are_not_cached():
+    clock, loads = Clock(), []
+    cache = TTLCache(ttl=60, clock=clock)
+    load = lambda: loads.append(1) or len(loads)
+
+    assert [cache.get(("parameter", "a"), load) for _ in range(3)] == [1, 1, 1]
+    clock.now = 61
+    assert cache.get(("parameter", "a"), load) == 2
+    assert cache.get(("parameter", "none"), lambda: None) is None
+    assert cache.get(("parameter", "none"), lambda: "found") == "found"
+
+
+def test_invalidate_drops_one_entry_a_kind_or_everything():
+    cache = TTLCache(ttl=60)
+    for key in (("parameter", "a"), ("parameter", "b"), ("bucket", "raw")):
+        cache.get(key, lambda: "cached")
+
+    cache.invalidate("parameter", "a")
+    assert cache.get(("parameter", "a"), lambda: "fresh") == "fresh"
+    assert cache.get(("parameter", "b"), lambda: "fresh") == "cached"
+    cache.invalidate("parameter")
+    assert cache.get(("parameter", "b"), lambda: "fresh") == "fresh"
+    cache.invalidate()
+    assert cache.get(("bucket", "raw"), lambda: "fresh") == "fresh"
+
+
+@pytest.fixture
+def presign(monkeypatch):
+    module = load_lambda("presign", monkeypatch)
+    monkeypatch.setattr(module, "ssm", RecordingSSM())
+    monkeypatch.setattr(module, "s3", RecordingS3({"raw": {"taken.tar": {}}}))
+    config_cache.invalidate()
+    return module
+
+
+def test_warm_presign_calls_only_check_the_object(presign):
+    results = [presign.handler({"rawPath": f"/a_server_{i}.tar"}, None) for i in range(3)]
+
+    assert [result["statusCode"] for result in results] == [200, 200, 200]
+    assert presign.ssm.calls == 1
+    assert [op for op, _, _ in presign.s3.calls] == ["head_bucket", "head_object", "head_object", "head_object"]
+    assert presign.handler({"rawPath": "/taken.tar"}, None)["statusCode"] == 409
+
+
+def test_refresh_looks_the_parameter_and_bucket_up_again(presign):
+    presign.handler({"rawPath": "/a.tar"}, None)
+    presign.s3.calls.clear()
+
+    assert presign.handler({"rawPath": "/b.tar", "queryStringParameters": {"refresh": "1"}}, None)["statusCode"] == 200
+    assert [op for op, _, _ in presign.s3.calls] == ["head_bucket", "head_object"]
+    assert presign.ssm.calls == 2
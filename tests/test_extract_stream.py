@@ -0,0 +1,85 @@
+import io
+
+from conftest import RecordingLog, RecordingS3, build_archive
+from etl import extract
+from importers.registry import IMPORTERS
+
+
+def test_stream_and_create_structure_imports_members_from_memory(monkeypatch, subroutine_config):
+    member = "test_customer.plc_1728569682-110000-133000_total_locks_1_for_graph.log"
+    content = b"date,time,locks\n2024-10-10,11:00:05,87\n"
+    archive = io.BytesIO(build_archive({f"._{member}": b"apple double", member: content}))
+
+    calls = []
+
+    def fake_import_data(header, source, customer, server, subroutine_key, file, digits, s3, db, ledger=None):
+        calls.append((header, source.read(), customer, server, subroutine_key, file, digits))
+
+    monkeypatch.setitem(IMPORTERS, "import_data", fake_import_data)
+
+    s3 = RecordingS3()
+    log = RecordingLog()
+    extract.stream_and_create_structure(archive, "test", "customer.plc", s3, log, None, subroutine_config)
+
+    assert log.errors == []
+    assert s3.calls == [("put_object", extract.get_processed_bucket_name(), f"extracted/{member}")]
+    assert calls == [
+        ("datetime,total_locks", content, "test", "customer.plc", "total_locks", member, 0)
+    ]
+
+
+def test_stream_and_create_structure_with_member_pool(monkeypatch, subroutine_config):
+    from etl import load, parallel
+
+    members = {
+        f"test_customer.plc_1728569682-110000-133000_{name}_1_for_graph.log": f"date,time,value\n{name}\n".encode()
+        for name in ("total_locks", "vpcache", "buffer_fast", "buffer_16k")
+    }
+    archive = io.BytesIO(build_archive(members))
+
+    published = []
+
+    def fake_read_data(header, source, customer, server, subroutine_key, digits, watermark=None):
+        return source.read()
+
+    def fake_publish(df, customer, server, subroutine_key, digits, s3, db, ledger=None):
+        published.append((subroutine_key, digits, df))
+
+    monkeypatch.setitem(load.PARSERS, "import_data", fake_read_data)
+    monkeypatch.setattr(parallel, "publish_import_file", fake_publish)
+    monkeypatch.setattr(extract, "MEMBER_POOL", "thread")
+
+    s3 = RecordingS3()
+    log = RecordingLog()
+    extract.stream_and_create_structure(archive, "test", "customer.plc", s3, log, None, subroutine_config, workers=2)
+
+    assert log.errors == []
+    assert sorted(s3.objects(extract.get_processed_bucket_name())) == sorted(f"extracted/{name}" for name in members)
+    assert sorted(published) == [
+        ("buffer_fast", 0, b"date,time,value\nbuffer_fast\n"),
+        ("buffer_k", 16, b"date,time,value\nbuffer_16k\n"),
+        ("total_locks", 0, b"date,time,value\ntotal_locks\n"),
+        ("vpcache", 0, b"date,time,value\nvpcache\n"),
+    ]
+
+
+def test_parse_pool_workers_compile_the_plans_of_the_subroutine_config(subroutine_config):
+    from etl import parallel, plan
+    from etl.load import PARSERS
+
+    unpivot_header = subroutine_config["openbet_cpu_by_app"]["VALUES"]["IMPORT"][0][1]
+    wide = b"datetime,APP1 core,APP1 percentage\n2024-10-10 11:00:00,1.234,50\n"
+    pool = parallel.create_parse_pool(2, "process", RecordingLog(), subroutine_config)
+    try:
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+        # read_data takes the plan path only when get_plan finds the plan in the worker
+        compiled = pool.submit(plan.get_plan, "total_locks", "datetime,total_locks").result(timeout=60)
+        frame = pool.submit(PARSERS["import_data"], "datetime,total_locks", io.BytesIO(b"datetime,total_locks\n2024-10-10 11:00:00,87\n"),
+                            "test", "customer.plc", "total_locks", 0).result(timeout=60)
+        unpivoted = pool.submit(PARSERS["import_unpivot"], unpivot_header, io.BytesIO(wide),
+                                "test", "customer.plc", "openbet_cpu_by_app", 0).result(timeout=60)
+    finally:
+        pool.shutdown()
+    assert compiled is not None and compiled.header == "datetime,total_locks"
+    assert frame["total_locks"].tolist() == [87]
+    assert unpivoted["name"].tolist() == ["APP1"] and unpivoted["cores"].tolist() == [1.23]
@@ -0,0 +1,68 @@
+import os
+import threading
+
+import pytest
+
+import handler
+from conftest import RecordingDatabase, RecordingLog, RecordingS3
+from etl import extract
+
+
+def event(*keys):
+    return {"Records": [{"s3": {"bucket": {"name": "raw"}, "object": {"key": key}}} for key in keys]}
+
+
+@pytest.fixture
+def lambda_env(monkeypatch):
+    s3, log, db = RecordingS3(), RecordingLog(), RecordingDatabase()
+    # Each archive holds just its own key, so fakes can tell them apart
+    for key in ("a_server_1.tar", "bad_server_1.tar", "c_server_1.tar"):
+        s3.add("raw", key, key.encode())
+    monkeypatch.setattr(handler, "get_s3_client", lambda: s3)
+    monkeypatch.setattr(handler, "get_log", lambda: log)
+    monkeypatch.setattr(handler, "get_db", lambda: db)
+    monkeypatch.setattr(handler, "get_subroutine_config", lambda: {})
+    monkeypatch.setattr(handler, "get_ledger", lambda: None)
+    monkeypatch.setattr(handler, "INGEST_MODE", "stream")
+    return s3, log, db
+
+
+def test_records_run_concurrently_and_only_successes_are_deleted(monkeypatch, lambda_env):
+    s3, log, db = lambda_env
+    barrier = threading.Barrier(3, timeout=5)
+    workspaces = []
+
+    def fake_stream(body, customer, server, s3, log, db, subroutine_config, ledger=None):
+        # Every record must be in flight at once to pass the barrier
+        barrier.wait()
+        if body.read() == b"bad_server_1.tar":
+            raise ValueError("corrupt archive")
+
+    original_mkdtemp = handler.tempfile.mkdtemp
+
+    def recording_mkdtemp(**kwargs):
+        workspaces.append(original_mkdtemp(**kwargs))
+        return workspaces[-1]
+
+    monkeypatch.setattr(extract, "stream_and_create_structure", fake_stream)
+    monkeypatch.setattr(handler.tempfile, "mkdtemp", recording_mkdtemp)
+    monkeypatch.setattr(handler, "RECORD_WORKERS", 3)
+
+    with pytest.raises(RuntimeError, match="1 of 3 archives failed: bad_server_1.tar"):
+        handler.handler(event("a_server_1.tar", "bad_server_1.tar", "c_server_1.tar"), None)
+
+    assert s3.deleted == [("raw", "a_server_1.tar"), ("raw", "c_server_1.tar")]
+    assert log.errors == ["Failed to ingest s3://raw/bad_server_1.tar: corrupt archive"]
+    assert log.flushed
+    assert db.flushes == 3
+    assert len(set(workspaces)) == 3
+    assert not any(os.path.exists(path) for path in workspaces)
+
+
+def test_successful_records_return_their_results(monkeypatch, lambda_env):
+    monkeypatch.setattr(extract, "stream_and_create_structure", lambda *args, **kwargs: None)
+    monkeypatch.setattr(handler, "RECORD_WORKERS", 1)
+
+    result = handler.handler(event("a_server_1.tar"), None)
+
+    assert result == {"results": [{"bucket": "raw", "key": "a_server_1.tar", "status": "succeeded"}]}
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from database.influx_writer import Database
+from database.line_protocol import dataframe_to_line_protocol
+from database.sinks import CaptureSink, InfluxDBSink, create_sink
+from database.standin import InfluxWriteStandIn
+
+CREDENTIALS = {"token": "t", "org": "o", "bucket": "b"}
+
+
+def frame(rows):
+    return pd.DataFrame({
+        "datetime": pd.date_range("2024-10-10 11:00:00", periods=rows, freq="s"),
+        "_measurement": ["m"] * rows,
+        "customer": ["c"] * rows,
+        "server": ["s 1"] * rows,
+        "value": [i / 3 for i in range(rows)],
+        "state": ["OK, \"quoted\""] * rows,
+    })
+
+
+def test_capture_sink_records_the_payloads_of_database():
+    capture = CaptureSink()
+    db = Database(sink=capture)
+
+    db.write_dataframe(frame(7), "file", "c", "s", batch_size=5, summary=False)
+    db.flush()
+
+    assert [len(payload.split("\n")) for payload in capture.payloads] == [5, 2]
+    assert (capture.batches, capture.lines) == (2, 7)
+    assert capture.text() == "\n".join(dataframe_to_line_protocol(frame(7)))
+    assert capture.bytes == len(capture.text().encode()) - 1
+
+
+def test_standin_receives_byte_identical_payloads_through_the_client():
+    capture = CaptureSink()
+    with InfluxWriteStandIn() as standin:
+        db = Database(sink=InfluxDBSink(standin.url, lambda: dict(CREDENTIALS)))
+        for sink_db in (db, Database(sink=capture)):
+            sink_db.write_dataframe(frame(12), "file", "c", "s", batch_size=5, summary=False)
+            sink_db.flush()
+        db.close()
+
+        assert standin.payloads() == [payload.encode() for payload in capture.payloads]
+        assert [(request.org, request.bucket, request.precision, request.lines) for request in standin.requests] == [
+            ("o", "b", "s", 5), ("o", "b", "s", 5), ("o", "b", "s", 2)]
+        summary = standin.summary()
+        assert (summary["batches"], summary["lines"]) == (3, 12)
+        assert summary["bytes"] == sum(request.bytes for request in standin.requests) > 0
+
+
+def test_rejected_writes_are_counted_as_failed():
+    with InfluxWriteStandIn(status=500) as standin:
+        db = Database(sink=InfluxDBSink(standin.url, lambda: dict(CREDENTIALS)))
+        db.write_dataframe(frame(2), "file", "c", "s", summary=False)
+        db.flush()
+        db.close()
+
+    assert db.failed_writes == 1
+    assert len(standin.requests) == 1
+
+
+def test_create_sink_rejects_unknown_kinds():
+    assert isinstance(create_sink("capture", "http://unused", dict), CaptureSink)
+    with pytest.raises(ValueError):
+        create_sink("kafka", "http://unused", dict)
+
+
+def test_archives_have_their_own_buffer_and_failure_count():
+    from utils.metrics import labels
+
+    class FailingSink(CaptureSink):
+        def write(self, payload, lines):
+            if "bad" in payload:
+                raise RuntimeError("rejected")
+            super().write(payload, lines)
+
+    sink = FailingSink()
+    db = Database(sink=sink)
+    with labels(archive="a.tar"):
+        db.queue_lines(["m,server=good value=1"])
+    with labels(archive="b.tar"):
+        db.queue_lines(["m,server=bad value=2"])
+
+    # Flushing one archive never sends (or fails on) the lines of another
+    db.flush("a.tar")
+    assert sink.payloads == ["m,server=good value=1"]
+    assert (db.failures("a.tar"), db.failures("b.tar")) == (0, 0)
+
+    db.flush("b.tar")
+    assert (db.failures("a.tar"), db.failures("b.tar"), db.failed_writes) == (0, 1, 1)
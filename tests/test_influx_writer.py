@@ -0,0 +1,111 @@
+import influxdb_client
+import pandas as pd
+import pytest
+
+from database import influx_writer
+from database.influx_writer import Database
+
+
+class RecordingWriteApi:
+    def __init__(self):
+        self.payloads = []
+        self.closed = False
+
+    def write(self, bucket, org, record, write_precision):
+        self.payloads.append(record)
+
+    def close(self):
+        self.closed = True
+
+
+class RecordingClient:
+    def __init__(self):
+        self.write_api_calls = 0
+        self.api = RecordingWriteApi()
+        self.closed = False
+
+    def write_api(self, write_options):
+        self.write_api_calls += 1
+        return self.api
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def db(monkeypatch):
+    clients = []
+
+    secret = {"token": "t", "org": "o", "bucket": "b"}
+
+    def client_factory(**kwargs):
+        clients.append(RecordingClient())
+        clients[-1].token = kwargs["token"]
+        return clients[-1]
+
+    monkeypatch.setattr(influx_writer, "get_secret", lambda name: dict(secret))
+    monkeypatch.setattr(influxdb_client, "InfluxDBClient", client_factory)
+    database = Database()
+    database.clients = clients
+    database.secret = secret
+    yield database
+
+
+def frame(rows):
+    return pd.DataFrame({
+        "datetime": pd.date_range("2024-10-10 11:00:00", periods=rows, freq="s"),
+        "_measurement": ["m"] * rows,
+        "customer": ["c"] * rows,
+        "server": ["s"] * rows,
+        "value": range(rows),
+    })
+
+
+def test_write_dataframe_reuses_one_client_and_coalesces_files(db):
+    for i in range(3):
+        db.write_dataframe(frame(2), f"file{i}", "c", "s", batch_size=5)
+
+    assert len(db.clients) == 1
+    assert db.clients[0].write_api_calls == 1
+    # 3 files x (summary + 2 rows) = 9 lines: one full batch sent, the rest waits for flush
+    assert [len(p.split("\n")) for p in db.clients[0].api.payloads] == [5]
+
+    db.flush()
+
+    assert [len(p.split("\n")) for p in db.clients[0].api.payloads] == [5, 4]
+
+
+def test_close_flushes_and_next_write_reopens_client(db):
+    db.write_dataframe(frame(1), "file", "c", "s")
+    db.close()
+
+    first = db.clients[0]
+    assert first.closed and first.api.closed
+    assert len(first.api.payloads) == 1
+
+    db.write_dataframe(frame(1), "file", "c", "s")
+    db.flush()
+
+    assert len(db.clients) == 2
+    assert len(db.clients[1].api.payloads) == 1
+
+
+def test_database_fetches_nothing_until_first_write(monkeypatch):
+    def fail(name):
+        raise AssertionError("secret fetched at construction")
+
+    monkeypatch.setattr(influx_writer, "get_secret", fail)
+    Database()
+
+
+def test_rotated_token_rebuilds_the_client(db):
+    db.write_dataframe(frame(1), "file", "c", "s")
+    db.flush()
+
+    db.secret["token"] = "rotated"
+    db.write_dataframe(frame(1), "file", "c", "s")
+    db.flush()
+
+    assert [client.token for client in db.clients] == ["t", "rotated"]
+    assert db.clients[0].closed
+    assert len(db.clients[1].api.payloads) == 1
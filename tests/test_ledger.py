@@ -0,0 +1,162 @@
+import pytest
+
+import handler
+from conftest import RecordingDatabase, RecordingLog, RecordingS3, build_archive
+from importers.registry import IMPORTERS
+from etl.ledger import IngestionLedger, LocalLedgerStore, create_ledger
+
+
+def member(name):
+    return f"test_customer.plc_1728569682-110000-133000_{name}_1_for_graph.log"
+
+
+@pytest.fixture
+def lambda_env(monkeypatch, tmp_path, subroutine_config):
+    s3, log, db = RecordingS3(), RecordingLog(), RecordingDatabase()
+    ledger = IngestionLedger(LocalLedgerStore(str(tmp_path)))
+    imported = []
+
+    def fake_import_data(header, source, customer, server, subroutine_key, file, digits, s3, db, ledger=None):
+        imported.append(subroutine_key)
+        return True
+
+    monkeypatch.setitem(IMPORTERS, "import_data", fake_import_data)
+    monkeypatch.setattr(handler, "get_s3_client", lambda: s3)
+    monkeypatch.setattr(handler, "get_log", lambda: log)
+    monkeypatch.setattr(handler, "get_db", lambda: db)
+    monkeypatch.setattr(handler, "get_subroutine_config", lambda: subroutine_config)
+    monkeypatch.setattr(handler, "get_ledger", lambda: ledger)
+    monkeypatch.setattr(handler, "INGEST_MODE", "stream")
+    monkeypatch.setattr(handler, "RECORD_WORKERS", 1)
+    return s3, db, imported
+
+
+def event(key, **options):
+    return {"Records": [{"s3": {"bucket": {"name": "raw"}, "object": {"key": key}}}], **options}
+
+
+def test_reuploaded_archive_is_skipped_by_etag(lambda_env):
+    s3, db, imported = lambda_env
+    s3.add("raw", "test_customer.plc_1.tar", build_archive({member("total_locks"): b"date,time,locks\n"}))
+
+    first = handler.handler(event("test_customer.plc_1.tar"), None)
+    second = handler.handler(event("test_customer.plc_1.tar"), None)
+
+    assert first["results"][0]["status"] == "succeeded"
+    assert second["results"][0]["status"] == "skipped"
+    assert imported == ["total_locks"]
+    assert s3.deleted == [("raw", "test_customer.plc_1.tar"), ("raw", "test_customer.plc_1.tar")]
+
+
+def test_members_already_ingested_are_skipped_in_a_new_archive(lambda_env):
+    s3, db, imported = lambda_env
+    s3.add("raw", "test_customer.plc_1.tar", build_archive({member("total_locks"): b"date,time,locks\n"}))
+    s3.add("raw", "test_customer.plc_2.tar", build_archive({
+        member("total_locks"): b"date,time,locks\n",
+        member("vpcache"): b"date,time,vpcache\n",
+    }))
+
+    handler.handler(event("test_customer.plc_1.tar"), None)
+    handler.handler(event("test_customer.plc_2.tar"), None)
+
+    assert imported == ["total_locks", "vpcache"]
+
+
+def test_nothing_is_recorded_when_influx_rejects_a_write(lambda_env):
+    s3, db, imported = lambda_env
+    s3.add("raw", "test_customer.plc_1.tar", build_archive({member("total_locks"): b"date,time,locks\n"}))
+    db.flush = lambda archive=None: setattr(db, "failed_writes", db.failed_writes + 1)
+
+    handler.handler(event("test_customer.plc_1.tar"), None)
+    del db.flush
+    handler.handler(event("test_customer.plc_1.tar"), None)
+
+    assert imported == ["total_locks", "total_locks"]
+
+
+def test_rows_at_or_before_the_watermark_are_dropped_unless_backfilling(monkeypatch, lambda_env):
+    from etl import load
+
+    s3, db, imported = lambda_env
+    monkeypatch.setitem(IMPORTERS, "import_data", load.import_data)
+    for name, times in (("1", ("11:00:05", "11:00:10")), ("2", ("11:00:10", "11:00:15")), ("3", ("11:00:00", "11:00:15")), ("4", ("11:00:01",))):
+        rows = "".join(f"2024-10-10,{time},87\n" for time in times)
+        s3.add("raw", f"test_customer.plc_{name}.tar", build_archive({member("total_locks"): f"date,time,locks\n{rows}".encode()}))
+
+    handler.handler(event("test_customer.plc_1.tar"), None)
+    handler.handler(event("test_customer.plc_2.tar"), None)
+    handler.handler(event("test_customer.plc_3.tar", backfill=True), None)
+    handler.handler(event("test_customer.plc_4.tar"), None)
+
+    # The backfill re-sends 11:00:15 and does not move the watermark back
+    assert [df["datetime"].dt.strftime("%H:%M:%S").tolist() for _, df in db.writes] == [["11:00:05", "11:00:10"], ["11:00:15"], ["11:00:00", "11:00:15"]]
+
+
+def test_unknown_ledger_store_is_rejected():
+    assert create_ledger("off") is None
+    with pytest.raises(ValueError, match="Unknown ledger store"):
+        create_ledger("dynamodb")
+
+
+def test_a_member_whose_points_cannot_be_serialised_is_not_recorded(monkeypatch, lambda_env):
+    from database import influx_writer
+    from database.influx_writer import Database
+    from database.sinks import CaptureSink
+    from etl import load
+
+    s3, _, _ = lambda_env
+    db = Database(sink=CaptureSink())
+    monkeypatch.setattr(handler, "get_db", lambda: db)
+    monkeypatch.setitem(IMPORTERS, "import_data", load.import_data)
+    s3.add("raw", "test_customer.plc_1.tar", build_archive({member("total_locks"): b"date,time,locks\n2024-10-10,11:00:05,87\n"}))
+
+    def unserialisable(df):
+        raise ValueError("cannot serialise")
+
+    serialise = influx_writer.dataframe_to_line_protocol
+    monkeypatch.setattr(influx_writer, "dataframe_to_line_protocol", unserialisable)
+    handler.handler(event("test_customer.plc_1.tar"), None)
+    assert (db.failed_writes, db.sink.lines) == (1, 0)
+
+    # Not recorded, so the re-upload ingests the member: its summary record and row
+    monkeypatch.setattr(influx_writer, "dataframe_to_line_protocol", serialise)
+    handler.handler(event("test_customer.plc_1.tar"), None)
+    assert db.sink.lines == 2
+
+
+@pytest.mark.parametrize("failure", ["serialise", "reject"])
+def test_watermark_only_moves_past_rows_influx_accepted(monkeypatch, tmp_path, lambda_env, failure):
+    from database import influx_writer
+    from database.influx_writer import Database
+    from database.sinks import CaptureSink
+    from etl import load
+
+    class RejectingSink(CaptureSink):
+        rejecting = failure == "reject"
+
+        def write(self, payload, lines):
+            if self.rejecting:
+                raise RuntimeError("rejected")
+            super().write(payload, lines)
+
+    s3, _, _ = lambda_env
+    db = Database(sink=RejectingSink())
+    monkeypatch.setattr(handler, "get_db", lambda: db)
+    monkeypatch.setitem(IMPORTERS, "import_data", load.import_data)
+    serialise = influx_writer.dataframe_to_line_protocol
+    if failure == "serialise":
+        monkeypatch.setattr(influx_writer, "dataframe_to_line_protocol", lambda df: 1 / 0)
+    for name, times in (("1", ("11:00:05", "11:00:10")), ("2", ("11:00:05", "11:00:10", "11:00:15"))):
+        rows = "".join(f"2024-10-10,{time},87\n" for time in times)
+        s3.add("raw", f"test_customer.plc_{name}.tar", build_archive({member("total_locks"): f"date,time,locks\n{rows}".encode()}))
+
+    store = LocalLedgerStore(str(tmp_path))
+    handler.handler(event("test_customer.plc_1.tar"), None)
+    assert not (store.read(IngestionLedger.document_name("test", "customer.plc")) or {}).get("watermarks")
+
+    RejectingSink.rejecting = False
+    monkeypatch.setattr(influx_writer, "dataframe_to_line_protocol", serialise)
+    handler.handler(event("test_customer.plc_2.tar"), None)
+    # The rows of the failed archive are not dropped as already ingested
+    assert db.sink.lines == 4
+    assert store.read(IngestionLedger.document_name("test", "customer.plc"))["watermarks"]
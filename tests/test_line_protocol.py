@@ -0,0 +1,95 @@
+import io
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from influxdb_client import Point, WritePrecision
+
+from conftest import RecordingLog, load_subroutine_config, sample_members
+from database.line_protocol import dataframe_to_line_protocol
+from etl.extract import resolve_import
+from etl.load import PARSERS
+from etl.plan import compile_plans
+
+
+def legacy_lines(df):
+    """The Point-per-record serialisation Database.write performed before write_dataframe."""
+    lines = []
+    for record in df.to_dict(orient="records"):
+        if 'datetime' in record:
+            record['_time'] = record.pop('datetime')
+            if isinstance(record['_time'], str):
+                record['_time'] = datetime.strptime(record['_time'], '%Y-%m-%dT%H:%M:%S')
+            record['_time'] = record['_time'].replace(tzinfo=None)
+            record['_time'] = record['_time'].strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        point = Point(record['_measurement'])
+        if "customer" in record:
+            point.tag("customer", record["customer"])
+        if "server" in record:
+            point.tag("server", record["server"])
+        if "digits" in record:
+            point.tag("pagesize", record["digits"])
+        if "name" in record:
+            point.tag("metric", record["name"])
+        if "area" in record:
+            point.tag("metric", record["area"])
+        for field, value in record.items():
+            if field not in ['_measurement', 'customer', 'server', '_time']:
+                point.field(field, value)
+        point.time(record['_time'], WritePrecision.S)
+
+        line = point.to_line_protocol()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def sample_frames():
+    subroutine_config = load_subroutine_config()
+    compile_plans(subroutine_config)
+    for file_name, data in sample_members():
+        route = resolve_import(subroutine_config, f"extracted/{file_name}", file_name, RecordingLog())
+        if route is None or route[0] not in PARSERS:
+            continue
+        func_name, header, customer, server, subroutine_key, digits = route
+        yield file_name.split("_", 3)[3], (header, io.BytesIO(data), customer, server, subroutine_key, digits), PARSERS[func_name]
+
+
+@pytest.mark.parametrize("args,parser", [(args, parser) for _, args, parser in sample_frames()], ids=[name for name, _, _ in sample_frames()])
+def test_dataframe_to_line_protocol_matches_points_on_sample_archive(args, parser):
+    df = parser(*args)
+
+    assert dataframe_to_line_protocol(df) == legacy_lines(df)
+
+
+def test_dataframe_to_line_protocol_escapes_and_skips_like_points():
+    df = pd.DataFrame({
+        "datetime": pd.to_datetime(["2024-10-10 11:00:00", "2024-10-10 11:00:01", "2024-10-10 11:00:02"]),
+        "_measurement": ["my measurement", "my measurement", "my measurement"],
+        "customer": ["acme, inc", "acme, inc", "acme, inc"],
+        "server": ["db=1", "db=1", "db=1"],
+        "digits": [2, 2, 2],
+        "name": ["path\\", "", None],
+        "ratio": [1.0, np.nan, np.inf],
+        "count": np.array([1, -1, 3], dtype="int64"),
+        "ok": [True, False, True],
+        "state": ['say "hi"', "back\\slash", "plain"],
+        "mixed": pd.Series(["a", 2, None], dtype=object),
+    })
+
+    assert dataframe_to_line_protocol(df) == legacy_lines(df)
+
+
+def test_dataframe_to_line_protocol_drops_rows_without_fields():
+    df = pd.DataFrame({
+        "datetime": pd.to_datetime(["2024-10-10 11:00:00", "2024-10-10 11:00:01"]),
+        "_measurement": ["m", "m"],
+        "customer": ["c", "c"],
+        "server": ["s", "s"],
+        "value": [np.nan, 1.5],
+    })
+
+    assert dataframe_to_line_protocol(df) == ["m,customer=c,server=s value=1.5 1728558001"]
+
@@ -0,0 +1,112 @@
+import datetime
+import json
+
+import pytest
+
+import config_cache
+from conftest import RecordingS3, RecordingSSM, load_lambda
+
+@pytest.fixture
+def list_handler(monkeypatch):
+    module = load_lambda("list", monkeypatch)
+    monkeypatch.setattr(module, "ssm", RecordingSSM())
+    config_cache.invalidate()
+    return module
+
+
+def manifest_object(entries):
+    return {"Body": json.dumps({"entries": entries}).encode(), "Size": 1, "LastModified": None}
+
+
+def call(list_handler, **params):
+    result = list_handler.handler({"queryStringParameters": params or None, "requestContext": {"http": {"method": "GET"}}}, None)
+    return result["statusCode"], json.loads(result["body"])
+
+
+def test_processed_files_come_from_the_recent_manifest_partitions(list_handler, monkeypatch):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    hour = now.strftime("%Y-%m-%dT%H")
+    old_hour = (now - datetime.timedelta(days=3)).strftime("%Y-%m-%dT%H")
+    placed = lambda minutes: (now - datetime.timedelta(minutes=minutes)).isoformat(timespec="microseconds")
+    s3 = RecordingS3({
+        "raw": {"a_server_1.tar": {"Size": 10, "LastModified": now}},
+        "processed": {
+            f"manifest/segments/{hour}/1-a.json": manifest_object([
+                {"Key": "to_ingest/new.csv", "Size": 5, "Timestamp": placed(1), "Archive": "a_server_1.tar"},
+                {"Key": "to_ingest/stale.csv", "Size": 5, "Timestamp": placed(30), "Archive": "a_server_1.tar"},
+            ]),
+            f"manifest/hours/{old_hour}.json": manifest_object([{"Key": "to_ingest/old.csv", "Size": 5, "Timestamp": placed(3 * 24 * 60), "Archive": None}]),
+            "to_ingest/new.csv": {"Size": 5, "LastModified": now},
+        },
+    })
+    monkeypatch.setattr(list_handler, "s3", s3)
+
+    status, body = call(list_handler)
+
+    assert status == 200
+    processed = [item["Processed"] for item in body["items"] if "Processed" in item]
+    assert [(item["Name"], item["Size"], item["URL"]) for item in processed] == [("to_ingest/new.csv", 5, "https://signed/processed/to_ingest/new.csv")]
+    assert [item["Raw"]["Name"] for item in body["items"] if "Raw" in item] == ["a_server_1.tar"]
+    # The processed bucket itself is never listed, only the segments of the recent hours
+    assert all(bucket == "raw" or prefix.startswith("manifest/segments/") for bucket, prefix in s3.listed)
+
+
+@pytest.fixture
+def many_files(list_handler, monkeypatch):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    entries = [{"Key": f"{'to_ingest' if i % 2 else 'extracted'}/f{i:02d}.csv", "Size": i,
+                "Timestamp": (now - datetime.timedelta(seconds=10 * i)).isoformat(timespec="microseconds"), "Archive": None} for i in range(25)]
+    s3 = RecordingS3({"raw": {}, "processed": {f"manifest/segments/{now:%Y-%m-%dT%H}/1-a.json": manifest_object(entries)}})
+    signed = []
+    original = s3.generate_presigned_url
+    s3.generate_presigned_url = lambda **kwargs: signed.append(kwargs["Params"]["Key"]) or original(**kwargs)
+    monkeypatch.setattr(list_handler, "s3", s3)
+    monkeypatch.setattr(list_handler, "RECENT_MINUTES", 60 * 24)
+    return now, signed
+
+
+def test_pages_follow_the_cursor_and_only_the_page_is_signed(list_handler, many_files):
+    now, signed = many_files
+    keys, cursor, window = [], None, {}
+    while True:
+        # Like website/app.js, the next pages are read from the window of the first one
+        status, body = call(list_handler, page_size="10", **({"cursor": cursor, **window} if cursor else {}))
+        assert status == 200 and len(body["items"]) <= 10
+        keys += [item["Key"] for item in body["items"]]
+        cursor, window = body["next_cursor"], window or {"since": body["since"], "until": body["until"]}
+        assert (body["since"], body["until"]) == (window["since"], window["until"])
+        if cursor is None:
+            break
+
+    # Newest first, every file exactly once, each signed once when its page was returned
+    assert keys == [f"{'to_ingest' if i % 2 else 'extracted'}/f{i:02d}.csv" for i in range(25)]
+    assert signed == keys
+
+    signed.clear()
+    status, body = call(list_handler, page_size="5", sign="0", prefix="to_ingest/", since=(now - datetime.timedelta(seconds=95)).isoformat())
+    assert [item["Key"] for item in body["items"]] == ["to_ingest/f01.csv", "to_ingest/f03.csv", "to_ingest/f05.csv", "to_ingest/f07.csv", "to_ingest/f09.csv"]
+    assert body["next_cursor"] is None and signed == []
+    assert "URL" not in body["items"][0]["Processed"]
+
+
+def test_sign_endpoint_signs_the_requested_keys_only(list_handler, many_files):
+    _, signed = many_files
+    sign = lambda body: list_handler.handler({"rawPath": "/sign", "requestContext": {"http": {"method": "POST"}}, "body": json.dumps(body)}, None)
+
+    result = sign({"keys": [{"bucket": "Processed", "key": "to_ingest/f01.csv"}, {"bucket": "Raw", "key": "a.tar"}]})
+
+    assert result["statusCode"] == 200
+    assert json.loads(result["body"])["urls"] == [
+        {"bucket": "Processed", "key": "to_ingest/f01.csv", "url": "https://signed/processed/to_ingest/f01.csv"},
+        {"bucket": "Raw", "key": "a.tar", "url": "https://signed/raw/a.tar"},
+    ]
+    assert sign({"keys": [{"bucket": "other-bucket", "key": "secret"}]})["statusCode"] == 400
+    for internal in ("ledger/raw/a.tar.json", "manifest/hours/2024-10-10T11.json"):
+        assert sign({"keys": [{"bucket": "Raw", "key": "a.tar"}, {"bucket": "Processed", "key": internal}]})["statusCode"] == 400
+    assert signed == ["to_ingest/f01.csv", "a.tar"]
+
+
+def test_bad_parameters_are_rejected(list_handler, many_files):
+    assert call(list_handler, page_size="0")[0] == 400
+    assert call(list_handler, cursor="not-a-cursor")[0] == 400
+    assert call(list_handler, since="2020-01-01T00:00:00Z")[0] == 400
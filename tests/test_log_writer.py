@@ -0,0 +1,91 @@
+import logging
+
+import pandas as pd
+
+from etl import parallel
+from etl.parallel import create_parse_pool
+from utils import log_writer
+from utils.log_writer import Lazy, Logger, Sampler, frame_info, get_logger, init_worker
+
+
+class Rendering:
+    def __init__(self):
+        self.renders = 0
+
+    def __call__(self):
+        self.renders += 1
+        return "rendered"
+
+
+def test_disabled_levels_never_render_the_message(tmp_path):
+    log = Logger(log_file=str(tmp_path / "app.log"), default_level="INFO", use_queue=True)
+    render = Rendering()
+
+    log.debug("frame: %s", Lazy(render))
+    get_logger("etl.load").debug("frame: %s", Lazy(render))
+    assert render.renders == 0 and not log.enabled("DEBUG")
+
+    log.info("frame: %s", Lazy(render))
+    log.close()
+    # Rendered once for the queue, not once per handler
+    assert render.renders == 1
+
+
+def test_queued_records_are_written_by_flush_to_one_set_of_handlers(tmp_path):
+    path = tmp_path / "app.log"
+    Logger(log_file=str(path), use_queue=True).close()
+    log = Logger(log_file=str(path), use_queue=True)
+
+    log.info("archive %s done", "a.tar")
+    get_logger("etl.extract").warning("member skipped")
+    log.flush()
+    log.close()
+
+    lines = path.read_text().splitlines()
+    assert [line.split(" - ", 1)[1] for line in lines] == ["INFO - archive a.tar done", "WARNING - member skipped"]
+    assert len(logging.getLogger(log_writer.LOGGER_NAME).handlers) == 1
+
+
+def test_parse_workers_log_to_stderr_instead_of_the_parent_queue(tmp_path, capfd, monkeypatch):
+    # A forkserver started by an earlier test would keep the stderr from before capfd
+    monkeypatch.setattr(parallel, "PARSE_START_METHOD", "spawn")
+    log = Logger(log_file=str(tmp_path / "app.log"), default_level="INFO", use_queue=True)
+    pool = create_parse_pool(1, "process", log, {})
+    try:
+        # Logger pickles by name, so the call logs from the worker's AppLogger
+        pool.submit(get_logger("etl.load").info, "parsed %s", "a.csv").result()
+    finally:
+        pool.shutdown()
+        log.close()
+    assert "INFO - parsed a.csv" in capfd.readouterr().err
+    assert "parsed a.csv" not in (tmp_path / "app.log").read_text()
+
+
+def test_init_worker_drops_inherited_queue_handlers(tmp_path, capsys):
+    log = Logger(log_file=str(tmp_path / "app.log"), default_level="INFO", use_queue=True)
+    try:
+        # What a forked worker would run with the parent's handlers in place
+        init_worker(logging.INFO)
+        handlers = get_logger().handlers
+        assert [type(handler) for handler in handlers] == [logging.StreamHandler]
+        get_logger("etl.extract").info("member parsed")
+        assert "INFO - member parsed" in capsys.readouterr().err
+    finally:
+        log.close()
+
+
+def test_sampling_lets_one_call_in_every_n_through_per_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_writer, "_sampler", Sampler(every=3))
+    log = Logger(log_file=str(tmp_path / "app.log"), default_level="DEBUG", use_queue=False)
+
+    for i in range(7):
+        log.sample("total_locks", "row %s", i)
+        log.sample("partitions", "row %s", i)
+
+    logged = (tmp_path / "app.log").read_text().splitlines()
+    assert [line.rsplit(" - ", 1)[1] for line in logged] == ["row 0", "row 0", "row 3", "row 3", "row 6", "row 6"]
+    assert Sampler(every=1)("any")
+
+
+def test_frame_info_captures_dataframe_info():
+    assert "Data columns (total 1 columns)" in frame_info(pd.DataFrame({"a": [1, 2]}))
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import manifest_reader
+from utils import manifest, metrics
+from utils.s3 import place_s3_object
+
+
+class NoSuchKey(Exception):
+    response = {"Error": {"Code": "NoSuchKey"}}
+
+
+class PreconditionFailed(Exception):
+    response = {"Error": {"Code": "PreconditionFailed"}}
+
+
+def etag(body: bytes) -> str:
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+class MemoryS3:
+    """Bucket contents by key, with the calls the manifest uses."""
+
+    def __init__(self):
+        self.objects = {}
+        self.listed = []
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None):
+        current = self.objects.get(Key)
+        if (IfMatch and (current is None or etag(current) != IfMatch)) or (IfNoneMatch == "*" and current is not None):
+            raise PreconditionFailed(Key)
+        self.objects[Key] = Body if isinstance(Body, bytes) else Body.read()
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": etag(self.objects[Key])}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        self.listed.append(Prefix)
+        return {"Contents": [{"Key": key} for key in sorted(self.objects) if key.startswith(Prefix)]}
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            self.objects.pop(obj["Key"], None)
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def pending(monkeypatch):
+    monkeypatch.setattr(manifest, "MANIFEST", True)
+    monkeypatch.setattr(manifest, "_pending", {})
+
+
+def segment(hour: str, entries):
+    return f"{manifest.SEGMENTS_PREFIX}{hour}/0-{len(entries)}.json", json.dumps({"entries": entries}).encode()
+
+
+def entry(key, moment):
+    return {"Key": key, "Size": 1, "Timestamp": manifest.stamp(moment), "Archive": "a.tar"}
+
+
+def test_placed_objects_are_published_as_one_segment_per_archive():
+    s3 = MemoryS3()
+    with metrics.labels(archive="a.tar"):
+        place_s3_object(s3, "to_ingest/a.csv", body=b"abc")
+        place_s3_object(s3, "extracted/a.log", body=b"abcdef")
+    with metrics.labels(archive="b.tar"):
+        place_s3_object(s3, "to_ingest/b.csv", body=b"b")
+    place_s3_object(s3, "elsewhere.csv", body=b"x", bucket="raw")
+
+    key = manifest.publish(s3, "processed", "a.tar")
+
+    assert key.startswith(f"{manifest.SEGMENTS_PREFIX}{manifest.hour_of(datetime.now(timezone.utc))}/")
+    document = json.loads(s3.objects[key])
+    assert [(e["Key"], e["Size"], e["Archive"]) for e in document["entries"]] == [("to_ingest/a.csv", 3, "a.tar"), ("extracted/a.log", 6, "a.tar")]
+    assert list(manifest._pending) == ["b.tar"]
+    assert manifest.publish(s3, "processed", "a.tar") is None
+
+
+def test_compaction_merges_closed_hours_only_and_keeps_them_readable():
+    s3 = MemoryS3()
+    now = datetime(2024, 10, 10, 12, 10, tzinfo=timezone.utc)
+    for hour, entries in (("2024-10-10T10", [entry("old.csv", now - timedelta(hours=2))]),
+                          ("2024-10-10T11", [entry("a.csv", now - timedelta(minutes=65)), entry("b.csv", now - timedelta(minutes=61))]),
+                          ("2024-10-10T12", [entry("c.csv", now - timedelta(minutes=5))])):
+        key, body = segment(hour, entries)
+        s3.objects[key] = body
+    s3.objects[f"{manifest.HOURS_PREFIX}2024-10-10T11.json"] = json.dumps({"entries": [entry("a.csv", now - timedelta(minutes=90))]}).encode()
+
+    assert manifest.compact(s3, "processed", now=now, grace_seconds=300) == ["2024-10-10T10", "2024-10-10T11"]
+    assert [key for key in s3.objects if key.startswith(manifest.SEGMENTS_PREFIX)] == [f"{manifest.SEGMENTS_PREFIX}2024-10-10T12/0-1.json"]
+    hour = json.loads(s3.objects[f"{manifest.HOURS_PREFIX}2024-10-10T11.json"])
+    assert [(e["Key"], e["Timestamp"]) for e in hour["entries"]] == [("a.csv", manifest.stamp(now - timedelta(minutes=65))), ("b.csv", manifest.stamp(now - timedelta(minutes=61)))]
+
+    # Not yet past the grace period of 12:00-13:00
+    assert manifest.compact(s3, "processed", now=now + timedelta(minutes=52), grace_seconds=300) == []
+
+    s3.listed.clear()
+    recent = manifest_reader.read_window(s3, "processed", now - timedelta(minutes=62), now)
+    assert [e["Key"] for e in recent] == ["c.csv", "b.csv"]
+    # Only the partitions of the window were read
+    assert s3.listed == [f"{manifest.SEGMENTS_PREFIX}2024-10-10T11/", f"{manifest.SEGMENTS_PREFIX}2024-10-10T12/"]
+
+
+class RacingS3(MemoryS3):
+    """Runs ``race`` (another compaction) right after the first segment of the hour is read."""
+
+    def __init__(self, race):
+        super().__init__()
+        self.race = race
+
+    def get_object(self, Bucket, Key):
+        response = super().get_object(Bucket, Key)
+        if Key.startswith(manifest.SEGMENTS_PREFIX) and self.race:
+            race, self.race = self.race, None
+            race(self)
+        return response
+
+
+@pytest.mark.parametrize("race", ["segment deleted", "hour written"])
+def test_compaction_never_overwrites_a_concurrent_compaction(race):
+    now = datetime(2024, 10, 10, 12, 10, tzinfo=timezone.utc)
+    hour_key = f"{manifest.HOURS_PREFIX}2024-10-10T11.json"
+    first = segment("2024-10-10T11", [entry("a.csv", now - timedelta(minutes=65))])
+    second = segment("2024-10-10T11", [entry("b.csv", now - timedelta(minutes=63)), entry("c.csv", now - timedelta(minutes=62))])
+    unseen = entry("d.csv", now - timedelta(minutes=61))
+
+    def compacted_elsewhere(s3):
+        # The other compactor merged both segments, and one this run did not list
+        entries = json.loads(first[1])["entries"] + json.loads(second[1])["entries"] + [unseen]
+        s3.objects[hour_key] = json.dumps({"entries": entries}).encode()
+        if race == "segment deleted":
+            del s3.objects[second[0]]
+
+    s3 = RacingS3(compacted_elsewhere)
+    s3.objects.update([first, second])
+
+    assert manifest.compact(s3, "processed", now=now, grace_seconds=300) == []
+    assert [e["Key"] for e in json.loads(s3.objects[hour_key])["entries"]] == ["a.csv", "b.csv", "c.csv", "d.csv"]
+    # What this run listed is merged by the next one
+    assert manifest.compact(s3, "processed", now=now, grace_seconds=300) == ["2024-10-10T11"]
+    assert [e["Key"] for e in json.loads(s3.objects[hour_key])["entries"]] == ["a.csv", "b.csv", "c.csv", "d.csv"]
+    assert not [key for key in s3.objects if key.startswith(manifest.SEGMENTS_PREFIX)]
@@ -0,0 +1,101 @@
+import io
+import json
+import threading
+
+import pytest
+
+from conftest import RecordingDatabase, RecordingLog, RecordingS3, build_archive
+from etl import extract
+from etl.plan import compile_plans
+from utils import metrics
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """The (stage, labels, rows, bytes) of every stage recorded during the test."""
+    records = []
+    monkeypatch.setattr(metrics, "record", lambda name, seconds, rows=None, bytes=None, rss_delta=None: records.append((name, metrics.current_labels(), rows, bytes)))
+    return records
+
+
+def test_stage_prints_an_emf_line_with_labels(capsys):
+    with metrics.labels(customer="acme", member="m.log"), metrics.stage("parse", bytes=120) as parsed:
+        parsed.rows = 3
+
+    document = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    directives = document["_aws"]["CloudWatchMetrics"][0]
+
+    assert directives["Namespace"] == metrics.METRICS_NAMESPACE
+    assert directives["Dimensions"] == [["Stage"]]
+    assert {metric["Name"] for metric in directives["Metrics"]} == {"Duration", "RSSDelta", "Rows", "RowsPerSecond", "Bytes"}
+    assert (document["Stage"], document["customer"], document["member"]) == ("parse", "acme", "m.log")
+    assert (document["Rows"], document["Bytes"]) == (3, 120)
+
+
+def test_rss_delta_is_what_the_stage_kept_not_the_process_peak(capsys):
+    kept = []
+    with metrics.stage("parse"):
+        kept.append(b"x" * (64 * 1024 * 1024))
+    grown = json.loads(capsys.readouterr().out.strip().splitlines()[-1])["RSSDelta"]
+    kept.clear()
+    with metrics.stage("clean"):
+        pass
+    idle = json.loads(capsys.readouterr().out.strip().splitlines()[-1])["RSSDelta"]
+
+    # ru_maxrss would report the same high-water mark for both stages
+    assert grown >= 60
+    assert abs(idle) < 8
+
+
+def test_labels_are_restored_and_can_be_handed_to_other_threads():
+    with metrics.labels(archive="a.tar"):
+        with metrics.labels(member="m.log"):
+            handed = metrics.current_labels()
+        assert metrics.current_labels() == {"archive": "a.tar"}
+    assert metrics.current_labels() == {}
+
+    seen = []
+    thread = threading.Thread(target=metrics.call_with_labels, args=(handed, lambda: seen.append(metrics.current_labels())))
+    thread.start()
+    thread.join()
+    assert seen == [{"archive": "a.tar", "member": "m.log"}]
+
+
+def test_influx_totals_are_summed_per_archive_and_stage(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS", "off")
+    monkeypatch.setattr(metrics, "METRICS_INFLUX", True)
+    monkeypatch.setattr(metrics, "_totals", {})
+
+    with metrics.labels(customer="acme", server="db 1", archive="acme_db1.tar"):
+        metrics.record("parse", 0.5, rows=100, bytes=4000, rss_delta=2.0)
+        metrics.record("parse", 0.5, rows=300, bytes=6000, rss_delta=12.5)
+    metrics.record("influx_send", 0.25, rows=10, bytes=500)
+    with metrics.labels(archive="other.tar"):
+        metrics.record("parse", 1.0, rows=1)
+
+    db = RecordingDatabase()
+    assert metrics.publish(db, "acme_db1.tar")
+
+    parse, send = sorted(db.lines)
+    assert "max_rss_delta_mib=12.5 " in parse and "max_rss_delta_mib=0 " in send
+    assert parse.startswith("pipeline_stats,customer=acme,server=db\\ 1,stage=parse archive=\"acme_db1.tar\",calls=2i,duration_ms=1000,rows=400i,bytes=10000i,rows_per_second=400,")
+    assert send.startswith("pipeline_stats,stage=influx_send archive=\"\",calls=1i,duration_ms=250,rows=10i,bytes=500i,rows_per_second=40,")
+    assert list(metrics._totals) == [("other.tar", None, None, "parse")]
+
+
+def test_streamed_archive_records_every_stage_per_member(recorded, subroutine_config):
+    compile_plans(subroutine_config)
+
+    member = "test_customer.plc_1728569682-110000-133000_total_locks_1_for_graph.log"
+    content = b"date,time,locks\n2024-10-10,11:00:05,87\n2024-10-10,11:00:10,88\n"
+    log = RecordingLog()
+
+    with metrics.labels(archive="test_customer.plc.tar"):
+        extract.stream_and_create_structure(io.BytesIO(build_archive({member: content})), "test", "customer.plc", RecordingS3(), log, RecordingDatabase(), subroutine_config)
+
+    assert log.errors == []
+    stages = [name for name, _, _, _ in recorded]
+    assert stages == ["extract", "parse", "clean", "serialise", "s3_put", "influx_write", "s3_put", "member"]
+    assert all(values == {"archive": "test_customer.plc.tar", "member": member} for _, values, _, _ in recorded)
+    assert recorded[0][3] == len(content)
+    assert [rows for name, _, rows, _ in recorded if name in ("parse", "clean", "serialise", "influx_write")] == [2, 2, 2, 2]
@@ -0,0 +1,68 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import RecordingDatabase, RecordingS3
+from etl import load
+from etl.output import serialise_frame
+
+
+def cleaned_frame():
+    return pd.DataFrame({
+        "datetime": pd.to_datetime(["2024-10-10 11:00:00", "2024-10-10 11:00:10"]),
+        "locks": [87.0, -1.0],
+        "state": ["OK", None],
+        "mixed": pd.Series(["1", 2], dtype=object),
+        "customer": ["test", "test"],
+        "server": ["customer.plc", "customer.plc"],
+        "_measurement": ["total_locks", "total_locks"],
+        "digits": [0.0, 0.0],
+    })
+
+
+def test_csv_output_is_the_to_csv_text():
+    df = cleaned_frame()
+
+    body, extension = serialise_frame(df, "csv")
+
+    assert extension == "csv"
+    assert body == df.to_csv(index=False).encode("utf-8")
+
+
+def test_parquet_output_has_typed_timestamps_and_dictionary_columns():
+    df = cleaned_frame()
+
+    body, extension = serialise_frame(df, "parquet")
+    parquet = pq.ParquetFile(io.BytesIO(body))
+    table = parquet.read()
+
+    assert extension == "parquet"
+    assert table.schema.field("datetime").type == pa.timestamp("ms")
+    assert pa.types.is_dictionary(table.schema.field("customer").type)
+    assert pa.types.is_dictionary(table.schema.field("server").type)
+    assert parquet.metadata.row_group(0).column(0).compression == "ZSTD"
+    assert table.column("mixed").to_pylist() == ["1", "2"]
+    result = table.to_pandas()
+    np.testing.assert_array_equal(result["datetime"].to_numpy(), df["datetime"].to_numpy())
+    assert result["locks"].tolist() == [87.0, -1.0]
+    assert result["state"].tolist() == ["OK", None]
+
+
+def test_unknown_output_format_is_rejected():
+    with pytest.raises(ValueError):
+        serialise_frame(cleaned_frame(), "xlsx")
+
+
+def test_publish_import_file_places_the_artifact_with_one_put():
+    s3, db = RecordingS3(), RecordingDatabase()
+
+    load.publish_import_file(cleaned_frame(), "test", "customer.plc", "total_locks", 0, s3, db, output_format="parquet")
+
+    (key, body), = s3.objects().items()
+    assert key.startswith("to_ingest/test_customer.plc_total_locks_") and key.endswith("_0.parquet")
+    assert pq.read_table(io.BytesIO(body)).num_rows == 2
+    assert [file for file, _ in db.writes] == [key]
@@ -0,0 +1,71 @@
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import RecordingLog, load_subroutine_config, sample_members
+from etl import load, plan
+from etl.extract import resolve_import
+
+
+@pytest.fixture(autouse=True)
+def plans(subroutine_config):
+    plan.compile_plans(subroutine_config)
+    yield plan.PLANS
+    plan.PLANS.clear()
+
+
+def planned_members():
+    subroutine_config = load_subroutine_config()
+    for file_name, data in sample_members():
+        route = resolve_import(subroutine_config, f"extracted/{file_name}", file_name, RecordingLog())
+        if route is not None and route[0] == "import_data":
+            yield file_name.split("_", 3)[3], route[1:], data
+
+
+@pytest.mark.parametrize("route,data", [(route, data) for _, route, data in planned_members()], ids=[name for name, _, _ in planned_members()])
+def test_planned_read_matches_inferring_read_on_sample_archive(monkeypatch, route, data):
+    header, customer, server, subroutine_key, digits = route
+
+    monkeypatch.setattr(load, "USE_INGESTION_PLANS", False)
+    expected = load.read_data(header, io.BytesIO(data), customer, server, subroutine_key, digits)
+    monkeypatch.setattr(load, "USE_INGESTION_PLANS", True)
+    result = load.read_data(header, io.BytesIO(data), customer, server, subroutine_key, digits)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_compile_plans_covers_import_data_only(plans, subroutine_config):
+    assert set(plans) == {key for key, entry in subroutine_config.items() if entry["SUB"] == "import_data"}
+    assert plans["replication"].dtypes["Status"] == "string"
+    assert plans["replication"].dtypes["backlog"] == "float64"
+
+
+def test_planned_read_keeps_declared_types_and_drops_extra_columns(plans):
+    data = b"date,time,CurLog,CurPage,Server,AckLog,AckPage,AppLog,AppPage,Backlog,Type,Status,extra\n" \
+           b"2024-10-10,11:00:02,1,2,123,4,5,6,7,8,ASYNC,Connected,x\n"
+
+    df = plans["replication"].read(io.BytesIO(data))
+
+    assert list(df.columns) == plans["replication"].target_names
+    assert df["replication_server"].tolist() == ["123"]
+    assert df["current_log"].dtype == "float64"
+    assert df["datetime"].tolist() == [pd.Timestamp("2024-10-10 11:00:02")]
+
+
+def test_read_data_falls_back_when_the_file_does_not_fit_the_plan(subroutine_config):
+    header = subroutine_config["total_locks"]["VALUES"]["IMPORT"][0][1]
+    data = io.BytesIO(b"date,time,locks\n2024-10-10,11:00:05,87\n2024-10-10,11:00:10,n/a-ish\n")
+
+    df = load.read_data(header, data, "customer", "server", "total_locks", 0)
+
+    # pandas inference keeps the whole column as text, as before plans existed
+    assert df["total_locks"].tolist() == ["87", "n/a-ish"]
+
+
+def test_streamed_members_are_logged_by_their_member_name():
+    from utils import metrics
+
+    with metrics.labels(member="customer.plc_total_locks.log"):
+        assert load.member_name(io.BytesIO(b"")) == "customer.plc_total_locks.log"
+    assert load.member_name("/tmp/total_locks.log") == "/tmp/total_locks.log"
@@ -0,0 +1,197 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import config_cache
+from conftest import RecordingSSM, load_lambda
+
+MIB = 1024 * 1024
+
+
+def client_error(status, code, operation):
+    return ClientError({"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, operation)
+
+
+class MultipartS3:
+    """The raw bucket with multipart uploads; parts are "uploaded" with upload()."""
+
+    def __init__(self, objects=(), page=1000):
+        self.objects = set(objects)
+        self.uploads = {}
+        self.calls = []
+        self.listed = []
+        self.page = page
+
+    def head_bucket(self, Bucket):
+        self.calls.append("head_bucket")
+
+    def head_object(self, Bucket, Key):
+        self.calls.append("head_object")
+        if Key not in self.objects:
+            raise client_error(404, "404", "HeadObject")
+
+    def list_objects_v2(self, Bucket, Prefix="", StartAfter="", ContinuationToken=None):
+        self.calls.append("list_objects_v2")
+        keys = [key for key in sorted(self.objects) if key.startswith(Prefix) and key > (ContinuationToken or StartAfter)]
+        page = keys[:self.page]
+        self.listed.extend(page)
+        return {"Contents": [{"Key": key} for key in page], "IsTruncated": len(keys) > self.page, "NextContinuationToken": page[-1] if page else None}
+
+    def generate_presigned_post(self, Bucket, Key):
+        return {"url": f"https://upload/{Bucket}", "fields": {"key": Key}}
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.calls.append("create_multipart_upload")
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {"Key": Key, "Parts": {}}
+        return {"UploadId": upload_id}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"https://raw/{Params['Key']}?uploadId={Params['UploadId']}&partNumber={Params['PartNumber']}"
+
+    def upload(self, upload_id, part_number, size=5 * MIB):
+        self.uploads[upload_id]["Parts"][part_number] = {"PartNumber": part_number, "ETag": f'"etag-{part_number}"', "Size": size}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0):
+        self.calls.append("list_parts")
+        if UploadId not in self.uploads:
+            raise client_error(404, "NoSuchUpload", "ListParts")
+        parts = [part for number, part in sorted(self.uploads[UploadId]["Parts"].items()) if number > PartNumberMarker]
+        # Two parts per page, to exercise the pagination
+        return {"Parts": parts[:2], "IsTruncated": len(parts) > 2, "NextPartNumberMarker": parts[1]["PartNumber"] if len(parts) > 2 else None}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append("complete_multipart_upload")
+        if UploadId not in self.uploads:
+            raise client_error(404, "NoSuchUpload", "CompleteMultipartUpload")
+        received = self.uploads[UploadId]["Parts"]
+        if any(received.get(part["PartNumber"], {}).get("ETag") != part["ETag"] for part in MultipartUpload["Parts"]):
+            raise client_error(400, "InvalidPart", "CompleteMultipartUpload")
+        self.completed = MultipartUpload["Parts"]
+        self.objects.add(Key)
+        del self.uploads[UploadId]
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append("abort_multipart_upload")
+        del self.uploads[UploadId]
+
+
+@pytest.fixture
+def presign(monkeypatch):
+    module = load_lambda("presign", monkeypatch)
+    monkeypatch.setattr(module, "ssm", RecordingSSM())
+    monkeypatch.setattr(module, "s3", MultipartS3(objects={"taken.tar"}))
+    config_cache.invalidate()
+    return module
+
+
+def call(presign, key, body=None, **params):
+    event = {"rawPath": f"/{key}", "queryStringParameters": params, "requestContext": {"http": {"method": "GET" if body is None else "POST"}}}
+    if body is not None:
+        event["body"] = json.dumps(body)
+    result = presign.handler(event, None)
+    return result["statusCode"], json.loads(result["body"]) if result["statusCode"] == 200 else result["body"]
+
+
+def test_create_signs_every_part_in_one_call(presign):
+    status, upload = call(presign, "big.tar", multipart="create", size=str(100 * MIB))
+    assert status == 200
+    assert upload["part_size"] == presign.MULTIPART_PART_SIZE == 16 * MIB
+    assert [part["PartNumber"] for part in upload["parts"]] == list(range(1, 8))
+    assert "partNumber=7" in upload["parts"][-1]["URL"]
+    assert presign.s3.calls == ["head_bucket", "head_object", "create_multipart_upload"]
+
+
+def test_part_size_grows_to_stay_within_the_part_limit(presign):
+    assert presign.part_size_for(10 * MIB) == 16 * MIB
+    size = 500 * 1024 ** 3
+    part_size = presign.part_size_for(size)
+    assert part_size % MIB == 0 and -(-size // part_size) <= presign.MULTIPART_MAX_PARTS
+
+
+def test_create_is_refused_for_existing_objects_and_bad_sizes(presign):
+    assert call(presign, "taken.tar", multipart="create", size="1000")[0] == 409
+    assert call(presign, "big.tar", multipart="create", size="0")[0] == 400
+    assert call(presign, "big.tar", multipart="create")[0] == 400
+    assert "create_multipart_upload" not in presign.s3.calls
+
+
+def test_resume_signs_the_missing_parts_and_completes_with_the_given_etags(presign):
+    _, upload = call(presign, "big.tar", multipart="create", size=str(100 * MIB))
+    upload_id = upload["upload_id"]
+    for number in (1, 2, 3, 5):
+        presign.s3.upload(upload_id, number)
+
+    _, received = call(presign, "big.tar", multipart="parts", upload_id=upload_id)
+    assert [part["PartNumber"] for part in received["parts"]] == [1, 2, 3, 5]
+    _, signed = call(presign, "big.tar", multipart="sign", upload_id=upload_id, parts="4,6-7")
+    assert [part["PartNumber"] for part in signed["parts"]] == [4, 6, 7]
+
+    for number in (4, 6, 7):
+        presign.s3.upload(upload_id, number)
+    parts = [{"PartNumber": number, "ETag": f'"etag-{number}"'} for number in (7, 1, 2, 3, 4, 5, 6)]
+    status, done = call(presign, "big.tar", body={"parts": parts}, multipart="complete", upload_id=upload_id)
+    assert status == 200 and done["parts"] == 7
+    assert [part["PartNumber"] for part in presign.s3.completed] == list(range(1, 8))
+    assert "big.tar" in presign.s3.objects
+
+
+def test_complete_without_etags_uses_the_parts_s3_received(presign):
+    _, upload = call(presign, "big.tar", multipart="create", size=str(40 * MIB))
+    for number in (1, 2, 3):
+        presign.s3.upload(upload["upload_id"], number)
+    assert call(presign, "big.tar", body={}, multipart="complete", upload_id=upload["upload_id"])[0] == 200
+    assert [part["ETag"] for part in presign.s3.completed] == ['"etag-1"', '"etag-2"', '"etag-3"']
+
+
+def test_s3_errors_and_bad_requests_are_reported(presign):
+    _, upload = call(presign, "big.tar", multipart="create", size=str(40 * MIB))
+    upload_id = upload["upload_id"]
+    status, body = call(presign, "big.tar", body={"parts": [{"PartNumber": 1, "ETag": "wrong"}]}, multipart="complete", upload_id=upload_id)
+    assert status == 400 and body.startswith("InvalidPart")
+    assert call(presign, "big.tar", body={"parts": [{"PartNumber": "1"}]}, multipart="complete", upload_id=upload_id)[0] == 400
+    assert call(presign, "big.tar", multipart="sign", upload_id=upload_id, parts="0,10001")[0] == 400
+    assert call(presign, "big.tar", multipart="parts")[0] == 400
+    assert call(presign, "big.tar", multipart="rename", upload_id=upload_id)[0] == 400
+
+    assert call(presign, "big.tar", multipart="abort", upload_id=upload_id)[0] == 200
+    assert call(presign, "big.tar", multipart="parts", upload_id=upload_id)[0] == 404
+
+
+def test_single_post_is_unchanged(presign):
+    assert call(presign, "small.tar") == (200, {"url": "https://upload/raw", "fields": {"key": "small.tar"}})
+    assert call(presign, "taken.tar")[0] == 409
+
+
+def test_batch_checks_every_key_with_one_listing(presign):
+    presign.s3.objects |= {f"customer/server_{i:03d}_1728569682.tar" for i in range(0, 500, 2)} | {"other/x.tar"}
+    keys = [f"customer/server_{i:03d}_1728569682.tar" for i in (11, 12, 13, 14)]
+    status, batch = call(presign, "", body={"keys": keys})
+    assert status == 200
+    assert [upload["key"] for upload in batch["uploads"]] == [keys[0], keys[2]]
+    assert batch["uploads"][0] == {"url": "https://upload/raw", "fields": {"key": keys[0]}, "key": keys[0]}
+    assert batch["existing"] == [keys[1], keys[3]]
+    # One request for the whole batch, starting next to the smallest key
+    assert presign.s3.calls == ["head_bucket", "list_objects_v2"]
+    assert presign.s3.listed[0] == "customer/server_012_1728569682.tar"
+
+
+def test_batch_listing_stops_after_the_largest_key(presign):
+    presign.s3.page = 10
+    presign.s3.objects |= {f"server_{i:03d}.tar" for i in range(500)}
+    status, batch = call(presign, "", body={"keys": ["server_005.tar", "server_025.tar", "new.tar"]})
+    assert status == 200
+    assert batch["existing"] == ["server_005.tar", "server_025.tar"]
+    assert [upload["key"] for upload in batch["uploads"]] == ["new.tar"]
+    assert presign.s3.calls.count("list_objects_v2") == 3
+
+
+def test_batch_rejects_malformed_requests(presign, monkeypatch):
+    for body in ({}, {"keys": []}, {"keys": "a.tar"}, {"keys": ["a.tar", 1]}, {"keys": ["a.tar", "/"]}, {"keys": ["a.tar", "/a.tar"]}):
+        assert call(presign, "", body=body)[0] == 400, body
+    monkeypatch.setattr(presign, "PRESIGN_BATCH_MAX_KEYS", 2)
+    assert call(presign, "", body={"keys": ["a.tar", "b.tar", "c.tar"]})[0] == 400
+    assert "list_objects_v2" not in presign.s3.calls
+    with pytest.raises(ValueError):
+        call(presign, "")
@@ -0,0 +1,91 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import sample_members
+from etl import load, plan
+from etl.reshape import round_values, unpivot_pairs
+
+HEADER = "datetime,name,cores,percentage"
+
+
+def legacy_cpu_by_app(df):
+    """The iterrows reshape read_cpu_by_app used before unpivot_pairs."""
+    data = []
+    for _, row in df.iterrows():
+        timestamp = row[0]
+        for i in range(1, len(row), 2):
+            data.append({
+                "datetime": timestamp,
+                "metric": df.columns[i].replace(" core", ""),
+                "cores": round(row[i], 2),
+                "percentage": round(row[i + 1], 2),
+            })
+    return pd.DataFrame(data)
+
+
+def cpu_by_app_member():
+    return next(data for file_name, data in sample_members() if file_name.endswith("openbet_cpu_by_app_1_for_graph.log"))
+
+
+def synthetic_wide(rows, apps, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {"datetime": pd.date_range("2024-10-10", periods=rows, freq="min").strftime("%Y-%m-%d %H:%M:%S")}
+    for app in range(apps):
+        columns[f"APP{app} core"] = np.round(rng.uniform(0, 8, rows), 3)
+        columns[f"APP{app} percentage"] = rng.integers(0, 100, rows)
+    return pd.DataFrame(columns)
+
+
+@pytest.fixture
+def unpivots():
+    plan.compile_plans({"openbet_cpu_by_app": {
+        "SUB": "import_unpivot",
+        "UNPIVOT": {"GROUP_SIZE": 2, "NAME_SUFFIX": " core", "ROUND": 2, "MEASUREMENT": "cpu_by_app"},
+        "VALUES": {"IMPORT": [["cpu_by_app", HEADER]]},
+    }})
+    yield plan.UNPIVOTS
+    plan.compile_plans({})
+
+
+def test_unpivot_pairs_matches_iterrows_reshape():
+    df = synthetic_wide(50, 7)
+
+    result = unpivot_pairs(df, 2, " core", 2)
+    expected = legacy_cpu_by_app(df)
+
+    result.columns = expected.columns
+    # Per-row dicts keep int columns as int; clean_data casts every number to float anyway
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_read_unpivot_matches_legacy_clean_on_sample_archive(unpivots):
+    data = cpu_by_app_member()
+    legacy = legacy_cpu_by_app(pd.read_csv(io.BytesIO(data), header=0))
+    expected = load.clean_data(legacy, HEADER, "test", "customer.plc", "cpu_by_app", 0)
+
+    result = load.read_unpivot(HEADER, io.BytesIO(data), "test", "customer.plc", "openbet_cpu_by_app", 0)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_read_unpivot_needs_a_compiled_entry():
+    with pytest.raises(ValueError):
+        load.read_unpivot(HEADER, io.BytesIO(b"datetime,A core,A percentage\n"), "c", "s", "unknown", 0)
+
+
+def test_unpivot_pairs_rejects_incomplete_groups():
+    df = pd.DataFrame({"datetime": ["2024-10-10 11:00:00"], "A core": [1.0], "A percentage": [2.0], "B core": [3.0]})
+
+    with pytest.raises(ValueError):
+        unpivot_pairs(df, 2, " core")
+
+
+def test_round_values_matches_python_round_on_ties():
+    values = np.array([0.125, 0.135, 2.675, 1.005, -0.125, 1e10 + 0.125, np.nan, np.inf])
+
+    result = round_values(values, 2)
+
+    np.testing.assert_array_equal(result, np.array([round(value, 2) for value in values.tolist()]))
@@ -0,0 +1,82 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from conftest import RecordingLog
+from importers.registry import IMPORTERS
+from importers.router import FilenameRouter, parse_member_name
+
+
+def legacy_parse(file_name):
+    """The regex passes resolve_import used to run on every member name."""
+    s3_key = f"extracted/{file_name}"
+    match = re.match(r"^(\S+?)_(\S+?)_(\d{4}-\d{2}-\d{2})_(.*)", s3_key) or \
+            re.match(r"^(\S+?)_(\S+?)_(.*-\d{2}:\d{2}-\d{2}:\d{2})_(.*)", s3_key) or \
+            re.match(r"^(\S+?)_(\S+?)_([^\_]+)_(.*)", s3_key)
+    if not match:
+        return None
+    customer, server, date, subroutine_key = match.groups()
+    customer = re.match(r".*/([^/]+)$", customer).group(1)
+    subroutine_key = re.sub(r"_for_graph", "", subroutine_key)
+    subroutine_key = re.sub(r"_\d+$", "", subroutine_key)
+    subroutine_key = re.sub(r"_\d+.log$", "", subroutine_key)
+    subroutine_key = re.sub(r".log$", "", subroutine_key)
+    match = re.search(r"_(\d+)k", subroutine_key)
+    if match:
+        return customer, server, re.sub(r"_\d+k", "_k", subroutine_key), int(match.group(1))
+    return customer, server, subroutine_key, 0
+
+
+@pytest.mark.parametrize("file_name", [
+    "test_customer.plc_1728569682-110000-133000_total_locks_1_for_graph.log",
+    "test_customer.plc_1728569682-110000-133000_buffer_16k_1_for_graph.log",
+    "acme_db_server_2024-10-10_onstat-u.log",
+    "acme_db01_10-10-2024-11:00-13:30_vpcache_2",
+    "dir/acme_db01_x_checkpoints.log",
+    "no-underscores.log",
+])
+def test_parse_member_name_matches_legacy_regexes(file_name):
+    assert parse_member_name(file_name) == legacy_parse(file_name)
+
+
+def test_router_resolves_importer_and_caches_names(subroutine_config):
+    router = FilenameRouter(subroutine_config, IMPORTERS)
+    log = RecordingLog()
+    name = "test_customer.plc_1728569682-110000-133000_buffer_16k_1_for_graph.log"
+
+    route = router.resolve(name, log)
+    assert router.resolve(name, log) is route
+
+    assert route[:5] == ("test", "customer.plc", "buffer_k", 16, "import_data")
+    assert route.importer is IMPORTERS["import_data"]
+    assert router.cache_info().hits == 1
+    assert log.errors == []
+
+
+def test_unroutable_names_are_logged_every_time(subroutine_config):
+    router = FilenameRouter(subroutine_config, IMPORTERS)
+    log = RecordingLog()
+
+    for _ in range(2):
+        assert router.resolve("test_customer.plc_1728569682-110000-133000_unknown_1.log", log) is None
+        assert router.resolve("nopattern.log", log) is None
+
+    assert log.errors == ["No subroutine found for unknown", "Errors for nopattern.log no pattern found"] * 2
+    assert router.cache_info().misses == 2
+
+
+@pytest.mark.parametrize("directory, module", [
+    (os.path.join("lambdas", "transform_singlefile"), "handler"),
+    ("pre_lambda", "latest"),
+    ("pre_lambda", "move_and_clean"),
+])
+def test_standalone_scripts_import_the_router_from_their_own_directory(directory, module):
+    root = os.path.join(os.path.dirname(__file__), "..")
+    # Only the script's directory on the path, as when it is zipped or run on its own
+    result = subprocess.run([sys.executable, "-c", f"import {module}"],
+                            cwd=os.path.join(root, directory), env=dict(os.environ, AWS_DEFAULT_REGION="us-east-1", PYTHONPATH=""),
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,69 @@
+import pytest
+
+from conftest import RecordingS3
+from utils import s3 as s3_utils
+
+
+def test_place_s3_object_writes_once_to_the_processed_bucket():
+    client = RecordingS3()
+
+    s3_utils.place_s3_object(client, "to_ingest/a.csv", body=b"x")
+    s3_utils.place_s3_object(client, "extracted/b.log", file_path="/tmp/b.log", bucket="other")
+
+    assert client.calls == [
+        ("put_object", s3_utils.get_processed_bucket_name(), "to_ingest/a.csv"),
+        ("upload_file", "other", "extracted/b.log"),
+    ]
+
+
+def test_delete_s3_objects_batches_by_one_thousand_and_reports_errors():
+    client = RecordingS3(failing={"key-1500"})
+
+    errors = s3_utils.delete_s3_objects(client, "raw", [f"key-{i}" for i in range(2500)])
+
+    assert client.calls == [("delete_objects", "raw", 1000), ("delete_objects", "raw", 1000), ("delete_objects", "raw", 500)]
+    assert [error["Key"] for error in errors] == ["key-1500"]
+
+
+def test_delete_s3_objects_with_no_keys_sends_nothing():
+    client = RecordingS3()
+
+    assert s3_utils.delete_s3_objects(client, "raw", []) == []
+    assert client.calls == []
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    calls = []
+    secrets = {"influxdb-secrets": {"token": "t"}}
+    clock = [100.0]
+
+    def fake_fetch(name):
+        calls.append(name)
+        return secrets.get(name)
+
+    monkeypatch.setattr(s3_utils, "fetch_secret", fake_fetch)
+    monkeypatch.setattr(s3_utils.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(s3_utils, "_secret_cache", {})
+    return calls, clock
+
+
+def test_get_secret_is_cached_until_the_ttl_expires(fetched):
+    calls, clock = fetched
+
+    assert s3_utils.get_secret("influxdb-secrets", ttl=60) == {"token": "t"}
+    clock[0] += 59
+    s3_utils.get_secret("influxdb-secrets", ttl=60)
+    assert calls == ["influxdb-secrets"]
+
+    clock[0] += 2
+    s3_utils.get_secret("influxdb-secrets", ttl=60)
+    assert calls == ["influxdb-secrets", "influxdb-secrets"]
+
+
+def test_get_secret_does_not_cache_failures(fetched):
+    calls, _ = fetched
+
+    assert s3_utils.get_secret("missing") is None
+    assert s3_utils.get_secret("missing") is None
+    assert calls == ["missing", "missing"]
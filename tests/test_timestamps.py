@@ -0,0 +1,75 @@
+import io
+import os
+import tarfile
+
+import pandas as pd
+import pytest
+
+from etl.timestamps import combine_date_time, datetime_column, parse_date, parse_datetimes
+
+
+def sample_frames():
+    file_path = os.path.join(os.path.dirname(__file__), "test_files/test_customer.plc_1728569682-110000-133000.tar")
+    with tarfile.open(file_path) as tar:
+        for member in tar.getmembers():
+            if not member.isfile() or os.path.basename(member.name).startswith("._"):
+                continue
+            df = pd.read_csv(io.BytesIO(tar.extractfile(member).read()), header=0)
+            df.columns = df.columns.str.strip()
+            # onstat-l has its own layout and importer
+            if 'date' in df.columns and 'time' in df.columns and 'onstat-l' not in member.name:
+                yield member.name, df
+
+
+@pytest.mark.parametrize("df", [df for _, df in sample_frames()], ids=[name.split("_", 3)[3] for name, _ in sample_frames()])
+def test_combine_date_time_matches_legacy_on_sample_archive(df):
+    expected = pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str))
+
+    pd.testing.assert_series_equal(combine_date_time(df['date'], df['time']), expected)
+
+
+def test_times_without_zero_padding_are_parsed():
+    dates = pd.Series(["2024-10-10", "2024-10-10", "2024-10-11"])
+    times = pd.Series(["1:00:05", "23:59:59", "00:00:00"])
+
+    result = combine_date_time(dates, times)
+
+    assert result.tolist() == [pd.Timestamp("2024-10-10 01:00:05"), pd.Timestamp("2024-10-10 23:59:59"), pd.Timestamp("2024-10-11")]
+
+
+def test_dates_are_parsed_once_across_calls():
+    parse_date.cache_clear()
+    dates = pd.Series(["2024-10-10"] * 1000)
+    times = pd.Series([f"11:{i // 60 % 60:02d}:{i % 60:02d}" for i in range(1000)])
+
+    combine_date_time(dates, times)
+    combine_date_time(dates, times)
+
+    assert parse_date.cache_info().misses == 1
+    assert parse_date.cache_info().hits == 1
+
+
+@pytest.mark.parametrize("dates,times", [
+    (["2024-10-10", None], ["11:00:05", "11:00:10"]),
+    (["10/10/2024"], ["11:00:05"]),
+    (["2024-10-10"], ["11:00:05.250"]),
+])
+def test_values_outside_the_format_raise(dates, times):
+    with pytest.raises(ValueError):
+        combine_date_time(pd.Series(dates), pd.Series(times))
+
+
+def test_datetime_column_falls_back_to_inference():
+    df = pd.DataFrame({"date": ["10/10/2024", "10/10/2024"], "time": ["11:00:05", "11:00:05.5"]})
+
+    result = datetime_column(df, "total_locks")
+
+    assert result.tolist() == [pd.Timestamp("2024-10-10 11:00:05"), pd.Timestamp("2024-10-10 11:00:05.5")]
+
+
+def test_parse_datetimes_maps_repeated_values():
+    values = pd.Series(["2024-10-10 11:00:05", "2024-10-10 11:00:10"] * 3, index=range(10, 16))
+
+    result = parse_datetimes(values)
+
+    pd.testing.assert_series_equal(result, pd.to_datetime(values))
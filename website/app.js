@@ -70,6 +70,156 @@
         }
     });
 
+    // Files from this size on are uploaded in parts, uploadConcurrency at a time
+    const multipartThreshold = 64 * 1024 * 1024;
+    const uploadConcurrency = 4;
+    const partAttempts = 3;
+
+    // Call the presign Lambda for a multipart action on fileName
+    async function presignMultipart(fileName, action, params, body) {
+        let query = new URLSearchParams(Object.assign({ multipart: action }, params));
+        let urlToCall = $("#functionUrlPresign").val() + "/" + fileName + "?" + query;
+        let response = await fetch(urlToCall, body === undefined ? {} : { method: "POST", body: JSON.stringify(body) });
+        if (!response.ok) {
+            let error = new Error(`multipart ${action} failed: ${response.status} ${await response.text()}`);
+            error.status = response.status;
+            throw error;
+        }
+        return response.json();
+    }
+
+    // PUT one part, retried; resolves to its ETag (null when CORS does not expose it)
+    async function uploadPart(file, partSize, part) {
+        let blob = file.slice((part.PartNumber - 1) * partSize, part.PartNumber * partSize);
+        for (let attempt = 1; ; attempt++) {
+            try {
+                let response = await fetch(part.URL, { method: "PUT", body: blob });
+                if (!response.ok) {
+                    throw new Error(`part ${part.PartNumber}: ${response.status}`);
+                }
+                return response.headers.get("ETag");
+            } catch (e) {
+                if (attempt >= partAttempts) {
+                    throw e;
+                }
+                console.log("retrying part", part.PartNumber, e);
+            }
+        }
+    }
+
+    // Upload a large file in parallel parts. The upload id is kept in localStorage until the
+    // upload is completed, so submitting the same file again resumes with the missing parts.
+    async function uploadMultipart(file, fileName) {
+        let resumeKey = `multipart:${fileName}:${file.size}:${file.lastModified}`;
+        let upload = JSON.parse(localStorage.getItem(resumeKey) || "null");
+        let parts, etags = {};
+        if (upload) {
+            try {
+                let done = (await presignMultipart(fileName, "parts", { upload_id: upload.upload_id })).parts;
+                done.forEach(part => { etags[part.PartNumber] = part.ETag; });
+                let total = Math.ceil(file.size / upload.part_size);
+                let missing = [];
+                for (let number = 1; number <= total; number++) {
+                    if (!(number in etags)) {
+                        missing.push(number);
+                    }
+                }
+                parts = missing.length ? (await presignMultipart(fileName, "sign", { upload_id: upload.upload_id, parts: missing.join(",") })).parts : [];
+                console.log(`resuming upload ${upload.upload_id}, ${done.length} of ${total} parts done`);
+            } catch (e) {
+                console.log("cannot resume, starting over", e);
+                localStorage.removeItem(resumeKey);
+                upload = null;
+                etags = {};
+            }
+        }
+        if (!upload) {
+            upload = await presignMultipart(fileName, "create", { size: file.size });
+            parts = upload.parts;
+            localStorage.setItem(resumeKey, JSON.stringify({ upload_id: upload.upload_id, part_size: upload.part_size }));
+        }
+
+        let total = Object.keys(etags).length + parts.length;
+        let queue = parts.slice();
+        const showProgress = () => $("#uploadProgress").text(`${Object.keys(etags).length} of ${total} parts uploaded`);
+        showProgress();
+        const worker = async () => {
+            while (queue.length) {
+                let part = queue.shift();
+                etags[part.PartNumber] = await uploadPart(file, upload.part_size, part);
+                showProgress();
+            }
+        };
+        await Promise.all(Array.from({ length: uploadConcurrency }, worker));
+
+        // Without readable ETags the presign Lambda completes with the parts S3 received
+        let complete = Object.values(etags).every(etag => etag)
+            ? { parts: Object.entries(etags).map(([number, etag]) => ({ PartNumber: Number(number), ETag: etag })) }
+            : {};
+        try {
+            await presignMultipart(fileName, "complete", { upload_id: upload.upload_id }, complete);
+        } catch (e) {
+            if (e.status !== 400) {
+                throw e;
+            }
+            // The parts do not make up the file; drop them instead of resuming
+            await presignMultipart(fileName, "abort", { upload_id: upload.upload_id }, {}).catch(console.log);
+            localStorage.removeItem(resumeKey);
+            throw e;
+        }
+        localStorage.removeItem(resumeKey);
+    }
+
+    // Presign the small files in batches of presignBatchSize keys per Lambda call (the
+    // presign Lambda checks a whole batch with one listing), then POST them uploadConcurrency
+    // at a time; large files are uploaded in parts one after the other.
+    // Resolves to the names of the files that already exist and were skipped.
+    const presignBatchSize = 100;
+
+    async function uploadMany(files) {
+        let small = files.filter(file => file.size < multipartThreshold);
+        let existing = [];
+        let uploads = [];
+        for (let i = 0; i < small.length; i += presignBatchSize) {
+            let keys = small.slice(i, i + presignBatchSize).map(file => file.name);
+            let response = await fetch($("#functionUrlPresign").val() + "/", { method: "POST", body: JSON.stringify({ keys: keys }) });
+            if (!response.ok) {
+                throw new Error(`batch presign failed: ${response.status} ${await response.text()}`);
+            }
+            let batch = await response.json();
+            existing = existing.concat(batch.existing);
+            uploads = uploads.concat(batch.uploads);
+        }
+
+        let byName = Object.fromEntries(small.map(file => [file.name, file]));
+        let queue = uploads.slice();
+        let done = 0;
+        const showProgress = () => $("#uploadProgress").text(`${done} of ${uploads.length} files uploaded`);
+        showProgress();
+        const worker = async () => {
+            while (queue.length) {
+                let upload = queue.shift();
+                let formData = new FormData();
+                Object.entries(upload.fields).forEach(([field, value]) => {
+                    formData.append(field, value);
+                });
+                formData.append("file", byName[upload.key]);
+                let response = await fetch(upload.url, { method: "POST", body: formData });
+                if (!response.ok) {
+                    throw new Error(`upload of ${upload.key} failed: ${response.status}`);
+                }
+                done++;
+                showProgress();
+            }
+        };
+        await Promise.all(Array.from({ length: uploadConcurrency }, worker));
+
+        for (const file of files.filter(file => file.size >= multipartThreshold)) {
+            await uploadMultipart(file, file.name);
+        }
+        return existing;
+    }
+
     // Upload form submission handler
     $("#uploadForm").submit(function (event) {
         $("#uploadForm button").addClass('disabled');
@@ -77,6 +227,41 @@
 
         let fileName = $("#customFile").val().replace(/C:\\fakepath\\/i, '');
         let functionUrlPresign = $("#functionUrlPresign").val();
+        const fileElement = document.querySelector("#customFile");
+
+        if (fileElement.files.length > 1) {
+            uploadMany(Array.from(fileElement.files))
+                .then((existing) => {
+                    alert(existing.length ? `success! skipped existing files: ${existing.join(", ")}` : "success!");
+                    updateImageList();
+                })
+                .catch((e) => {
+                    console.log("error", e);
+                    alert("error! check the logs");
+                })
+                .finally(() => {
+                    $("#uploadProgress").text("");
+                    $("#uploadForm button").removeClass('disabled');
+                });
+            return;
+        }
+
+        if (fileElement.files[0].size >= multipartThreshold) {
+            uploadMultipart(fileElement.files[0], fileName)
+                .then(() => {
+                    alert("success!");
+                    updateImageList();
+                })
+                .catch((e) => {
+                    console.log("error", e);
+                    alert("error! check the logs. Submit the same file again to resume the upload");
+                })
+                .finally(() => {
+                    $("#uploadProgress").text("");
+                    $("#uploadForm button").removeClass('disabled');
+                });
+            return;
+        }
 
         let urlToCall = functionUrlPresign + "/" + fileName;
 
@@ -93,7 +278,6 @@
                 });
 
                 // Append file to form data
-                const fileElement = document.querySelector("#customFile");
                 formData.append("file", fileElement.files[0]);
 
                 $.ajax({
@@ -123,16 +307,38 @@
         });
     });
 
-    // Function to update the image list
-    function updateImageList() {
+    // Items of the pages loaded so far, the cursor of the next page and the window of the
+    // first page; the next pages are read from the same window, or it would move on
+    let listedItems = [];
+    let nextCursor = null;
+    let listWindow = null;
+    const listPageSize = 50;
+
+    // Function to update the image list; with a cursor the next page is appended
+    function updateImageList(cursor) {
         let listUrl = $("#functionUrlList").val();
         if (!listUrl) {
             alert("Please set the function URL of the list Lambda");
             return;
         }
+        let params = { page_size: listPageSize };
+        if (cursor) {
+            params.cursor = cursor;
+            params.since = listWindow.since;
+            params.until = listWindow.until;
+        }
 $.ajax({
     url: listUrl,
-    success: function (response) {
+    data: params,
+    success: function (page) {
+        listedItems = cursor ? listedItems.concat(page.items) : page.items;
+        nextCursor = page.next_cursor;
+        if (!cursor) {
+            listWindow = { since: page.since, until: page.until };
+        }
+        $("#loadMoreButton").toggleClass("d-none", !nextCursor);
+        const response = listedItems;
+
         $('#imagesContainer').empty(); // Empty imagesContainer
 
         // Start the Raw files table
@@ -247,4 +453,11 @@ $.ajax({
         updateImageList();
     });
 
+    // Fetch the next page of the list
+    $("#loadMoreButton").click(function (event) {
+        if (nextCursor) {
+            updateImageList(nextCursor);
+        }
+    });
+
 })(jQuery);